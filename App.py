@@ -1,424 +1,51 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.impute import SimpleImputer, KNNImputer
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.feature_selection import VarianceThreshold
-import plotly.express as px
-import seaborn as sns
-import matplotlib.pyplot as plt
 import io
-
-# Custom CSS - Reset and redefine all styles
-st.markdown("""
-<style>
-    /* Main Container Styling */
-    .main {
-        background: linear-gradient(135deg, #f5f7ff 0%, #ffffff 100%);
-        padding: 30px;
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-    }
-
-    /* Title Styling */
-    .stTitle {
-        font-size: 3.2rem !important;
-        text-align: center;
-        padding: 25px 20px;
-        background: linear-gradient(120deg, #1a237e, #1976d2);
-        color: white;
-        border-radius: 15px;
-        margin-bottom: 35px;
-        box-shadow: 0 10px 20px rgba(25, 118, 210, 0.2);
-        position: relative;
-        overflow: hidden;
-    }
-
-    /* Developer Banner */
-    .developer-banner {
-        background: linear-gradient(135deg, #000428 0%, #004e92 100%);
-        color: white;
-        padding: 15px 25px;
-        border-radius: 12px;
-        margin-bottom: 30px;
-        text-align: center;
-        position: relative;
-        overflow: hidden;
-        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);
-        animation: glow 3s infinite alternate;
-    }
-
-    /* Missing Values Analysis */
-    .missing-analysis-title {
-        padding: 20px;
-        margin: 20px 0;
-        text-align: center;
-        background: linear-gradient(135deg, #f5f7ff 0%, #ffffff 100%);
-        border-radius: 15px;
-        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-    }
-
-    .missing-column-card {
-        padding: 25px;
-        margin: 15px 0;
-        border-radius: 15px;
-        background: white;
-        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-        transition: transform 0.3s ease;
-    }
-
-    .missing-column-card:hover {
-        transform: translateY(-5px);
-    }
-
-    .column-header {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-bottom: 15px;
-    }
-
-    .column-name {
-        color: #1976d2;
-        font-size: 20px;
-        margin: 0;
-        font-weight: 600;
-    }
-
-    .missing-badge {
-        background: linear-gradient(45deg, #1976d2, #2196f3);
-        padding: 5px 15px;
-        border-radius: 20px;
-        color: white;
-        font-size: 14px;
-    }
-
-    .progress-container {
-        background: #f0f0f0;
-        border-radius: 10px;
-        height: 10px;
-        margin: 15px 0;
-        overflow: hidden;
-    }
-
-    .progress-bar {
-        height: 100%;
-        background: linear-gradient(90deg, #1976d2, #2196f3);
-        border-radius: 10px;
-        transition: width 1s ease-in-out;
-    }
-
-    .stats-container {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-top: 10px;
-    }
-
-    .stats-label {
-        color: #666;
-        font-size: 14px;
-    }
-
-    .stats-value {
-        color: #1976d2;
-        font-weight: 600;
-        font-size: 16px;
-    }
-
-    .dtype-badge {
-        display: inline-block;
-        padding: 5px 15px;
-        background: #e3f2fd;
-        border-radius: 15px;
-        color: #1976d2;
-        font-size: 14px;
-        margin-top: 15px;
-    }
-
-    @keyframes glow {
-        from {
-            box-shadow: 0 0 10px #004e92, 0 0 20px #004e92;
-        }
-        to {
-            box-shadow: 0 0 20px #004e92, 0 0 30px #004e92;
-        }
-    }
-
-    /* File Upload Styling */
-    .upload-container {
-        position: relative;
-        background: linear-gradient(135deg, #f5f7ff 0%, #ffffff 100%);
-        padding: 40px 30px;
-        border-radius: 20px;
-        box-shadow: 0 8px 20px rgba(0, 0, 0, 0.1);
-        text-align: center;
-        margin: 20px 0;
-        border: 2px dashed #1976d2;
-        transition: all 0.3s ease;
-    }
-
-    .upload-container:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 12px 25px rgba(0, 0, 0, 0.15);
-        border-color: #2196f3;
-    }
-
-    .upload-content {
-        margin-bottom: 25px;
-    }
-
-    .upload-icon {
-        font-size: 40px;
-        color: #1976d2;
-        margin-bottom: 15px;
-    }
-
-    .upload-header {
-        color: #1976d2;
-        font-size: 1.5em;
-        font-weight: 600;
-        margin-bottom: 15px;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-    }
-
-    .upload-text {
-        color: #666;
-        font-size: 1em;
-        margin-bottom: 20px;
-    }
-
-    /* Custom Upload Button */
-    .custom-upload-button {
-        background: linear-gradient(45deg, #1976d2, #2196f3);
-        color: white;
-        padding: 12px 30px;
-        border-radius: 25px;
-        font-size: 16px;
-        font-weight: 500;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        border: none;
-        box-shadow: 0 4px 15px rgba(25, 118, 210, 0.2);
-        display: inline-block;
-        margin-top: 10px;
-    }
-
-    .custom-upload-button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(25, 118, 210, 0.3);
-    }
-
-    /* Streamlit's default uploader modifications */
-    .stFileUploader {
-        padding-bottom: 1rem;
-    }
-
-    .stFileUploader > div {
-        padding: 1rem;
-    }
-
-    .stFileUploader > div > div {
-        background: transparent !important;
-        border: none !important;
-    }
-
-    /* Success message styling */
-    .upload-success {
-        margin-top: 15px;
-        padding: 10px 20px;
-        background: #4CAF50;
-        color: white;
-        border-radius: 10px;
-        animation: fadeIn 0.5s ease-in;
-    }
-
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(-10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-
-    /* Missing Values Analysis Styling */
-    .missing-value-title {
-        text-align: center;
-        color: #1976d2;
-        margin: 20px 0;
-        font-size: 24px;
-        font-weight: 600;
-    }
-
-    .missing-value-card {
-        background: white;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        margin: 10px 0;
-        transition: transform 0.3s ease;
-    }
-
-    .missing-value-card:hover {
-        transform: translateY(-5px);
-    }
-
-    .card-header {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-bottom: 15px;
-    }
-
-    .column-name {
-        color: #1976d2;
-        font-size: 18px;
-        font-weight: bold;
-    }
-
-    .missing-badge {
-        background: #1976d2;
-        color: white;
-        padding: 5px 10px;
-        border-radius: 15px;
-        font-size: 14px;
-    }
-
-    .progress-bar-bg {
-        background: #f0f0f0;
-        height: 10px;
-        border-radius: 5px;
-        margin: 10px 0;
-        overflow: hidden;
-    }
-
-    .progress-bar-fill {
-        background: linear-gradient(90deg, #1976d2, #2196f3);
-        height: 100%;
-        border-radius: 5px;
-        transition: width 0.5s ease-in-out;
-    }
-
-    .stats-row {
-        display: flex;
-        justify-content: space-between;
-        margin-top: 10px;
-    }
-
-    .percentage-label {
-        color: #666;
-    }
-
-    .percentage-value {
-        color: #1976d2;
-        font-weight: bold;
-    }
-
-    .dtype-badge {
-        display: inline-block;
-        background: #e3f2fd;
-        color: #1976d2;
-        padding: 5px 10px;
-        border-radius: 15px;
-        font-size: 14px;
-        margin-top: 10px;
-    }
-
-    /* Enhanced Button Styling */
-    .button-container {
-        display: flex;
-        justify-content: center;
-        gap: 20px;
-        margin: 30px 0;
-        padding: 10px;
-    }
-
-    .custom-button {
-        background: linear-gradient(45deg, #1976d2, #2196f3);
-        color: white;
-        padding: 12px 24px;
-        border-radius: 25px;
-        font-size: 16px;
-        font-weight: 500;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        border: none;
-        box-shadow: 0 4px 15px rgba(25, 118, 210, 0.2);
-        text-align: center;
-        text-decoration: none;
-        display: inline-block;
-        min-width: 160px;
-    }
-
-    .custom-button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(25, 118, 210, 0.3);
-    }
-
-    .custom-button.process {
-        background: linear-gradient(45deg, #1976d2, #2196f3);
-    }
-
-    .custom-button.save {
-        background: linear-gradient(45deg, #43a047, #4caf50);
-    }
-
-    .custom-button.download {
-        background: linear-gradient(45deg, #7b1fa2, #9c27b0);
-    }
-
-    .custom-button:disabled {
-        background: #cccccc;
-        cursor: not-allowed;
-        transform: none;
-        box-shadow: none;
-    }
-
-    /* Enhanced Button Styling */
-    .stButton {
-        display: inline-block;
-    }
-
-    .stButton > button {
-        background: linear-gradient(45deg, #1976d2, #2196f3);
-        color: white;
-        padding: 12px 24px;
-        border-radius: 25px;
-        font-size: 16px;
-        font-weight: 500;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        border: none;
-        box-shadow: 0 4px 15px rgba(25, 118, 210, 0.2);
-        width: 100%;
-    }
-
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(25, 118, 210, 0.3);
-    }
-
-    /* Process button */
-    [data-testid="stButton"] > button[kind="primary"] {
-        background: linear-gradient(45deg, #1976d2, #2196f3);
-    }
-
-    /* Save button */
-    [data-testid="stButton"] > button:disabled {
-        background: #cccccc;
-        cursor: not-allowed;
-        transform: none;
-        box-shadow: none;
-    }
-
-    /* Download button */
-    .stDownloadButton > button {
-        background: linear-gradient(45deg, #7b1fa2, #9c27b0);
-    }
-
-    /* Button container */
-    [data-testid="column"] {
-        padding: 0 10px;
-    }
-</style>
-""", unsafe_allow_html=True)
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+
+from dataprep import BatchOutlierStep, ImputeStep, OutlierStep, outlier_mask, plan_imputations
+from dataprep.batch import merge_outputs, run_batch
+from dataprep.cache import DatasetCache, content_hash
+from dataprep.export import EXPORT_FORMATS, MIME_TYPES, TempFiles, export_to_tempfile, remove_file
+from dataprep.governor import DEFAULT_BUDGET_MB, MemoryGovernor
+from dataprep.ingest import read_csv
+from dataprep.jobs import CANCELLED, DONE, JobRunner, checkpoint
+from dataprep.journal import DeltaGroup, Journal
+from dataprep.knn import DEFAULT_K, DEFAULT_MEMORY_BUDGET_MB
+from dataprep.optimize import memory_report, plan_optimization
+from dataprep.outliers import DEFAULT_THRESHOLDS, DETECTORS, OUTLIER_SORTS, PAGE_SIZE, detect_outliers, outlier_page
+from dataprep.outofcore import DEFAULT_THRESHOLD_MB, SpillDataset, SpillJournal
+from dataprep.plots import box_figure, box_stats, histogram_bins, histogram_figure
+from dataprep.profile import DatasetProfile
+from dataprep.pipeline import Pipeline
+from dataprep.recipe import FittedRecipe, read_types, restore_labels
+from dataprep.sample import DEFAULT_SAMPLE_ROWS, MAX_STRATA, apply_plan, sample_csv
+from dataprep.sketch import DEFAULT_ERROR
+from dataprep.steps import OUTLIER_METHODS, PruneStep
+from dataprep.trace import section, span, start_recording, traced
+from dataprep.variance import DEFAULT_DOMINANT_RATIO, MAX_TRACKED, VARIANCE_THRESHOLD, low_variance_columns, scan_variance
+
+# Timing spans for every section and engine operation of this run: ?profile=1 shows
+# them in the sidebar, DATAPREP_TRACE=<path> appends them to a JSON lines file
+TRACE_PATH = os.environ.get("DATAPREP_TRACE") or None
+recording = None
+if TRACE_PATH or st.query_params.get("profile") == "1":
+    recording = start_recording(TRACE_PATH, session=st.session_state.get("lineage"))
+section("Header and upload")
+
+# Custom CSS, read once per process and injected as a single element
+@st.cache_resource
+def load_css():
+    """The app's stylesheet, read from static/style.css once per process"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "style.css")) as f:
+        return f"<style>\n{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # Developer Credit Banner
 st.markdown("""
@@ -445,13 +72,16 @@ with col2:  # Using the wider middle column
                 <div class="upload-content">
                     <div class="upload-icon">📁</div>
                     <div class="upload-header">Upload Your Dataset</div>
-                    <div class="upload-text">Select your CSV file to begin analysis</div>
+                    <div class="upload-text">Select your CSV file to begin analysis, or several files with the same columns to batch process them</div>
                 </div>
         """, unsafe_allow_html=True)
         
         # File Upload with custom styling
-        uploaded_file = st.file_uploader("Choose a CSV file", type=["csv"], 
-                                       help="Upload your CSV file here")
+        uploaded_files = st.file_uploader("Choose CSV files", type=["csv"], accept_multiple_files=True,
+                                          help="Upload your CSV file here. With several files, the first one "
+                                               "is explored and cleaned, and its recipe can then be applied to all")
+        # The first file drives the interactive session
+        uploaded_file = uploaded_files[0] if uploaded_files else None
         
         st.markdown("</div>", unsafe_allow_html=True)
         
@@ -462,73 +92,6 @@ with col2:  # Using the wider middle column
                 </div>
             """, unsafe_allow_html=True)
 
-def local_css():
-    st.markdown("""
-    <style>
-        .missing-card {
-            background: white;
-            padding: 20px;
-            border-radius: 10px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            margin: 10px 0;
-        }
-        
-        .missing-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 15px;
-        }
-        
-        .column-title {
-            color: #1976d2;
-            font-size: 18px;
-            font-weight: bold;
-        }
-        
-        .missing-count {
-            background: #1976d2;
-            color: white;
-            padding: 5px 10px;
-            border-radius: 15px;
-            font-size: 14px;
-        }
-        
-        .progress-outer {
-            background: #f0f0f0;
-            height: 10px;
-            border-radius: 5px;
-            margin: 10px 0;
-        }
-        
-        .progress-inner {
-            background: linear-gradient(90deg, #1976d2, #2196f3);
-            height: 100%;
-            border-radius: 5px;
-            transition: width 0.5s ease-in-out;
-        }
-        
-        .stats-row {
-            display: flex;
-            justify-content: space-between;
-            margin-top: 10px;
-        }
-        
-        .dtype-tag {
-            display: inline-block;
-            background: #e3f2fd;
-            color: #1976d2;
-            padding: 5px 10px;
-            border-radius: 15px;
-            font-size: 14px;
-            margin-top: 10px;
-        }
-    </style>
-    """, unsafe_allow_html=True)
-
-# Call the CSS function at the start
-local_css()
-
 def get_ai_recommendation(column_name, dtype, missing_percentage):
     """AI recommendation for handling missing values"""
     if pd.api.types.is_numeric_dtype(dtype):
@@ -544,101 +107,807 @@ def get_ai_recommendation(column_name, dtype, missing_percentage):
         else:
             return "Most frequent value or create 'Unknown' category (Recommended: High missing ratio in categorical data)"
 
+# Uploads larger than this are processed out of core, from a spill file on disk
+OUT_OF_CORE_BYTES = float(os.environ.get("DATAPREP_OUT_OF_CORE_MB", DEFAULT_THRESHOLD_MB)) * 1024 ** 2
+SPILL_DIR = os.environ.get("DATAPREP_SPILL_DIR") or None
+# Uploads larger than this open in sample-first mode: exploration and previews run on a
+# sample, and saved changes are replayed on the full data when it is exported
+SAMPLE_FIRST_BYTES = float(os.environ.get("DATAPREP_SAMPLE_FIRST_MB", 256)) * 1024 ** 2
+SAMPLE_ROWS = int(os.environ.get("DATAPREP_SAMPLE_ROWS", DEFAULT_SAMPLE_ROWS))
+# Worker processes for batch processing several uploads (default: one per CPU)
+BATCH_WORKERS = int(os.environ.get("DATAPREP_BATCH_WORKERS", "0")) or None
+# How often a running background job's progress bar is refreshed
+JOB_POLL_SECONDS = float(os.environ.get("DATAPREP_JOB_POLL_SECONDS", "0.5"))
+
+@st.cache_resource
+def get_dataset_cache():
+    """Process-wide cache of parsed uploads and profiles, shared by all sessions"""
+    return DatasetCache(
+        max_entries=64,
+        max_bytes=int(os.environ.get("DATAPREP_CACHE_MB", "2048")) * 1024 ** 2
+    )
+
+@st.cache_resource
+def get_memory_governor():
+    """Process-wide budget for the sessions' working frames; idle ones spill to Parquet"""
+    return MemoryGovernor(
+        budget_bytes=int(os.environ.get("DATAPREP_SESSION_BUDGET_MB", DEFAULT_BUDGET_MB)) * 1024 ** 2,
+        spill_dir=SPILL_DIR
+    )
+
+@st.cache_resource
+def get_job_runner():
+    """Process-wide thread pool running the sessions' heavy operations in the background"""
+    return JobRunner(max_workers=int(os.environ.get("DATAPREP_JOB_WORKERS", "0")) or None)
+
+def admin_view():
+    """Server memory usage in the sidebar, shown when the app is opened with ?admin=1"""
+    governor = get_memory_governor()
+    cache = get_dataset_cache()
+    with st.sidebar:
+        st.header("Server Memory")
+        st.metric("Sessions", f"{governor.total_bytes / 1024 ** 2:.1f} MB",
+                  f"budget {governor.budget_bytes / 1024 ** 2:.0f} MB", delta_color="off")
+        st.metric("Dataset cache", f"{cache.total_bytes / 1024 ** 2:.1f} MB",
+                  f"{len(cache)} entries, {cache.hits} hits, {cache.misses} misses", delta_color="off")
+        st.dataframe(governor.usage(), hide_index=True)
+
+def profile_view(recording):
+    """Spans of the run that just finished, shown in the sidebar with ?profile=1"""
+    with st.sidebar:
+        st.header("Last Rerun")
+        st.metric("Run time", f"{recording.seconds:.3f}s", f"{len(recording.spans)} spans", delta_color="off")
+        st.dataframe(
+            recording.summary(),
+            hide_index=True,
+            column_config={
+                "Seconds": st.column_config.NumberColumn(format="%.4f"),
+                "% of Run": st.column_config.NumberColumn(format="%.1f"),
+                "RSS Δ (MB)": st.column_config.NumberColumn(format="%.1f"),
+                "Arrow Δ (MB)": st.column_config.NumberColumn(format="%.1f"),
+            }
+        )
+
+def end_recording():
+    """End this run's spans, written out before st.rerun or st.stop cuts the run short"""
+    if recording is not None:
+        recording.finish()
+
+def finish_run():
+    """End this run's spans, then draw the operator panels asked for in the URL"""
+    end_recording()
+    if st.query_params.get("admin") == "1":
+        admin_view()
+    if recording is not None and st.query_params.get("profile") == "1":
+        profile_view(recording)
+
+def start_job(slot, name, func, *args, key=None, cleanup=None, **kwargs):
+    """Run func in the background as this session's job in slot, discarding the slot's
+    earlier job; key identifies what the job computes, and cleanup releases a result
+    that is never collected. Returns the job."""
+    runner = get_job_runner()
+    jobs = st.session_state.setdefault("jobs", {})
+    if slot in jobs:
+        runner.discard(jobs[slot])
+    job = runner.submit(name, func, *args, **kwargs)
+    job.cleanup = cleanup
+    job.labels.update(key=key, version=st.session_state.data_version)
+    jobs[slot] = job.id
+    return job
+
+def cancel_jobs():
+    runner = get_job_runner()
+    for job_id in st.session_state.pop("jobs", {}).values():
+        runner.discard(job_id)
+
+def job_pending(slot):
+    """Whether slot holds a job that is running or not yet collected"""
+    return slot in st.session_state.get("jobs", {})
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id):
+    """Progress bar and Cancel button of a running job, refreshed on their own; once
+    the job is done the whole app reruns to pick up its result"""
+    job = get_job_runner().get(job_id)
+    if job is None or job.done:
+        st.rerun(scope="app")
+    stage = f" ({job.stage})" if job.stage else ""
+    st.progress(job.progress, text=f"{job.name}{stage}... {job.progress:.0%}, {job.seconds:.1f}s")
+    if st.button("Cancel", key=f"cancel-{job_id}", disabled=job.cancel_requested):
+        job.cancel()
+
+def finished_job(slot, key=None):
+    """This session's job in slot once it is done, returned once and then forgotten.
+    While it runs its progress is shown and None is returned. A job computing
+    something other than key is stale and discarded."""
+    jobs = st.session_state.get("jobs", {})
+    if slot not in jobs:
+        return None
+    runner = get_job_runner()
+    job = runner.get(jobs[slot])
+    if job is None or (key is not None and job.labels["key"] != key):
+        runner.discard(jobs.pop(slot))
+        return None
+    if not job.done:
+        job_progress(job.id)
+        return None
+    del jobs[slot]
+    return runner.collect(job.id)
+
+def job_outcome(job):
+    """Message for a job that was cancelled or failed"""
+    if job.status == CANCELLED:
+        st.warning(f"{job.name} cancelled.")
+    else:
+        st.error(f"{job.name} failed: {job.error}")
+
+def collect_plan(slot, name):
+    """Pending change name from the planning job in slot, once that is done; returns
+    whether it arrived in this run"""
+    job = finished_job(slot)
+    if job is None or job.labels["version"] != st.session_state.data_version:
+        return False
+    if job.status != DONE:
+        job_outcome(job)
+        return False
+    st.session_state[name] = {"delta": job.result, "version": job.labels["version"]}
+    return True
+
+def dataset_profile(df, profile_key):
+    """Column statistics of the session's data, computed once per saved version. A
+    cache miss runs a background profiling job; None is returned until it is done."""
+    key = profile_key + ("profile",)
+    cache = get_dataset_cache()
+    profile = cache.get(key)
+    if profile is not None:
+        return profile
+    job = finished_job("profile", key)
+    if job is not None:
+        if job.status == DONE:
+            return cache.put(key, job.result)
+        job_outcome(job)
+        st.button("Retry", key="profile-retry")
+        return None
+    if not job_pending("profile"):
+        start_job("profile", "Profiling", DatasetProfile.from_frame, df, key=key)
+        finished_job("profile", key)
+    return None
+
+def variance_report(df, profile_key):
+    """Variance and dominant-value report of the session's data, computed once per saved
+    version by a background scan; None until it is done"""
+    key = profile_key + ("variance",)
+    cache = get_dataset_cache()
+    report = cache.get(key)
+    if report is not None:
+        return report
+    job = finished_job("variance", key)
+    if job is not None:
+        if job.status == DONE:
+            return cache.put(key, job.result)
+        job_outcome(job)
+        # Scan again only when asked to
+        st.session_state.prune_scan = False
+        return None
+    if not job_pending("variance"):
+        start_job("variance", "Variance scan", scan_variance, df, key=key)
+        finished_job("variance", key)
+    return None
+
+def prune_controls(report, key):
+    """Thresholds, the columns they flag and the choice of columns to drop; returns the
+    PruneStep to apply once the button is pressed"""
+    threshold_col, ratio_col = st.columns([1, 1])
+    with threshold_col:
+        threshold = st.number_input("Variance threshold", min_value=0.0, value=VARIANCE_THRESHOLD,
+                                    step=0.01, format="%.4f", key=f"{key}-variance",
+                                    help="Numeric columns with at most this variance are dropped.")
+    with ratio_col:
+        ratio = st.number_input("Dominant value share", min_value=0.5, max_value=1.0,
+                                value=DEFAULT_DOMINANT_RATIO, step=0.005, format="%.3f", key=f"{key}-dominant",
+                                help="Columns where one value makes up at least this share of the "
+                                     "non-missing entries are dropped.")
+    flagged = low_variance_columns(report, threshold, ratio)
+    if not flagged:
+        st.success(f"None of the {len(report)} columns falls below the thresholds.")
+        return None
+    shown = report.loc[list(flagged)]
+    st.write(f"**{len(flagged)} of {len(report)} columns fall below the thresholds:**")
+    st.dataframe(pd.DataFrame({
+        "Type": shown["dtype"],
+        "Variance": shown["variance"],
+        "Dominant value": shown["dominant"].astype(str),
+        "Dominant share (%)": shown["dominant_ratio"] * 100,
+        "Missing": shown["nulls"],
+        "Reason": pd.Series(flagged),
+    }))
+    st.caption(f"Shares are exact for columns with up to {MAX_TRACKED} distinct values and may be "
+               "slightly low above that.")
+    selected = st.multiselect("Columns to drop", list(flagged), default=list(flagged))
+    if st.button("Drop Columns", key=f"{key}-button", type="primary", disabled=not selected):
+        return PruneStep(threshold, ratio, columns=selected)
+    return None
+
+def pending_delta(name):
+    """Delta previewed but not saved yet, if it was planned against the current data"""
+    pending = st.session_state.get(name)
+    if pending is None or pending["version"] != st.session_state.data_version:
+        return None
+    return pending["delta"]
+
+def next_profile(profile, delta, undone=False):
+    """Profile of the data after delta was saved (or undone), derived from profile, the
+    one before: only the columns the delta wrote are rescanned"""
+    df = st.session_state.journal.df
+    return get_dataset_cache().get_or_compute(current_profile_key() + ("profile",),
+                                              lambda: profile.updated(df, delta, undone))
+
+def commit_change(delta, profile):
+    """Save delta; returns the profile of the saved data"""
+    st.session_state.journal.commit(delta)
+    st.session_state.data_version += 1
+    get_memory_governor().touch(st.session_state.lineage, measure=True)
+    return next_profile(profile, delta)
+
+def current_profile_key():
+    """Cache key of the session's data: the upload's content hash plus the save count.
+    Saved versions also carry a per-session token so two sessions editing the same
+    upload never share entries."""
+    if st.session_state.data_version == 0:
+        return (st.session_state.upload_hash, 0)
+    return (st.session_state.upload_hash, st.session_state.lineage, st.session_state.data_version)
+
+def outlier_rows_and_values(series, lower, upper):
+    """Row labels and values of the outliers of a column, for the paginated browser"""
+    positions = np.flatnonzero(outlier_mask(series, lower, upper).to_numpy())
+    return series.index[positions], series.iloc[positions].to_numpy(dtype=np.float64, na_value=np.nan)
+
+@traced("df.info")
+def info_text(df):
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    return buffer.getvalue()
+
+def export_job(frame, fmt, prefix, pending=None, full=None, steps=None):
+    """Body of an export job: the frame as pending would leave it, or with full (the
+    upload in sample-first mode) all its rows with steps applied, in a temporary file"""
+    if full is not None:
+        frame = apply_plan(full, steps, out_of_core=full.size > OUT_OF_CORE_BYTES, spill_dir=SPILL_DIR)
+    elif pending is not None:
+        frame = pending.applied(frame)
+    return export_to_tempfile(frame, fmt, prefix=prefix)
+
+def remove_export(report):
+    remove_file(report.path)
+
+def session_files():
+    """Export files held by this session, removed on restart or when the session ends"""
+    if "export_files" not in st.session_state:
+        st.session_state.export_files = TempFiles()
+    return st.session_state.export_files
+
+def export_controls(frame, key, file_stem, pending=None, full=None):
+    """Format picker and on-demand export; the file is only written when asked for.
+    With a pending delta the export is of the frame as the delta would leave it.
+    In sample-first mode full is the upload, and the export is of all its rows."""
+    fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{key}-format")
+    # A pending delta is identified by the steps that planned it, which outlive any rerun
+    planned = None if pending is None or pending.steps is None else Pipeline(pending.steps).to_json()
+    source = (current_profile_key(), pending is not None, planned, fmt)
+    exports = st.session_state.setdefault("exports", {})
+    files = session_files()
+    export = exports.get(key)
+    if export is not None and export["source"] != source:
+        # Data or format changed since the last export; drop the stale file
+        files.remove(exports.pop(key)["report"].path)
+        export = None
+
+    if export is None:
+        # The file is written by a background job; the session picks it up when done.
+        # Until then the job owns it, and removes it if it is discarded or expires.
+        job = finished_job(key, source)
+        if job is not None and job.status == DONE:
+            files.add(job.result.path)
+            export = exports[key] = {"source": source, "report": job.result}
+        elif job is not None:
+            job_outcome(job)
+    if export is None and not job_pending(key) and st.button("Prepare Download", key=f"{key}-prepare"):
+        steps = None
+        if full is not None:
+            # Steps are read here: the job's thread has no access to the session
+            steps = st.session_state.journal.planned_steps + (pending.steps if pending is not None else [])
+        start_job(key, "Exporting", export_job, frame, fmt, f"{file_stem}-", pending, full, steps,
+                  key=source, cleanup=remove_export)
+        finished_job(key, source)
+
+    if export is not None:
+        report = export["report"]
+        st.caption(f"Exported {report.rows} rows in {report.seconds:.2f}s, "
+                   f"{report.size_bytes / 1024 ** 2:.1f} MB")
+        with open(report.path, "rb") as exported:
+            st.download_button(
+                "Download Dataset",
+                exported,
+                file_stem + EXPORT_FORMATS[fmt],
+                MIME_TYPES[fmt],
+                key=f"{key}-download"
+            )
+
+def session_recipe(fitted, file_name):
+    journal = st.session_state.journal
+    # Columns the memory optimizer turned into booleans hold their text labels in the files
+    labels = journal.labels
+    recipe = FittedRecipe(restore_labels(fitted, labels),
+                          source={"file": file_name, "rows": st.session_state.load_report.rows})
+    recipe.source["types"] = read_types(journal.df, recipe.columns + recipe.dropped, labels)
+    return recipe
+
+def plan_view(journal, file_name):
+    """Sample-first mode: the saved steps, fitted on the full data when it is exported"""
+    steps = journal.planned_steps
+    if not steps:
+        st.write("Saved changes appear here as a recipe of steps. Their fill values and fences are "
+                 "learned from the full data when it is exported, not from the sample.")
+        return
+    plan = Pipeline(steps).to_json()
+    st.code(plan, language="json")
+    st.write("Run it on the full file headlessly:")
+    st.code(f"python -m dataprep run {file_name} cleaned.csv --recipe recipe.json", language="bash")
+    st.download_button("Download Recipe", plan, "recipe.json", "application/json", key="download-recipe")
+
+def recipe_view(journal, file_name):
+    """The saved changes with the statistics they used, to replay on new files headlessly"""
+    if st.session_state.sampled:
+        plan_view(journal, file_name)
+        return
+    fitted = journal.fitted_steps
+    if fitted is None:
+        st.info("KNN imputation fills from neighbouring rows rather than stored statistics, so a "
+                "recipe cannot be exported while a saved KNN fill is part of the history.")
+    elif not fitted:
+        st.write("Saved imputations and outlier treatments appear here with the fill values and "
+                 "fences they used.")
+    else:
+        recipe = session_recipe(fitted, file_name)
+        st.dataframe(recipe.summary(), hide_index=True)
+        st.write("Replay it on new files without refitting:")
+        st.code("python -m dataprep transform recipe.json new_data.csv cleaned.csv", language="bash")
+        st.download_button("Download Recipe", recipe.to_json(), "recipe.json", "application/json",
+                           key="download-recipe")
+
+def batch_job(recipe_spec, uploads, fmt, merge):
+    """Body of a batch job: the recipe applied to every upload in worker processes,
+    into a new temporary folder; returns the batch result"""
+    workdir = tempfile.mkdtemp(prefix="dataprep-batch-")
+    try:
+        return run_batch_uploads(recipe_spec, uploads, fmt, merge, workdir)
+    except BaseException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+
+def run_batch_uploads(recipe_spec, uploads, fmt, merge, workdir):
+    """Copy the uploads into workdir and run the recipe on them; outputs, merged file and zip go there too"""
+    sources, names = [], {}
+    for i, upload in enumerate(uploads):
+        checkpoint(0.0, "copying uploads")
+        # One folder per upload keeps its file name; equal names get numbered outputs
+        path = os.path.join(workdir, "inputs", str(i), upload.name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(upload.getbuffer())
+        sources.append(path)
+        names[path] = upload.name
+
+    results = run_batch(recipe_spec, sources, os.path.join(workdir, "outputs"), fmt, BATCH_WORKERS)
+    done = [result for result in results if result.ok]
+
+    merged = None
+    if merge and done:
+        checkpoint(1.0, "merging")
+        merged = os.path.join(workdir, "merged" + EXPORT_FORMATS[fmt])
+        merge_outputs([result.output for result in done], merged, fmt)
+    archive = None
+    if done:
+        checkpoint(1.0, "zipping")
+        archive = os.path.join(workdir, "outputs.zip")
+        compression = zipfile.ZIP_DEFLATED if fmt == "CSV" else zipfile.ZIP_STORED
+        with zipfile.ZipFile(archive, "w", compression) as zipped:
+            for result in done:
+                zipped.write(result.output, os.path.basename(result.output))
+
+    table = pd.DataFrame([{
+        "File": names[result.source],
+        "Rows In": result.rows_in,
+        "Rows Out": result.rows_out,
+        "Seconds": round(result.seconds, 2),
+        "Status": "OK" if result.ok else result.error,
+    } for result in results])
+    return {"dir": workdir, "table": table, "failed": len(results) - len(done), "merged": merged, "zip": archive}
+
+def remove_batch(batch):
+    shutil.rmtree(batch["dir"], ignore_errors=True)
+
+def drop_batch_result():
+    batch = st.session_state.get("batch_result")
+    if batch is not None:
+        remove_batch(batch)
+        st.session_state.batch_result = None
+
+def batch_view(journal, uploads):
+    """Apply the session's fitted recipe to every uploaded file"""
+    st.markdown("<h3 style='color: #1976d2;'>Batch Processing 🗂️</h3>", unsafe_allow_html=True)
+    if st.session_state.sampled:
+        # Values learned from a sample would not describe any file, so each file is fitted anew
+        steps = journal.planned_steps
+        recipe_spec = Pipeline(steps).to_dict() if steps else None
+        hint = (f"Save changes on the sample of {uploads[0].name}; the same steps can then be fitted on "
+                f"and applied to each of the {len(uploads)} uploaded files.")
+    else:
+        fitted = journal.fitted_steps
+        recipe_spec = session_recipe(fitted, uploads[0].name).to_dict() if fitted else None
+        hint = (f"Save imputations or outlier treatments (not KNN) on {uploads[0].name}; the fitted recipe "
+                f"can then be applied to all {len(uploads)} uploaded files with the same fill values and fences.")
+    if recipe_spec is None:
+        drop_batch_result()
+        st.info(hint)
+        return
+    fmt_col, merge_col = st.columns([2, 1])
+    with fmt_col:
+        fmt = st.selectbox("Output format", list(EXPORT_FORMATS), key="batch-format")
+    with merge_col:
+        merge = st.checkbox("Also merge into one file", value=True, key="batch-merge")
+
+    source = (tuple(upload.file_id for upload in uploads), st.session_state.data_version, fmt, merge)
+    batch = st.session_state.get("batch_result")
+    if batch is not None and batch["source"] != source:
+        # Files, recipe or options changed since the last run; drop its outputs
+        drop_batch_result()
+        batch = None
+
+    if batch is None:
+        # The files are processed by a background job; the session picks up its folder when done
+        job = finished_job("batch", source)
+        if job is not None and job.status == DONE:
+            batch = st.session_state.batch_result = dict(job.result, source=source)
+        elif job is not None:
+            job_outcome(job)
+    if batch is None and not job_pending("batch") and st.button(
+            f"Apply Recipe to All {len(uploads)} Files", key="batch_button", type="primary"):
+        start_job("batch", "Processing files", batch_job, recipe_spec, uploads, fmt, merge,
+                  key=source, cleanup=remove_batch)
+        finished_job("batch", source)
+
+    if batch is not None:
+        if batch["failed"]:
+            st.warning(f"{batch['failed']} of {len(batch['table'])} files failed; the others were processed.")
+        st.dataframe(batch["table"], hide_index=True)
+        zip_col, merged_col = st.columns([1, 1])
+        if batch["zip"] is not None:
+            with zip_col, open(batch["zip"], "rb") as archive:
+                st.download_button("Download All (zip)", archive, "processed_files.zip", "application/zip",
+                                   key="batch-download-zip")
+        if batch["merged"] is not None:
+            with merged_col, open(batch["merged"], "rb") as merged:
+                st.download_button("Download Merged", merged, "processed_merged" + EXPORT_FORMATS[fmt],
+                                   MIME_TYPES[fmt], key="batch-download-merged")
+
+def spill_profile(dataset):
+    """Profile of an out-of-core dataset, computed once per spill file"""
+    return get_dataset_cache().get_or_compute(("spill", dataset.path, "profile"), dataset.profile)
+
+def run_out_of_core(steps, message):
+    """Apply steps batch by batch into a new spill file, as a background job; the
+    page makes it the current data once the job is done"""
+    spill = st.session_state.spill
+    # The profile is read here: the cache lookup belongs to this run, not the job
+    job = start_job("out-of-core", "Processing record batches", spill.dataset.transform, steps,
+                    spill_profile(spill.dataset), spill_dir=SPILL_DIR, key=spill.dataset.path)
+    job.labels.update(steps=steps, message=message)
+    # Rerun so the progress shows at the top of the page
+    end_recording()
+    st.rerun()
+
+def collect_out_of_core(spill):
+    """Commit the new spill file of a finished out-of-core job. A job started on a
+    spill file that is no longer current (after Undo or Redo) is discarded."""
+    job = finished_job("out-of-core", spill.dataset.path)
+    if job is None:
+        return
+    if job.status != DONE:
+        job_outcome(job)
+        return
+    spill.commit(job.result, job.labels["steps"])
+    st.session_state.data_version += 1
+    st.session_state.spill_message = job.labels["message"]
+
+def out_of_core_page(uploaded_file):
+    """Workflow for uploads above the out-of-core threshold: the data lives in a
+    memory-mapped spill file and every stage runs over its record batches"""
+    if 'spill' not in st.session_state:
+        st.session_state.upload_hash = content_hash(uploaded_file)
+        st.session_state.data_version = 0
+        st.session_state.lineage = uuid.uuid4().hex
+        load_progress = st.progress(0.0, text="Writing CSV to disk...")
+        st.session_state.spill = SpillJournal(SpillDataset.from_csv(
+            uploaded_file, spill_dir=SPILL_DIR,
+            progress=lambda fraction: load_progress.progress(fraction, text=f"Writing CSV to disk... {fraction:.0%}")
+        ))
+        load_progress.empty()
+    spill = st.session_state.spill
+
+    st.markdown("<h2 style='text-align: center; color: #1976d2; margin: 20px 0;'>Data Overview 📊</h2>", unsafe_allow_html=True)
+    st.info(f"Out-of-core mode: this {uploaded_file.size / 1024 ** 2:.0f} MB upload is above the "
+            f"{OUT_OF_CORE_BYTES / 1024 ** 2:.0f} MB threshold, so it is kept in a memory-mapped file on "
+            "disk and processed one record batch at a time. KNN imputation is not available in this mode.")
+
+    undo_col, redo_col, _ = st.columns([1, 1, 4])
+    with undo_col:
+        undo_button = st.button("↩ Undo", key="undo_button", disabled=not spill.can_undo)
+    with redo_col:
+        redo_button = st.button("↪ Redo", key="redo_button", disabled=not spill.can_redo)
+    if undo_button or redo_button:
+        if undo_button:
+            spill.undo()
+        else:
+            spill.redo()
+        st.session_state.data_version += 1
+    collect_out_of_core(spill)
+
+    if 'spill_message' in st.session_state:
+        st.success(st.session_state.pop('spill_message'))
+
+    dataset = spill.dataset
+    with st.spinner("Profiling columns..."):
+        profile = spill_profile(dataset)
+    rows, columns = dataset.shape
+    st.write(f"**Dataset Shape:** {rows} rows and {columns} columns")
+    st.caption(f"{dataset.num_batches} record batches, {dataset.size_bytes / 1024 ** 2:.1f} MB on disk")
+    st.write("**First Rows:**")
+    st.write(dataset.head())
+    st.write("**Quick Statistics:**")
+    st.write(profile.describe())
+
+    # Low-variance columns: one scan over the record batches, dropped into a new spill file
+    st.markdown("<h3 style='color: #1976d2;'>Low-Variance Feature Pruning ✂️</h3>", unsafe_allow_html=True)
+    if st.button("Scan Columns", key="prune_scan_button"):
+        st.session_state.prune_scan = True
+    if st.session_state.get("prune_scan"):
+        with st.spinner("Scanning record batches..."):
+            variance = get_dataset_cache().get_or_compute(("spill", dataset.path, "variance"),
+                                                          lambda: scan_variance(dataset.iter_batches()))
+        step = prune_controls(variance, "prune")
+        if step is not None:
+            run_out_of_core([step], f"Dropped {len(step.columns)} low-variance columns! The change is saved; "
+                                    "use Undo to revert it.")
+
+    # Missing values: fill values come from the profile, applied batch by batch
+    missing_info = profile.missing_info()
+    if not missing_info.empty:
+        st.markdown("<h2 style='text-align: center; color: #1976d2; margin: 20px 0;'>Missing Values Analysis 🔍</h2>", unsafe_allow_html=True)
+        st.write(missing_info)
+        selected_columns = st.multiselect("Select columns to handle missing values:", list(missing_info.index))
+        for col in selected_columns:
+            if pd.api.types.is_numeric_dtype(profile.dtype(col)):
+                st.selectbox(f"Choose method for {col}", ["Mean", "Median", "Mode"], key=f"method_{col}")
+            else:
+                st.selectbox(f"Choose method for {col}", ["Mode", "Create 'Unknown' category"], key=f"method_{col}")
+        if st.button("Process Missing Values", key="process_button", type="primary", disabled=not selected_columns):
+            run_out_of_core([ImputeStep(col, st.session_state[f"method_{col}"]) for col in selected_columns],
+                            "Missing values handled! The changes are saved; use Undo to revert them.")
+    else:
+        st.success("Your dataset has no missing values!")
+
+    # Outliers: IQR fences from the profile, treated batch by batch
+    st.markdown("<h3 style='color: #1976d2;'>Outlier Detection 🔍</h3>", unsafe_allow_html=True)
+    numeric_columns = profile.numeric_columns
+    if numeric_columns:
+        selected_column_outlier = st.selectbox("Select column for outlier detection:", numeric_columns)
+        lower, upper = profile.bounds(selected_column_outlier)
+        st.write(f"IQR fences: [{lower:.6g}, {upper:.6g}]")
+        outlier_method = st.selectbox("Select outlier handling method:", ["None"] + OUTLIER_METHODS)
+        if st.button("Apply Changes", key="process_outliers_button", type="primary", disabled=outlier_method == "None"):
+            run_out_of_core([OutlierStep(selected_column_outlier, outlier_method)],
+                            f"Outliers in {selected_column_outlier} handled using {outlier_method} method!")
+
+    st.markdown("<h3 style='color: #1976d2;'>Download Processed Data 📥</h3>", unsafe_allow_html=True)
+    export_controls(spill.dataset, 'download-csv-spill', "processed_data")
+
+# Everything derived from the loaded data; dropped to load the upload afresh
+SESSION_KEYS = ("journal", "load_report", "sampled", "sample_strata", "processed_columns",
+                "pending_impute", "pending_outliers", "pending_batch_outliers", "memory_report",
+                "prune_scan", "prune_message", "exports")
+
+def restart_session():
+    drop_batch_result()
+    cancel_jobs()
+    session_files().clear()
+    for key in SESSION_KEYS:
+        st.session_state.pop(key, None)
+
+def sample_view(load_report, profile):
+    """Sample-first mode banner and the choice of strata"""
+    how = (f"stratified by {load_report.stratify}" if load_report.stratify is not None
+           else "uniform random sample")
+    st.info(f"Sample-first mode: statistics, previews and charts use {load_report.rows:,} of the "
+            f"{load_report.source_rows:,} rows ({how}). Saved changes are recorded as steps and "
+            "applied to the full data, with fill values and fences learned from it, when you export.")
+    if "sample_strata" not in st.session_state:
+        # Low-cardinality columns of the sample as first loaded
+        st.session_state.sample_strata = [column for column in profile.columns
+                                          if 1 < profile.stats.at[column, "unique"] <= MAX_STRATA]
+    st.selectbox("Stratify the sample by", [None] + st.session_state.sample_strata, key="sample_stratify",
+                 format_func=lambda column: "None (uniform)" if column is None else column,
+                 on_change=restart_session,
+                 help="Keep every value of a column in the sample in proportion, rare ones included. "
+                      "Drawing a new sample starts over.")
+
+sample_first = False
+if uploaded_file:
+    sample_first = st.toggle(
+        f"Sample-first mode ({SAMPLE_ROWS:,} rows)", value=uploaded_file.size > SAMPLE_FIRST_BYTES,
+        key="sample_first", on_change=restart_session,
+        help="Explore and preview on a sample for fast reruns at any file size; saved changes are "
+             "applied to the full data when it is exported. Switching starts over."
+    )
+
+if uploaded_file and uploaded_file.size > OUT_OF_CORE_BYTES and not sample_first:
+    section("Out-of-core page")
+    out_of_core_page(uploaded_file)
+    finish_run()
+    st.stop()
+
 if uploaded_file:
+    section("Load and profile")
+    dataset_cache = get_dataset_cache()
+
     # Initialize session state for processed dataframe if not exists
-    if 'processed_df' not in st.session_state:
-        st.session_state.processed_df = pd.read_csv(uploaded_file)
-    
-    df = st.session_state.processed_df
+    if 'journal' not in st.session_state:
+        st.session_state.upload_hash = content_hash(uploaded_file)
+        st.session_state.data_version = 0
+        st.session_state.lineage = uuid.uuid4().hex
+        st.session_state.sampled = sample_first
+        stratify = st.session_state.get("sample_stratify")
+        if sample_first:
+            # A sample has its own cache entries, apart from those of the full data
+            st.session_state.upload_hash += f"-sample-{SAMPLE_ROWS}-{stratify}"
+
+        def load_upload():
+            action = "Sampling" if sample_first else "Reading"
+            load_progress = st.progress(0.0, text=f"{action} CSV...")
+            report = lambda fraction: load_progress.progress(fraction, text=f"{action} CSV... {fraction:.0%}")
+            if sample_first:
+                loaded = sample_csv(uploaded_file, SAMPLE_ROWS, stratify=stratify, progress=report)
+            else:
+                loaded = read_csv(uploaded_file, progress=report)
+            load_progress.empty()
+            return loaded
+
+        parsed_df, st.session_state.load_report = dataset_cache.get_or_compute(
+            (st.session_state.upload_hash, "parsed"), load_upload
+        )
+        # The parsed frame is shared through the cache, so the journal copies it on first save
+        st.session_state.journal = Journal(parsed_df, owned=False)
+        get_memory_governor().track(st.session_state.lineage, st.session_state.journal)
+
+    journal = st.session_state.journal
+    # Reads the frame back from disk if the governor spilled it while the session was idle
+    df = journal.df
+    get_memory_governor().touch(st.session_state.lineage)
+    # Profiles are keyed by upload content and save count, so reruns reuse them
+    profile_key = current_profile_key()
+    profile = dataset_profile(df, profile_key)
+    if profile is None:
+        # Profiling runs in the background; its job reruns the app when it is done
+        finish_run()
+        st.stop()
     
     # Add Data Overview Section
+    section("Data overview")
     st.markdown("<h2 style='text-align: center; color: #1976d2; margin: 20px 0;'>Data Overview 📊</h2>", unsafe_allow_html=True)
     
+    # Track processed columns in session state
+    if 'processed_columns' not in st.session_state:
+        st.session_state.processed_columns = set()
+
+    # Undo / Redo of saved changes
+    undo_col, redo_col, _ = st.columns([1, 1, 4])
+    with undo_col:
+        undo_button = st.button("↩ Undo", key="undo_button", disabled=not journal.can_undo)
+    with redo_col:
+        redo_button = st.button("↪ Redo", key="redo_button", disabled=not journal.can_redo)
+    if undo_button or redo_button:
+        change = journal.undo() if undo_button else journal.redo()
+        if isinstance(change, DeltaGroup):
+            # Imputed columns come back into (or leave) the missing values list
+            if undo_button:
+                st.session_state.processed_columns.difference_update(change.columns)
+            else:
+                st.session_state.processed_columns.update(change.columns)
+        st.session_state.data_version += 1
+        get_memory_governor().touch(st.session_state.lineage, measure=True)
+        df = journal.df
+        profile_key = current_profile_key()
+        profile = next_profile(profile, change, undone=undo_button)
+
     # Data Shape
     st.write(f"**Dataset Shape:** {df.shape[0]} rows and {df.shape[1]} columns")
+    if 'load_report' in st.session_state:
+        load_report = st.session_state.load_report
+        st.caption(f"Loaded in {load_report.seconds:.2f}s, "
+                   f"{load_report.memory_bytes / 1024 ** 2:.1f} MB in memory")
+    sampled = st.session_state.sampled
+    if sampled:
+        sample_view(st.session_state.load_report, profile)
+    # In sample-first mode exports are of the whole upload
+    full_upload = uploaded_file if sampled else None
+
+    # Optional memory optimization, committed (and undoable) like any other change
+    with st.expander("Memory Optimizer"):
+        st.write("Convert columns to smaller types: categoricals for repetitive text, booleans for "
+                 "yes/no style columns, Arrow strings, and downcast integers and floats.")
+        if sampled:
+            st.caption("Not available in sample-first mode, where only the sample is in memory.")
+        if st.button("Optimize Memory", key="optimize_memory_button", disabled=sampled):
+            optimization = plan_optimization(df)
+            if not optimization.conversions:
+                st.info("Every column already uses its smallest type.")
+            else:
+                before = profile
+                profile = commit_change(optimization, profile)
+                df = journal.df
+                profile_key = current_profile_key()
+                st.session_state.memory_report = {"report": memory_report(before, profile),
+                                                  "version": st.session_state.data_version}
+        report = st.session_state.get("memory_report")
+        if report is not None and report["version"] == st.session_state.data_version:
+            total = report["report"].loc["Total"]
+            st.success(f"Memory reduced from {total['Before (MB)']:.1f} MB to {total['After (MB)']:.1f} MB "
+                       f"({total['Reduction']:.1f}x smaller)")
+            st.dataframe(report["report"])
     
+    # Low-variance columns, dropped before the costlier stages below (KNN, outlier detection)
+    section("Feature pruning")
+    with st.expander("Low-Variance Feature Pruning"):
+        st.write("Find columns that hardly vary: numeric columns with a variance at or below the "
+                 "threshold, and columns where one value makes up nearly every entry. Dropping them "
+                 "shrinks the data before imputation and outlier detection.")
+        message = st.session_state.get("prune_message")
+        if message is not None and message["version"] == st.session_state.data_version:
+            st.success(message["text"])
+        if st.button("Scan Columns", key="prune_scan_button"):
+            st.session_state.prune_scan = True
+        # Once scanned, each saved version is scanned again in the background
+        variance = variance_report(df, profile_key) if st.session_state.get("prune_scan") else None
+        if variance is not None:
+            step = prune_controls(variance, "prune")
+            if step is not None:
+                delta = step.plan(df, variance)
+                profile = commit_change(delta, profile)
+                # The other columns are unchanged, so their report carries over
+                dataset_cache.put(current_profile_key() + ("variance",), variance.drop(index=delta.names))
+                st.session_state.prune_message = {
+                    "text": f"Dropped {len(delta.names)} low-variance columns: {', '.join(delta.names)}. "
+                            "Use Undo to bring them back.",
+                    "version": st.session_state.data_version,
+                }
+                # Rerun so every section above shows the pruned data
+                end_recording()
+                st.rerun()
+
+    # Filled in at the end of the run, so it includes changes saved further down
+    recipe_panel = st.expander("Fitted Recipe")
+
     # Data Info
+    section("Info and statistics")
     st.write("**Data Types and Non-Null Counts:**")
-    buffer = io.StringIO()
-    df.info(buf=buffer)
-    st.text(buffer.getvalue())
+    st.text(dataset_cache.get_or_compute(profile_key + ("info",), lambda: info_text(df)))
     
     # Quick Statistics
     st.write("**Quick Statistics:**")
-    st.write(df.describe())
+    st.write(profile.refresh(df, profile.numeric_columns, modes=False).describe())
     
     # Enhanced Stats Dashboard with Advanced Cards
     stats_html = f"""
-        <style>
-            .stats-dashboard {{
-                background: linear-gradient(135deg, #f5f7ff 0%, #ffffff 100%);
-                padding: 25px;
-                border-radius: 20px;
-                box-shadow: 0 8px 20px rgba(0, 0, 0, 0.1);
-                margin: 20px 0;
-                border: 1px solid rgba(25, 118, 210, 0.1);
-            }}
-            
-            .stats-title {{
-                text-align: center;
-                color: #1976d2;
-                font-size: 24px;
-                font-weight: 600;
-                margin-bottom: 25px;
-                text-transform: uppercase;
-                letter-spacing: 2px;
-                background: linear-gradient(45deg, #1976d2, #2196f3);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-            }}
-            
-            .stats-grid {{
-                display: grid;
-                grid-template-columns: repeat(2, 1fr);
-                gap: 20px;
-                padding: 10px;
-            }}
-            
-            .stats-card {{
-                background: white;
-                padding: 20px;
-                border-radius: 15px;
-                box-shadow: 0 4px 15px rgba(0, 0, 0, 0.05);
-                transition: transform 0.3s ease, box-shadow 0.3s ease;
-                border: 1px solid rgba(25, 118, 210, 0.1);
-            }}
-            
-            .stats-card:hover {{
-                transform: translateY(-5px);
-                box-shadow: 0 8px 25px rgba(0, 0, 0, 0.1);
-            }}
-            
-            .stats-label {{
-                color: #666;
-                font-size: 16px;
-                font-weight: 500;
-                margin-bottom: 10px;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-            }}
-            
-            .stats-value {{
-                color: #1976d2;
-                font-size: 28px;
-                font-weight: 600;
-                margin: 0;
-                background: linear-gradient(45deg, #1976d2, #2196f3);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-            }}
-            
-            .stats-icon {{
-                font-size: 24px;
-                margin-bottom: 10px;
-                color: #1976d2;
-            }}
-        </style>
-        
         <div class="stats-dashboard">
             <div class="stats-title">
                 📊 Dataset Statistics
@@ -659,19 +928,10 @@ if uploaded_file:
     """
     
     st.markdown(stats_html, unsafe_allow_html=True)
-    
-    # Track processed columns in session state
-    if 'processed_columns' not in st.session_state:
-        st.session_state.processed_columns = set()
 
     # Missing Values Analysis
-    missing_data = df.isnull().sum()
-    missing_percentages = (missing_data / len(df)) * 100
-    missing_info = pd.DataFrame({
-        'Missing Values': missing_data,
-        'Missing Percentage': missing_percentages
-    })
-    missing_info = missing_info[missing_info['Missing Values'] > 0]
+    section("Missing values")
+    missing_info = profile.missing_info()
 
     if not missing_info.empty:
         st.markdown("<h2 style='text-align: center; color: #1976d2; margin: 20px 0;'>Missing Values Analysis 🔍</h2>", unsafe_allow_html=True)
@@ -687,11 +947,12 @@ if uploaded_file:
             st.write(f"### {col}")
             st.write(f"Missing Values: {missing_count}")
             st.write(f"Missing Percentage: {missing_percent:.1f}%")
-            st.write(f"Data Type: {df[col].dtype}")
+            st.write(f"Data Type: {profile.dtype(col)}")
             st.progress(missing_percent/100)
             st.markdown("---")
 
         # Column Selection for Missing Value Treatment
+        section("Missing values treatment")
         selected_columns = st.multiselect(
             "Select columns to handle missing values:",
             remaining_columns
@@ -708,7 +969,7 @@ if uploaded_file:
                 # AI Recommendation
                 recommendation = get_ai_recommendation(
                     col, 
-                    df[col].dtype,
+                    profile.dtype(col),
                     missing_info.loc[col, 'Missing Percentage']
                 )
                 st.markdown(f"""
@@ -719,7 +980,7 @@ if uploaded_file:
                 """, unsafe_allow_html=True)
 
                 # Method Selection
-                if pd.api.types.is_numeric_dtype(df[col].dtype):
+                if pd.api.types.is_numeric_dtype(profile.dtype(col)):
                     method = st.selectbox(
                         f"Choose method for {col}",
                         ["Mean", "Median", "Mode", "KNN"],
@@ -732,59 +993,66 @@ if uploaded_file:
                         key=f"method_{col}"
                     )
 
+            # KNN settings, shared by every column imputed with KNN
+            if any(st.session_state.get(f"method_{col}") == "KNN" for col in selected_columns):
+                with st.expander("KNN imputation settings", expanded=True):
+                    numeric_features = profile.numeric_columns
+                    st.number_input("Neighbours (k)", min_value=1, max_value=100, value=DEFAULT_K, key="knn_k")
+                    st.multiselect("Feature columns", numeric_features, default=numeric_features, key="knn_features")
+                    st.number_input("Memory budget (MB)", min_value=16, value=DEFAULT_MEMORY_BUDGET_MB,
+                                    step=64, key="knn_memory_mb")
+
         # Button layout
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
             process_button = st.button("Process Missing Values", key="process_button", type="primary")
-        with col2:
-            save_button = st.button("Save Changes", key="save_button", disabled=not process_button)
-        with col3:
-            # Always show download button
-            st.download_button(
-                "Download Dataset",
-                df.to_csv(index=False),
-                "processed_data.csv",
-                "text/csv",
-                key='download-csv'
-            )
 
         if process_button:
-            temp_df = df.copy()
+            # Record only the cells each step fills; the data itself is not copied.
+            # All columns are planned in one pass, KNN columns side by side
+            steps = []
             for col in selected_columns:
                 method = st.session_state[f"method_{col}"]
-                if method == "Mean":
-                    temp_df[col].fillna(temp_df[col].mean(), inplace=True)
-                elif method == "Median":
-                    temp_df[col].fillna(temp_df[col].median(), inplace=True)
-                elif method == "Mode":
-                    temp_df[col].fillna(temp_df[col].mode()[0], inplace=True)
-                elif method == "Create 'Unknown' category":
-                    temp_df[col].fillna("Unknown", inplace=True)
-                elif method == "KNN":
-                    st.warning("KNN imputation will be implemented in the next version")
+                if method == "KNN":
+                    steps.append(ImputeStep(
+                        col, method,
+                        k=st.session_state.knn_k,
+                        features=st.session_state.knn_features,
+                        memory_budget_mb=st.session_state.knn_memory_mb
+                    ))
+                elif method is not None:
+                    steps.append(ImputeStep(col, method))
+            # Planned in the background; the profile is brought up to date here first,
+            # since the job must not rescan it while this session's reruns read it
+            profile.refresh(df, [step.column for step in steps if step.method in ("Mean", "Median", "Mode")])
+            st.session_state.pop("pending_impute", None)
+            start_job("impute", "Imputation", plan_imputations, df, steps, profile)
+
+        collect_plan("impute", "pending_impute")
+        pending = pending_delta('pending_impute')
+        with col2:
+            save_button = st.button("Save Changes", key="save_button", disabled=pending is None)
+        with col3:
+            # Always offer the download; the file is only built on request
+            export_controls(df, 'download-csv', "processed_data", full=full_upload)
 
+        if pending is not None and not save_button:
             # Preview changes
             st.write("### Preview of Processed Data")
-            st.write(temp_df.head())
-            
-            # Store temporary results
-            st.session_state.temp_df = temp_df
+            st.write(pending.preview(df))
 
-        if save_button and 'temp_df' in st.session_state:
+        if save_button and pending is not None:
             # Save changes permanently
-            st.session_state.processed_df = st.session_state.temp_df.copy()
+            profile = commit_change(pending, profile)
+            del st.session_state.pending_impute
             # Add processed columns to the set
-            st.session_state.processed_columns.update(selected_columns)
+            st.session_state.processed_columns.update(pending.columns)
             st.success("Changes saved successfully! You can now process other columns or download the dataset.")
             
             # Update missing info after saving
-            missing_data = st.session_state.processed_df.isnull().sum()
-            missing_percentages = (missing_data / len(st.session_state.processed_df)) * 100
-            missing_info = pd.DataFrame({
-                'Missing Values': missing_data,
-                'Missing Percentage': missing_percentages
-            })
-            missing_info = missing_info[missing_info['Missing Values'] > 0]
+            df = journal.df
+            profile_key = current_profile_key()
+            missing_info = profile.missing_info()
 
     else:
         st.success("Your dataset has no missing values!")
@@ -794,25 +1062,79 @@ if uploaded_file:
         st.info("Please handle missing values before proceeding to outlier detection.")
     else:
         # Outlier Detection
+        section("Outlier charts")
         st.markdown("<h3 style='color: #1976d2;'>Outlier Detection 🔍</h3>", unsafe_allow_html=True)
-        numeric_columns = df.select_dtypes(include=[np.number]).columns
+        numeric_columns = profile.numeric_columns
         if len(numeric_columns) > 0:
             selected_column_outlier = st.selectbox("Select column for outlier detection:", numeric_columns)
-            fig = px.box(df, y=selected_column_outlier)
-            st.plotly_chart(fig)
+            # Figures are built from server-side aggregates, never from every row
+            chart_type = st.radio("Chart", ["Box plot", "Histogram"], horizontal=True, key="outlier_chart")
+            column_stats = profile.refresh(df, [selected_column_outlier], modes=False)[selected_column_outlier]
+            if chart_type == "Box plot":
+                box = dataset_cache.get_or_compute(
+                    profile_key + ("box", selected_column_outlier),
+                    lambda: box_stats(
+                        df[selected_column_outlier],
+                        quartiles=(column_stats["q1"], column_stats["median"], column_stats["q3"]),
+                        bounds=profile.bounds(selected_column_outlier)
+                    )
+                )
+                if box is not None:
+                    figure = box_figure(box, selected_column_outlier)
+                    with span("st.plotly_chart"):
+                        st.plotly_chart(figure)
+                    st.caption(f"Showing {len(box['outlier_sample'])} of {box['outliers']} outlier points")
+            else:
+                counts, edges = dataset_cache.get_or_compute(
+                    profile_key + ("histogram", selected_column_outlier),
+                    lambda: histogram_bins(df[selected_column_outlier])
+                )
+                figure = histogram_figure(counts, edges, selected_column_outlier)
+                with span("st.plotly_chart"):
+                    st.plotly_chart(figure)
             
+            section("Outlier detection")
+            # Quartiles from the profile, or from a streaming sketch with a chosen rank error
+            use_sketch = st.checkbox("Approximate quartiles (streaming KLL sketch)", key="outlier_sketch")
+            sketch_error = None
+            if use_sketch:
+                sketch_error = st.select_slider("Quantile rank error", options=[0.001, 0.005, 0.01, 0.02, 0.05],
+                                                value=DEFAULT_ERROR, key="outlier_sketch_error")
+
             # Calculate and display outlier statistics
-            Q1 = df[selected_column_outlier].quantile(0.25)
-            Q3 = df[selected_column_outlier].quantile(0.75)
-            IQR = Q3 - Q1
-            outliers = df[(df[selected_column_outlier] < (Q1 - 1.5 * IQR)) | 
-                         (df[selected_column_outlier] > (Q3 + 1.5 * IQR))][selected_column_outlier]
+            bounds_step = OutlierStep(selected_column_outlier, "Cap", sketch_error=sketch_error)
+            if sketch_error is None:
+                lower, upper = bounds_step.bounds(df, profile)
+            else:
+                # A sketch is a full pass over the column; keep it out of every rerun
+                lower, upper = dataset_cache.get_or_compute(
+                    profile_key + ("sketch", selected_column_outlier, sketch_error),
+                    lambda: bounds_step.bounds(df, profile)
+                )
+            outlier_rows, outlier_values = dataset_cache.get_or_compute(
+                profile_key + ("outliers", selected_column_outlier, lower, upper),
+                lambda: outlier_rows_and_values(df[selected_column_outlier], lower, upper)
+            )
             
-            st.write(f"Number of outliers detected: {len(outliers)}")
-            if len(outliers) > 0:
-                st.write("Outlier values:", outliers.values)
+            st.write(f"Number of outliers detected: {len(outlier_values)}")
+            if len(outlier_values) > 0:
+                # Only the visible page is sorted, sliced and sent to the browser
+                st.write("Outlier values:")
+                page_count = -(-len(outlier_values) // PAGE_SIZE)
+                sort_col, page_col = st.columns([2, 1])
+                with sort_col:
+                    outlier_sort = st.selectbox("Sort by", OUTLIER_SORTS, key="outlier_sort")
+                with page_col:
+                    page_number = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count,
+                                                  value=1, step=1, key=f"outlier_page_{selected_column_outlier}")
+                page = outlier_page(outlier_rows, outlier_values, lower, upper,
+                                    page=min(page_number, page_count) - 1, sort=outlier_sort)
+                st.dataframe(page, hide_index=True)
+                first = (min(page_number, page_count) - 1) * PAGE_SIZE
+                st.caption(f"Outliers {first + 1}-{first + len(page)} of {len(outlier_values)}")
 
             # Handle Outliers
+            section("Outlier treatment")
             st.write("**Handle Outliers**")
             outlier_method = st.selectbox("Select outlier handling method:", 
                                         ["None", "Remove", "Cap", "Replace with Mean"])
@@ -821,52 +1143,108 @@ if uploaded_file:
             col1, col2, col3 = st.columns([1, 1, 1])
             with col1:
                 process_outliers_button = st.button("Apply Changes", key="process_outliers_button", type="primary")
+
+            if process_outliers_button and outlier_method != "None":
+                # The column's statistics are fresh (the chart above refreshed them)
+                st.session_state.pop("pending_outliers", None)
+                start_job("outliers", "Outlier treatment",
+                          OutlierStep(selected_column_outlier, outlier_method, sketch_error=sketch_error).plan,
+                          df, profile)
+
+            planned = collect_plan("outliers", "pending_outliers")
+            pending = pending_delta('pending_outliers')
             with col2:
-                save_outliers_button = st.button("Save Changes", key="save_outliers_button", disabled=not process_outliers_button)
+                save_outliers_button = st.button("Save Changes", key="save_outliers_button", disabled=pending is None)
             with col3:
                 # Download button for outlier-processed data
-                if 'temp_outlier_df' in st.session_state:
-                    download_data = st.session_state.temp_outlier_df
-                else:
-                    download_data = df
-                st.download_button(
-                    "Download Dataset",
-                    download_data.to_csv(index=False),
-                    "processed_data_with_outliers.csv",
-                    "text/csv",
-                    key='download-csv-outliers'
-                )
+                export_controls(df, 'download-csv-outliers', "processed_data_with_outliers",
+                                pending=pending, full=full_upload)
 
-            if process_outliers_button and outlier_method != "None":
-                temp_df = df.copy()
-                Q1 = temp_df[selected_column_outlier].quantile(0.25)
-                Q3 = temp_df[selected_column_outlier].quantile(0.75)
-                IQR = Q3 - Q1
-                outlier_mask = (temp_df[selected_column_outlier] < (Q1 - 1.5 * IQR)) | (temp_df[selected_column_outlier] > (Q3 + 1.5 * IQR))
-                
-                if outlier_method == "Remove":
-                    temp_df = temp_df[~outlier_mask]
-                elif outlier_method == "Cap":
-                    temp_df.loc[temp_df[selected_column_outlier] < (Q1 - 1.5 * IQR), selected_column_outlier] = Q1 - 1.5 * IQR
-                    temp_df.loc[temp_df[selected_column_outlier] > (Q3 + 1.5 * IQR), selected_column_outlier] = Q3 + 1.5 * IQR
-                elif outlier_method == "Replace with Mean":
-                    temp_df.loc[outlier_mask, selected_column_outlier] = temp_df[selected_column_outlier].mean()
-                
-                # Store temporary results
-                st.session_state.temp_outlier_df = temp_df
-                
+            if pending is not None and not save_outliers_button:
                 # Preview changes
                 st.write("### Preview of Processed Data")
-                st.write(temp_df.head())
-                st.success(f"Outliers in {selected_column_outlier} handled using {outlier_method} method!")
+                st.write(pending.preview(df))
+                if planned:
+                    step = pending.steps[0]
+                    st.success(f"Outliers in {step.column} handled using {step.method} method!")
 
-            if save_outliers_button and 'temp_outlier_df' in st.session_state:
+            if save_outliers_button and pending is not None:
                 # Save changes permanently
-                st.session_state.processed_df = st.session_state.temp_outlier_df.copy()
-                df = st.session_state.processed_df
+                profile = commit_change(pending, profile)
+                del st.session_state.pending_outliers
+                df = journal.df
+                profile_key = current_profile_key()
                 st.success("Changes saved successfully! You can now process other columns or download the dataset.")
 
+            # Batch Outlier Treatment: many columns, one detection pass, per-column treatment
+            section("Batch outliers")
+            st.markdown("<h3 style='color: #1976d2;'>Batch Outlier Treatment 🧮</h3>", unsafe_allow_html=True)
+            if st.checkbox("Select all numeric columns", key="batch_all_columns"):
+                batch_columns = list(numeric_columns)
+            else:
+                batch_columns = st.multiselect("Select columns for batch outlier treatment:", numeric_columns,
+                                               key="batch_columns")
+            detector = st.selectbox("Detection rule:", DETECTORS, key="batch_detector")
+            threshold = st.number_input("Threshold (IQR factor, z-score or MAD units)",
+                                        min_value=0.1, value=DEFAULT_THRESHOLDS[detector],
+                                        key=f"batch_threshold_{detector}")
+            default_treatment = st.selectbox("Default treatment:", ["None"] + OUTLIER_METHODS,
+                                             key="batch_default_treatment")
+
+            if batch_columns:
+                detection = dataset_cache.get_or_compute(
+                    profile_key + ("batch_outliers", detector, threshold, tuple(batch_columns)),
+                    lambda: detect_outliers(df, batch_columns, detector, threshold)
+                )
+                summary = detection.summary()
+                summary["Treatment"] = default_treatment
+                edited = st.data_editor(
+                    summary,
+                    column_config={
+                        "Treatment": st.column_config.SelectboxColumn(options=["None"] + OUTLIER_METHODS, required=True)
+                    },
+                    disabled=["Lower Bound", "Upper Bound", "Outliers", "Outlier %"],
+                    key="batch_treatments"
+                )
+                st.write(f"Total outliers detected: {int(summary['Outliers'].sum())} "
+                         f"across {len(batch_columns)} columns")
+
+                col1, col2 = st.columns([1, 1])
+                with col1:
+                    process_batch_button = st.button("Apply to All Columns", key="process_batch_button", type="primary")
+
+                if process_batch_button:
+                    st.session_state.pop("pending_batch_outliers", None)
+                    start_job("batch_outliers", "Batch outlier treatment",
+                              BatchOutlierStep(edited["Treatment"].to_dict(), detector, threshold).plan, df, detection)
+
+                planned = collect_plan("batch_outliers", "pending_batch_outliers")
+                pending = pending_delta('pending_batch_outliers')
+                with col2:
+                    save_batch_button = st.button("Save Changes", key="save_batch_button", disabled=pending is None)
+
+                if pending is not None and not save_batch_button:
+                    st.write("### Preview of Processed Data")
+                    st.write(pending.preview(df))
+                    if planned:
+                        st.success(f"{pending.changed_cells} outlier values handled across "
+                                   f"{len(pending.steps[0].treatments)} columns!")
+
+                if save_batch_button and pending is not None:
+                    profile = commit_change(pending, profile)
+                    del st.session_state.pending_batch_outliers
+                    df = journal.df
+                    st.success("Changes saved successfully! You can now process other columns or download the dataset.")
+
+    with recipe_panel:
+        recipe_view(journal, uploaded_file.name)
+
+    if len(uploaded_files) > 1:
+        section("Batch processing")
+        batch_view(journal, uploaded_files)
+
 # Add particles background
+section("Footer")
 st.markdown("""
 <div id="tsparticles"></div>
 <script src="https://cdn.jsdelivr.net/npm/tsparticles@1.37.5/dist/tsparticles.min.js"></script>
@@ -905,3 +1283,5 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+# Operator panels, drawn last so they reflect this run's changes
+finish_run()
@@ -0,0 +1,146 @@
+"""The pandas and Arrow backends side by side on the same data and recipe
+
+For each size the synthetic CSV is read once per backend: read_csv gives the
+pandas frame, read_csv_table the Arrow table. Each stage then runs through
+both backends (profiling, each single-value imputation, each outlier
+treatment and a whole recipe), with wall time, peak memory and the speedup of
+Arrow over pandas. Before timing, the recipe's outputs of the two backends are
+compared, so a speedup never hides a different result:
+
+    python benchmarks/backends.py --rows 100k,1m --numeric 40 --categorical 2
+    python benchmarks/backends.py --rows 1m --output backends.json
+
+Time and memory are measured as in suite.py.
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from suite import DEFAULT_DATA_DIR, environment, measure, parse_rows
+from synthetic import add_dataset_arguments, cached_csv, dataset_params
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataprep.backend import BACKENDS  # noqa: E402
+from dataprep.ingest import read_csv, read_csv_table  # noqa: E402
+from dataprep.pipeline import Pipeline  # noqa: E402
+from dataprep.steps import BatchOutlierStep, ImputeStep, OutlierStep  # noqa: E402
+
+
+DEFAULT_ROWS = "100k,1m"
+
+
+def recipe(numeric, text):
+    """Every numeric column imputed and capped, one text column filled, one column's outlier rows removed"""
+    steps = [ImputeStep(column, "Median") for column in numeric]
+    if text:
+        steps.append(ImputeStep(text[0], "Mode"))
+    steps.append(BatchOutlierStep({column: "Cap" for column in numeric[1:]}))
+    steps.append(OutlierStep(numeric[0], "Remove"))
+    return Pipeline(steps)
+
+
+def stages(numeric, text):
+    """Stage name -> function(data, backend)"""
+    column = numeric[0]
+    found = {
+        "profile": lambda data, backend: backend.stats(data),
+        "impute_mean": ImputeStep(column, "Mean").transform,
+        "impute_median": ImputeStep(column, "Median").transform,
+        "impute_mode": ImputeStep(column, "Mode").transform,
+        "outliers_remove": OutlierStep(column, "Remove").transform,
+        "outliers_cap": OutlierStep(column, "Cap").transform,
+        "outliers_replace_with_mean": OutlierStep(column, "Replace with Mean").transform,
+        "batch_outliers_cap": BatchOutlierStep({name: "Cap" for name in numeric}).transform,
+        "recipe": lambda data, backend: recipe(numeric, text).apply(data, backend=backend),
+    }
+    if text:
+        found["impute_unknown"] = ImputeStep(text[0], "Create 'Unknown' category").transform
+    return found
+
+
+def check_same(pandas_result, arrow_result):
+    """Raise if the recipe's outputs of the two backends differ"""
+    converted = arrow_result.to_pandas()
+    if list(converted.columns) != list(pandas_result.columns) or len(converted) != len(pandas_result):
+        raise AssertionError("pandas and arrow backends returned different shapes")
+    for column in pandas_result.columns:
+        expected, actual = pandas_result[column].reset_index(drop=True), converted[column]
+        if expected.dtype.kind == "f" or actual.dtype.kind == "f":
+            same = np.allclose(expected.astype(float), actual.astype(float), equal_nan=True)
+        else:
+            present = expected.notna().to_numpy()
+            same = (np.array_equal(present, actual.notna().to_numpy())
+                    and expected[present].astype(str).tolist() == actual[present].astype(str).tolist())
+        if not same:
+            raise AssertionError(f"pandas and arrow backends disagree on column {column!r}")
+
+
+def run_size(rows, params, data_dir, selected=None, memory=True):
+    path = cached_csv(data_dir, rows, **params)
+    results = {}
+    data = {}
+    for name, load in (("pandas", lambda: read_csv(path)[0]), ("arrow", lambda: read_csv_table(path))):
+        seconds, peak = measure(load, memory=memory)
+        results.setdefault("ingest", {})[name] = {"seconds": seconds, "peak_mb": peak}
+        data[name] = load()
+    _report(rows, "ingest", results["ingest"])
+
+    frame = data["pandas"]
+    numeric = [column for column in frame.columns if frame[column].dtype.kind in "if"]
+    text = [column for column in frame.columns if column not in numeric]
+    backends = {name: BACKENDS[name]() for name in data}
+    check_same(recipe(numeric, text).apply(frame, backend=backends["pandas"]),
+               recipe(numeric, text).apply(data["arrow"], backend=backends["arrow"]))
+
+    for stage, run in stages(numeric, text).items():
+        if selected and stage not in selected:
+            continue
+        for name, backend in backends.items():
+            seconds, peak = measure(lambda: run(data[name], backend), memory=memory)
+            results.setdefault(stage, {})[name] = {"seconds": seconds, "peak_mb": peak}
+        _report(rows, stage, results[stage])
+    return results
+
+
+def _report(rows, stage, timings):
+    pandas, arrow = timings["pandas"], timings["arrow"]
+    speedup = pandas["seconds"] / arrow["seconds"] if arrow["seconds"] else float("inf")
+    line = f"{rows:>10} {stage:<28} {pandas['seconds']:9.3f}s {arrow['seconds']:9.3f}s  x{speedup:5.2f}"
+    if pandas["peak_mb"] is not None:
+        line += f" {pandas['peak_mb']:9.1f} MB {arrow['peak_mb']:9.1f} MB"
+    print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the pandas and Arrow backends")
+    parser.add_argument("--rows", type=parse_rows, default=parse_rows(DEFAULT_ROWS),
+                        help=f"comma-separated sizes, k/m suffixes allowed (default: {DEFAULT_ROWS})")
+    parser.add_argument("--stages", type=lambda text: set(text.split(",")), default=None,
+                        help="only these stages (ingest always runs)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the traced runs that measure peak memory")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where synthetic CSVs are cached")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    add_dataset_arguments(parser)
+    args = parser.parse_args(argv)
+
+    params = dataset_params(args)
+    print(f"{'rows':>10} {'stage':<28} {'pandas':>10} {'arrow':>10} {'speedup':>7}"
+          + ("" if args.no_memory else f" {'pandas peak':>12} {'arrow peak':>12}"))
+    current = {"environment": environment(), "dataset": params, "results": {}}
+    for rows in args.rows:
+        current["results"][str(rows)] = run_size(rows, params, args.data_dir, args.stages,
+                                                     memory=not args.no_memory)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Cold-start import budget for the app
+
+Runs the top-level imports of App.py in fresh interpreters, so nothing is
+already in sys.modules, and exits non-zero when the median import time goes
+over the budget or when a module that should load lazily is imported at
+startup:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --budget 1.2 --runs 9
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "App.py")
+DEFAULT_BUDGET = 1.5
+DEFAULT_RUNS = 5
+# Only the features that need these may import them (streamlit itself already
+# loads plotly.graph_objects for its chart theme, but not plotly.express)
+LAZY_MODULES = ["sklearn", "scipy", "plotly.express", "matplotlib", "seaborn", "pyarrow.parquet"]
+
+PROBE = """
+import sys
+import time
+start = time.perf_counter()
+{imports}
+print(time.perf_counter() - start)
+print(",".join(name for name in {lazy!r} if name in sys.modules))
+"""
+
+
+def app_imports(path=APP):
+    """Source of the import statements at the top level of the app"""
+    with open(path) as f:
+        source = f.read()
+    return "\n".join(ast.get_source_segment(source, node) for node in ast.parse(source).body
+                     if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def measure(imports, runs):
+    """Import times in seconds, one fresh interpreter per run, and the lazy modules loaded"""
+    probe = PROBE.format(imports=imports, lazy=LAZY_MODULES)
+    times, loaded = [], set()
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True,
+                                text=True, check=True)
+        seconds, modules = result.stdout.splitlines()[-2:]
+        times.append(float(seconds))
+        loaded.update(filter(None, modules.split(",")))
+    return times, sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help=f"maximum median import time in seconds (default: {DEFAULT_BUDGET})")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+                        help=f"fresh interpreters to time (default: {DEFAULT_RUNS})")
+    args = parser.parse_args(argv)
+
+    times, loaded = measure(app_imports(), args.runs)
+    median = statistics.median(times)
+    print(f"App.py imports: median {median:.3f}s, min {min(times):.3f}s, max {max(times):.3f}s "
+          f"over {args.runs} runs (budget {args.budget:.3f}s)")
+
+    status = 0
+    if loaded:
+        print(f"FAIL: imported at startup instead of on first use: {', '.join(loaded)}", file=sys.stderr)
+        status = 1
+    if median > args.budget:
+        print(f"FAIL: cold-start imports take {median:.3f}s, over the {args.budget:.3f}s budget", file=sys.stderr)
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
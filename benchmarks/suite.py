@@ -0,0 +1,235 @@
+"""Wall time and peak memory of every preprocessing stage across data sizes
+
+For each size the synthetic CSV is ingested with read_csv, then every stage
+runs on the ingested frame the way the app runs it: profiling, each imputation
+method, each outlier treatment and CSV export. Results go to a JSON file that
+a later run (e.g. on another commit) can be compared against:
+
+    python benchmarks/suite.py --rows 10k,1m,10m --output baseline.json
+    python benchmarks/suite.py --rows 10k,1m --baseline baseline.json --output current.json
+    python benchmarks/suite.py --compare baseline.json current.json
+
+Wall time comes from a plain run of the stage. Peak memory comes from a second,
+traced run: the tracemalloc peak (numpy and pandas buffers included) plus the
+growth of the Arrow memory pool. The stage's inputs are prepared before
+measuring starts.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pyarrow as pa
+
+from synthetic import add_dataset_arguments, cached_csv, dataset_params
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataprep.export import export_frame  # noqa: E402
+from dataprep.ingest import read_csv  # noqa: E402
+from dataprep.profile import DatasetProfile  # noqa: E402
+from dataprep.steps import ImputeStep, OutlierStep  # noqa: E402
+
+# KNN imports scikit-learn on first use; keep that one-off cost out of impute_knn
+import sklearn.neighbors  # noqa: E402,F401
+
+
+DEFAULT_ROWS = "10k,1m,10m"
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "dataprep-benchmarks")
+# A stage regresses when it is this many times slower (or bigger) than the baseline
+DEFAULT_TOLERANCE = 1.25
+# Stages faster than this are too noisy to flag
+MIN_SECONDS = 0.05
+
+
+def parse_rows(text):
+    """'10k,1m,10m' -> [10000, 1000000, 10000000]"""
+    scale = {"k": 1_000, "m": 1_000_000}
+    sizes = []
+    for item in text.lower().split(","):
+        item = item.strip()
+        sizes.append(int(float(item[:-1]) * scale[item[-1]]) if item[-1] in scale else int(item))
+    return sizes
+
+
+def measure(run, setup=None, memory=True):
+    """(seconds, peak MB) of run(setup()), setup not included. tracemalloc slows
+    Python-heavy code a lot, so the time comes from an untraced run and the
+    peak from a second, traced one."""
+    arg = setup() if setup is not None else None
+    start = time.perf_counter()
+    result = run(arg) if setup is not None else run()
+    seconds = time.perf_counter() - start
+    del result, arg
+    if not memory:
+        return seconds, None
+
+    arg = setup() if setup is not None else None
+    pool = pa.default_memory_pool()
+    arrow_before = pool.bytes_allocated()
+    tracemalloc.start()
+    result = run(arg) if setup is not None else run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow_growth = max(0, pool.bytes_allocated() - arrow_before)
+    del result, arg
+    return seconds, (peak + arrow_growth) / 1024 ** 2
+
+
+def stages(df, profile, export_path):
+    """Stage name -> (setup, run) for a frame ingested by read_csv"""
+    numeric = next(col for col in profile.numeric_columns if profile[col]["nulls"])
+    text = next((col for col in profile.columns if col not in profile.numeric_columns), None)
+
+    def step_stage(step):
+        def setup():
+            return df.copy()
+
+        def run(frame):
+            return step.plan(frame, profile).apply(frame)
+
+        return setup, run
+
+    def info():
+        buffer = io.StringIO()
+        df.info(buf=buffer)
+        return buffer.getvalue()
+
+    found = {
+        "profile": (None, lambda: DatasetProfile.from_frame(df)),
+        "info": (None, info),
+        "describe": (None, lambda: df.describe()),
+        "isnull": (None, lambda: df.isnull().sum()),
+        "impute_mean": step_stage(ImputeStep(numeric, "Mean")),
+        "impute_median": step_stage(ImputeStep(numeric, "Median")),
+        "impute_mode": step_stage(ImputeStep(numeric, "Mode")),
+        "impute_knn": step_stage(ImputeStep(numeric, "KNN")),
+        "outliers_remove": step_stage(OutlierStep(numeric, "Remove")),
+        "outliers_cap": step_stage(OutlierStep(numeric, "Cap")),
+        "outliers_replace_with_mean": step_stage(OutlierStep(numeric, "Replace with Mean")),
+        "export_csv": (None, lambda: export_frame(df, export_path, "CSV")),
+    }
+    if text is not None:
+        found["impute_unknown"] = step_stage(ImputeStep(text, "Create 'Unknown' category"))
+    return found
+
+
+def _report(rows, name, seconds, peak):
+    memory = "" if peak is None else f" {peak:9.1f} MB"
+    print(f"{rows:>10} {name:<28} {seconds:9.3f}s{memory}")
+
+
+def run_size(rows, params, data_dir, selected=None, memory=True):
+    path = cached_csv(data_dir, rows, **params)
+    results = {}
+
+    seconds, peak = measure(lambda: read_csv(path), memory=memory)
+    results["ingest"] = {"seconds": seconds, "peak_mb": peak}
+    _report(rows, "ingest", seconds, peak)
+    df, _ = read_csv(path)
+    profile = DatasetProfile.from_frame(df)
+
+    fd, export_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        for name, (setup, run) in stages(df, profile, export_path).items():
+            if selected and name not in selected:
+                continue
+            seconds, peak = measure(run, setup, memory)
+            results[name] = {"seconds": seconds, "peak_mb": peak}
+            _report(rows, name, seconds, peak)
+    finally:
+        os.remove(export_path)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """Print current against baseline per size and stage; returns the regressions"""
+    regressions = []
+    print(f"{'rows':>10} {'stage':<28} {'seconds':>19} {'peak MB':>21}")
+    for rows, stages_now in current["results"].items():
+        for name, now in stages_now.items():
+            before = baseline["results"].get(rows, {}).get(name)
+            if before is None:
+                print(f"{rows:>10} {name:<28} {now['seconds']:9.3f} (new)")
+                continue
+            time_ratio = now["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+            flag = ""
+            if time_ratio > tolerance and now["seconds"] >= MIN_SECONDS:
+                flag += " SLOWER"
+            memory = ""
+            if now["peak_mb"] is not None and before["peak_mb"] is not None:
+                memory = f"{before['peak_mb']:8.1f}->{now['peak_mb']:8.1f}MB"
+                if now["peak_mb"] > tolerance * before["peak_mb"] and now["peak_mb"] - before["peak_mb"] > 1:
+                    flag += " BIGGER"
+            if flag:
+                regressions.append((rows, name, flag.strip()))
+            print(f"{rows:>10} {name:<28} {before['seconds']:8.3f}->{now['seconds']:8.3f}s "
+                  f"{memory:>21}  x{time_ratio:.2f}{flag}")
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every preprocessing stage")
+    parser.add_argument("--rows", type=parse_rows, default=parse_rows(DEFAULT_ROWS),
+                        help=f"comma-separated sizes, k/m suffixes allowed (default: {DEFAULT_ROWS})")
+    parser.add_argument("--stages", type=lambda text: set(text.split(",")), default=None,
+                        help="only these stages (ingest always runs)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the traced runs that measure peak memory")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where synthetic CSVs are cached")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results with this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two result files without running anything")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"ratio over the baseline that counts as a regression (default: {DEFAULT_TOLERANCE})")
+    add_dataset_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(load(args.compare[0]), load(args.compare[1]), args.tolerance) else 0
+
+    params = dataset_params(args)
+    current = {"environment": environment(), "dataset": params, "results": {}}
+    for rows in args.rows:
+        current["results"][str(rows)] = run_size(rows, params, args.data_dir, args.stages,
+                                                     memory=not args.no_memory)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.baseline:
+        return 1 if compare(load(args.baseline), current, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
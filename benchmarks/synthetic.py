@@ -0,0 +1,104 @@
+"""Synthetic datasets for the benchmarks
+
+make_frame builds a frame with normal numeric columns (some values pushed far
+out as outliers) and low-cardinality text columns, with a share of every
+column blanked out as missing. write_csv caches the CSV per parameter set, so
+repeated benchmark runs read the same file:
+
+    python benchmarks/synthetic.py data.csv --rows 1000000 --missing-ratio 0.2
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_NUMERIC = 8
+DEFAULT_CATEGORICAL = 4
+DEFAULT_MISSING_RATIO = 0.1
+DEFAULT_OUTLIER_RATIO = 0.01
+DEFAULT_CARDINALITY = 20
+CHUNK_ROWS = 1_000_000
+
+
+def make_frame(rows, numeric=DEFAULT_NUMERIC, categorical=DEFAULT_CATEGORICAL,
+               missing_ratio=DEFAULT_MISSING_RATIO, outlier_ratio=DEFAULT_OUTLIER_RATIO,
+               cardinality=DEFAULT_CARDINALITY, seed=0):
+    """Frame with numeric columns num_0.. and text columns cat_0.."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(numeric):
+        values = rng.normal(loc=10 * i, scale=1 + i, size=rows)
+        outliers = rng.random(rows) < outlier_ratio
+        values[outliers] += rng.choice([-1, 1], outliers.sum()) * 20 * (1 + i)
+        values[rng.random(rows) < missing_ratio] = np.nan
+        data[f"num_{i}"] = values
+    labels = [f"level_{j}" for j in range(cardinality)]
+    for i in range(categorical):
+        codes = rng.integers(0, cardinality, rows)
+        codes[rng.random(rows) < missing_ratio] = -1
+        data[f"cat_{i}"] = pd.Categorical.from_codes(codes, labels)
+    return pd.DataFrame(data)
+
+
+def csv_name(rows, numeric, categorical, missing_ratio, outlier_ratio, cardinality, seed):
+    return (f"synthetic-{rows}r-{numeric}n-{categorical}c-{missing_ratio}m-"
+            f"{outlier_ratio}o-{cardinality}k-{seed}s.csv")
+
+
+def write_csv(path, rows, numeric=DEFAULT_NUMERIC, categorical=DEFAULT_CATEGORICAL,
+              missing_ratio=DEFAULT_MISSING_RATIO, outlier_ratio=DEFAULT_OUTLIER_RATIO,
+              cardinality=DEFAULT_CARDINALITY, seed=0):
+    """Write a synthetic CSV in chunks of rows, so 10M-row files fit in memory"""
+    with open(path, "w", newline="") as f:
+        for i, start in enumerate(range(0, rows, CHUNK_ROWS)):
+            chunk = make_frame(min(CHUNK_ROWS, rows - start), numeric, categorical, missing_ratio,
+                               outlier_ratio, cardinality, seed + i)
+            chunk.to_csv(f, header=(i == 0), index=False)
+    return path
+
+
+def cached_csv(data_dir, rows, **params):
+    """Path of the synthetic CSV for these parameters, writing it on first use"""
+    params = {"numeric": DEFAULT_NUMERIC, "categorical": DEFAULT_CATEGORICAL,
+              "missing_ratio": DEFAULT_MISSING_RATIO, "outlier_ratio": DEFAULT_OUTLIER_RATIO,
+              "cardinality": DEFAULT_CARDINALITY, "seed": 0, **params}
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, csv_name(rows, **params))
+    if not os.path.exists(path):
+        partial = path + ".partial"
+        write_csv(partial, rows, **params)
+        os.replace(partial, path)
+    return path
+
+
+def add_dataset_arguments(parser):
+    parser.add_argument("--numeric", type=int, default=DEFAULT_NUMERIC, help="numeric columns")
+    parser.add_argument("--categorical", type=int, default=DEFAULT_CATEGORICAL, help="text columns")
+    parser.add_argument("--missing-ratio", type=float, default=DEFAULT_MISSING_RATIO,
+                        help="share of missing values per column")
+    parser.add_argument("--outlier-ratio", type=float, default=DEFAULT_OUTLIER_RATIO,
+                        help="share of outliers per numeric column")
+    parser.add_argument("--cardinality", type=int, default=DEFAULT_CARDINALITY,
+                        help="distinct values per text column")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def dataset_params(args):
+    return {"numeric": args.numeric, "categorical": args.categorical, "missing_ratio": args.missing_ratio,
+            "outlier_ratio": args.outlier_ratio, "cardinality": args.cardinality, "seed": args.seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic CSV for the benchmarks")
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=10_000)
+    add_dataset_arguments(parser)
+    args = parser.parse_args(argv)
+    write_csv(args.output, args.rows, **dataset_params(args))
+    print(f"{args.rows} rows -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
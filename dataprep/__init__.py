@@ -0,0 +1,39 @@
+"""Headless preprocessing engine behind the Data Preprocessing App"""
+from .backend import ArrowBackend, PandasBackend
+from .knn import knn_impute
+from .outliers import DETECTORS, detect_outliers, outlier_page
+from .pipeline import Pipeline
+from .profile import DatasetProfile
+from .steps import (
+    IMPUTATION_METHODS,
+    OUTLIER_METHODS,
+    BatchOutlierStep,
+    ImputeStep,
+    OutlierStep,
+    PruneStep,
+    fill_value,
+    iqr_bounds,
+    outlier_mask,
+    plan_imputations,
+)
+
+__all__ = [
+    "ArrowBackend",
+    "BatchOutlierStep",
+    "DETECTORS",
+    "DatasetProfile",
+    "IMPUTATION_METHODS",
+    "OUTLIER_METHODS",
+    "ImputeStep",
+    "OutlierStep",
+    "PandasBackend",
+    "Pipeline",
+    "PruneStep",
+    "detect_outliers",
+    "fill_value",
+    "iqr_bounds",
+    "knn_impute",
+    "outlier_mask",
+    "outlier_page",
+    "plan_imputations",
+]
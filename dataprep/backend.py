@@ -0,0 +1,293 @@
+"""Columnar execution backends for the imputation, outlier and profiling operations
+
+Steps reach their data through a small set of column operations (null counts,
+reductions, quantiles, masks, fills, clips, row and column filters), so the
+same recipe runs on a pandas frame or on an Arrow table:
+
+    PandasBackend   pandas frames, the engine behind the app and its journal
+    ArrowBackend    pyarrow Tables through pyarrow.compute, never converted to
+                    pandas; on large, mostly numeric data it is faster and
+                    keeps no second copy of the columns it does not touch
+
+Both return new data and leave the input as it was. Pipeline.apply(data,
+backend="arrow") runs a recipe this way; ImputeStep.transform and friends are
+the per-step entry points. KNN imputation needs a pandas frame.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .outliers import DEFAULT_THRESHOLDS, MAD_SCALE
+from .profile import IQR_FACTOR, STAT_COLUMNS, _stats_frame, is_profiled_numeric
+from .steps import as_float64
+from .trace import annotate, traced
+
+
+class Backend:
+    """Column operations the steps run on; subclasses implement the primitives and
+    share the fill value, bounds and profile logic built from them"""
+
+    name = None
+
+    def fill_value(self, data, column, method):
+        """Value filling a column's missing entries for Mean, Median or Mode"""
+        if method == "Mean":
+            return self.mean(data, column)
+        if method == "Median":
+            return self.quantiles(data, column, [0.5])[0]
+        if method == "Mode":
+            return self.mode(data, column)
+        raise ValueError(f"No single fill value for imputation method: {method}")
+
+    def bounds(self, data, column, detector="IQR", threshold=None):
+        """Lower and upper outlier bounds of a numeric column under the IQR, z-score or MAD rule"""
+        if threshold is None:
+            threshold = DEFAULT_THRESHOLDS[detector]
+        if detector == "IQR":
+            q1, q3 = self.quantiles(data, column, [0.25, 0.75])
+            return q1 - threshold * (q3 - q1), q3 + threshold * (q3 - q1)
+        if detector == "Z-score":
+            mean, std = self.mean(data, column), self.std(data, column)
+            return mean - threshold * std, mean + threshold * std
+        if detector == "MAD":
+            median = self.quantiles(data, column, [0.5])[0]
+            mad = MAD_SCALE * self.median_abs_deviation(data, column, median)
+            return median - threshold * mad, median + threshold * mad
+        raise ValueError(f"Unknown outlier detector: {detector}")
+
+    @traced("backend.stats")
+    def stats(self, data, iqr_factor=IQR_FACTOR):
+        """Per-column statistics in the layout of DatasetProfile.stats"""
+        annotate(backend=self.name)
+        rows = self.num_rows(data)
+        records = {}
+        for column in self.columns(data):
+            nulls = self.null_count(data, column)
+            mode, unique = self.mode_and_unique(data, column)
+            record = {
+                "dtype": self.dtype(data, column),
+                "count": rows - nulls,
+                "nulls": nulls,
+                "null_pct": nulls / rows * 100 if rows else 0.0,
+                "mode": mode,
+                "unique": unique,
+                "memory": self.memory(data, column),
+            }
+            if self.is_numeric(data, column):
+                low, high = self.min_max(data, column)
+                q1, median, q3 = self.quantiles(data, column, [0.25, 0.5, 0.75])
+                record.update(mean=self.mean(data, column), std=self.std(data, column), min=low,
+                              q1=q1, median=median, q3=q3, max=high)
+            records[column] = record
+        stats = pd.DataFrame.from_dict(records, orient="index").reindex(columns=STAT_COLUMNS)
+        iqr = stats["q3"] - stats["q1"]
+        stats["lower"] = stats["q1"] - iqr_factor * iqr
+        stats["upper"] = stats["q3"] + iqr_factor * iqr
+        return stats
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class PandasBackend(Backend):
+    """Operations on pandas DataFrames"""
+
+    name = "pandas"
+
+    def num_rows(self, data):
+        return len(data)
+
+    def columns(self, data):
+        return list(data.columns)
+
+    def dtype(self, data, column):
+        return data[column].dtype
+
+    def is_numeric(self, data, column):
+        return is_profiled_numeric(data[column].dtype)
+
+    def null_count(self, data, column):
+        return int(data[column].isna().sum())
+
+    def memory(self, data, column):
+        return int(data[column].memory_usage(deep=True, index=False))
+
+    def mean(self, data, column):
+        return as_float64(data[column]).mean()
+
+    def std(self, data, column):
+        return as_float64(data[column]).std()
+
+    def min_max(self, data, column):
+        return data[column].min(), data[column].max()
+
+    def quantiles(self, data, column, qs):
+        return list(as_float64(data[column]).quantile(qs))
+
+    def median_abs_deviation(self, data, column, center):
+        return (as_float64(data[column]) - center).abs().median()
+
+    def mode(self, data, column):
+        mode = data[column].mode()
+        return mode.iloc[0] if len(mode) else None
+
+    def mode_and_unique(self, data, column):
+        return self.mode(data, column), int(data[column].nunique())
+
+    def stats(self, data, iqr_factor=IQR_FACTOR):
+        # The profiler's block-wise numpy path
+        return _stats_frame(data, iqr_factor)
+
+    def outlier_mask(self, data, column, lower, upper):
+        series = data[column]
+        mask = (series < lower) | (series > upper)
+        return mask.fillna(False).astype(bool) if mask.dtype != bool else mask
+
+    def _with_column(self, data, column, values):
+        out = data.copy(deep=False)
+        out[column] = values
+        return out
+
+    def fill_null(self, data, column, value):
+        series = data[column]
+        if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+            series = series.cat.add_categories([value])
+        return self._with_column(data, column, series.fillna(value))
+
+    def clip(self, data, column, lower, upper):
+        return self._with_column(data, column, data[column].astype(np.float64).clip(lower, upper))
+
+    def replace(self, data, column, mask, value):
+        return self._with_column(data, column, data[column].astype(np.float64).mask(mask, value))
+
+    def drop_rows(self, data, mask):
+        return data[~np.asarray(mask, dtype=bool)]
+
+    def drop_columns(self, data, columns):
+        return data.drop(columns=columns)
+
+    def any(self, mask):
+        return bool(np.any(mask))
+
+    def or_(self, left, right):
+        return np.asarray(left, dtype=bool) | np.asarray(right, dtype=bool)
+
+
+def _as_float(value):
+    return np.nan if value is None else value
+
+
+class ArrowBackend(Backend):
+    """Operations on pyarrow Tables through pyarrow.compute, without pandas"""
+
+    name = "arrow"
+
+    def num_rows(self, data):
+        return data.num_rows
+
+    def columns(self, data):
+        return list(data.column_names)
+
+    def _column(self, data, column):
+        values = data.column(column)
+        if pa.types.is_dictionary(values.type):
+            values = values.cast(values.type.value_type)
+        return values
+
+    def dtype(self, data, column):
+        # The pandas dtype the column converts to, as recorded in pandas profiles
+        return pa.schema([data.schema.field(column)]).empty_table().to_pandas().dtypes.iloc[0]
+
+    def is_numeric(self, data, column):
+        kind = data.schema.field(column).type
+        return pa.types.is_integer(kind) or pa.types.is_floating(kind)
+
+    def null_count(self, data, column):
+        return data.column(column).null_count
+
+    def memory(self, data, column):
+        return data.column(column).nbytes
+
+    def mean(self, data, column):
+        return _as_float(pc.mean(data.column(column)).as_py())
+
+    def std(self, data, column):
+        return _as_float(pc.stddev(data.column(column), ddof=1).as_py())
+
+    def min_max(self, data, column):
+        extremes = pc.min_max(data.column(column))
+        return _as_float(extremes["min"].as_py()), _as_float(extremes["max"].as_py())
+
+    def quantiles(self, data, column, qs):
+        return [_as_float(value) for value in pc.quantile(data.column(column), q=qs).to_pylist()]
+
+    def median_abs_deviation(self, data, column, center):
+        deviation = pc.abs(pc.subtract(pc.cast(data.column(column), pa.float64()), center))
+        return _as_float(pc.quantile(deviation, q=0.5).to_pylist()[0])
+
+    def mode(self, data, column):
+        return self.mode_and_unique(data, column)[0]
+
+    def mode_and_unique(self, data, column):
+        # One hash pass gives both; ties go to the smallest value, like Series.mode()[0]
+        counts = pc.value_counts(self._column(data, column).drop_null())
+        if not len(counts):
+            return None, 0
+        frequency = counts.field("counts")
+        top = pc.filter(counts.field("values"), pc.equal(frequency, pc.max(frequency)))
+        return pc.min(top).as_py(), len(counts)
+
+    def outlier_mask(self, data, column, lower, upper):
+        values = data.column(column)
+        # Missing values compare as null, and are never outliers
+        return pc.fill_null(pc.or_(pc.less(values, lower), pc.greater(values, upper)), False)
+
+    def _with_column(self, data, column, values):
+        return data.set_column(data.schema.get_field_index(column), column, values)
+
+    def fill_null(self, data, column, value):
+        values = self._column(data, column)
+        if pa.types.is_integer(values.type) and isinstance(value, float) and not float(value).is_integer():
+            values = values.cast(pa.float64())
+        return self._with_column(data, column, pc.fill_null(values, pa.scalar(value, type=values.type)))
+
+    def clip(self, data, column, lower, upper):
+        values = pc.cast(data.column(column), pa.float64())
+        clipped = pc.max_element_wise(pc.min_element_wise(values, upper, skip_nulls=False), lower,
+                                      skip_nulls=False)
+        return self._with_column(data, column, clipped)
+
+    def replace(self, data, column, mask, value):
+        values = pc.cast(data.column(column), pa.float64())
+        return self._with_column(data, column, pc.if_else(mask, pa.scalar(value, pa.float64()), values))
+
+    def drop_rows(self, data, mask):
+        return data.filter(pc.invert(mask))
+
+    def drop_columns(self, data, columns):
+        return data.drop_columns(columns)
+
+    def any(self, mask):
+        return bool(pc.any(mask).as_py())
+
+    def or_(self, left, right):
+        return pc.or_(left, right)
+
+
+BACKENDS = {backend.name: backend for backend in (PandasBackend, ArrowBackend)}
+
+
+def get_backend(backend):
+    """A backend instance from its name ("pandas", "arrow"), or the instance itself"""
+    if isinstance(backend, Backend):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    return BACKENDS[backend]()
+
+
+def backend_for(data):
+    """The backend that runs on data as it is"""
+    return ArrowBackend() if isinstance(data, pa.Table) else PandasBackend()
+
@@ -0,0 +1,172 @@
+"""One recipe applied to many CSV files in parallel
+
+Partitioned feeds arrive as many files with the same columns. run_batch sends
+every file through the same recipe in a process pool, one file per task, and
+reports each file as it finishes. A file that fails is reported with its error
+while the others carry on. merge_outputs then concatenates the per-file
+outputs into one file, streaming record batches with the column types unified
+across files (an integer column in one file and float in another becomes
+float).
+
+A fitted recipe (see recipe.py) applies the same stored fill values and
+fences to every file; a plain recipe is fitted on each file separately.
+"""
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+import pyarrow as pa
+
+from .export import EXPORT_FORMATS, export_frame
+from .ingest import convert_options, read_csv
+from .jobs import checkpoint
+from .outofcore import batch_to_frame
+from .pipeline import Pipeline
+from .recipe import RECIPE_FORMAT, FittedRecipe, format_for_path
+
+
+INPUT_SUFFIXES = (".csv", ".csv.gz", ".csv.zst")
+
+
+@dataclass
+class FileResult:
+    source: str
+    output: str
+    rows_in: int
+    rows_out: int
+    seconds: float
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def expand_inputs(patterns):
+    """Files named by paths, directories (their CSV files) and glob patterns, in order without repeats"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(os.path.join(pattern, name) for name in os.listdir(pattern)
+                             if name.endswith(INPUT_SUFFIXES))
+        elif glob.has_magic(pattern):
+            matches = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+        else:
+            matches = [pattern]
+        if not matches:
+            raise ValueError(f"No CSV files match {pattern!r}")
+        files.extend(matches)
+    return list(dict.fromkeys(files))
+
+
+def output_paths(sources, output_dir, fmt="CSV"):
+    """One output path per source in output_dir, named after the source file"""
+    paths, taken = [], set()
+    for source in sources:
+        stem = os.path.basename(source)
+        for suffix in INPUT_SUFFIXES:
+            if stem.endswith(suffix):
+                stem = stem[:-len(suffix)]
+                break
+        name, i = stem, 1
+        while name in taken:
+            i += 1
+            name = f"{stem}-{i}"
+        taken.add(name)
+        paths.append(os.path.join(output_dir, name + EXPORT_FORMATS[fmt]))
+    return paths
+
+
+def process_file(recipe_spec, source, output, fmt="CSV"):
+    """Run one file through a recipe (a fitted or plain recipe dict); never raises"""
+    start = time.perf_counter()
+    try:
+        if recipe_spec.get("format") == RECIPE_FORMAT:
+            report = FittedRecipe.from_dict(recipe_spec).transform_csv(source, output, fmt)
+            rows_in, rows_out = report.rows_in, report.rows_out
+        else:
+            df, load = read_csv(source)
+            rows_in = load.rows
+            rows_out = export_frame(Pipeline.from_dict(recipe_spec).apply(df, inplace=True), output, fmt).rows
+    except Exception as exc:
+        # Any failure stays with its file, so one bad partition does not stop the batch
+        if os.path.exists(output):
+            os.remove(output)
+        return FileResult(source, None, 0, 0, time.perf_counter() - start, f"{type(exc).__name__}: {exc}")
+    return FileResult(source, output, rows_in, rows_out, time.perf_counter() - start)
+
+
+def run_batch(recipe_spec, sources, output_dir, fmt="CSV", workers=None, progress=None):
+    """Process every source file in a pool of worker processes; returns FileResults in
+    source order. progress(result, done, total) is called as each file finishes. In a
+    job, cancelling stops it after the file that finishes next; queued files never start."""
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = output_paths(sources, output_dir, fmt)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sources)))
+    results = {}
+
+    def finished(result):
+        results[result.source] = result
+        if progress is not None:
+            progress(result, len(results), len(sources))
+        checkpoint(len(results) / len(sources), f"{len(results)}/{len(sources)} files")
+
+    if workers == 1:
+        for source, output in zip(sources, outputs):
+            finished(process_file(recipe_spec, source, output, fmt))
+    else:
+        # Spawned workers, since forking a process that runs threads (e.g. a Streamlit
+        # server) can deadlock the children
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {pool.submit(process_file, recipe_spec, source, output, fmt): source
+                       for source, output in zip(sources, outputs)}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as exc:
+                        result = FileResult(futures[future], None, 0, 0, 0.0, f"worker process died: {exc}")
+                    finished(result)
+            except BaseException:
+                # Cancelled (or interrupted): only wait for the files already running
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+    return [results[source] for source in sources]
+
+
+class _MergedStream:
+    """Record batches of several files cast to one schema, shaped for export_frame"""
+
+    def __init__(self, schema, batches):
+        self.schema = schema
+        self._batches = batches
+
+    def iter_frames(self):
+        for batch in self._batches:
+            # Files with no rows (e.g. header-only partitions) only add to the schema
+            if batch.num_rows:
+                yield batch_to_frame(batch)
+
+
+def merge_outputs(paths, output, fmt=None):
+    """Concatenate files written by run_batch (all in one format) into output; returns the rows written"""
+    import pyarrow.dataset as ds
+
+    source_format = format_for_path(paths[0])
+    if source_format == "Parquet":
+        file_format = "parquet"
+    elif source_format == "Feather":
+        file_format = "feather"
+    else:
+        file_format = ds.CsvFileFormat(convert_options=convert_options())
+    schema = pa.unify_schemas([ds.dataset(path, format=file_format).schema for path in paths],
+                              promote_options="permissive")
+    # File by file, so the rows keep the order of paths
+    batches = (batch for path in paths
+               for batch in ds.dataset(path, schema=schema, format=file_format).to_batches())
+    return export_frame(_MergedStream(schema, batches), output, fmt or format_for_path(output)).rows
@@ -0,0 +1,114 @@
+"""Bounded LRU cache for parsed datasets and their profiles
+
+Entries are keyed by the upload's content hash plus a version counter that the
+app bumps on every save, so a key never goes stale: edited data gets a new key
+and the old entries age out of the LRU order.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .trace import span
+
+
+HASH_CHUNK = 8 << 20
+
+
+def content_hash(source):
+    """blake2b hex digest of a path, bytes or file object, read in chunks"""
+    digest = hashlib.blake2b(digest_size=20)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        return digest.hexdigest()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return content_hash(f)
+
+    position = source.tell()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(HASH_CHUNK), b""):
+        digest.update(chunk)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+def sizeof(value):
+    """Approximate size in bytes of a cached value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, tuple):
+        return sum(sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class DatasetCache:
+    """Thread-safe LRU cache bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries=64, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            self._evict()
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, computing and storing it on a miss"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            with span("cache miss", key=key[-1] if isinstance(key, tuple) else key):
+                value = self.put(key, compute())
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _evict(self):
+        # The newest entry always stays, even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,265 @@
+"""Command-line entry point: apply a preprocessing recipe to a CSV without Streamlit
+
+    python -m dataprep run input.csv output.csv --recipe recipe.json
+    python -m dataprep run input.csv output.csv --impute age=Median --outliers income=Cap
+    python -m dataprep run big.csv output.csv.gz --recipe recipe.json --out-of-core
+    python -m dataprep run big.csv output.parquet --recipe recipe.json --backend arrow
+    python -m dataprep outliers input.csv output.csv --column income --method Cap --error 0.005
+    python -m dataprep fit train.csv fitted.json --recipe recipe.json
+    python -m dataprep transform fitted.json next_week.csv output.csv.gz
+    python -m dataprep batch "daily/*.csv" --recipe fitted.json --output-dir cleaned --merged all.parquet
+    python -m dataprep prune input.csv output.parquet --dominant-ratio 0.995
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pyarrow as pa
+
+from .batch import expand_inputs, merge_outputs, run_batch
+from .export import EXPORT_FORMATS, export_frame
+from .backend import BACKENDS
+from .ingest import DEFAULT_BLOCK_SIZE, read_csv, read_csv_table
+from .knn import DEFAULT_K, DEFAULT_MEMORY_BUDGET_MB
+from .outofcore import SpillDataset
+from .pipeline import Pipeline
+from .recipe import FittedRecipe, format_for_path
+from .sketch import DEFAULT_ERROR
+from .steps import OUTLIER_METHODS, ImputeStep, OutlierStep, PruneStep
+from .streaming import stream_outliers
+from .variance import DEFAULT_DOMINANT_RATIO, VARIANCE_THRESHOLD, low_variance_columns
+
+
+def _column_method(text):
+    column, sep, method = text.partition("=")
+    if not sep or not column or not method:
+        raise argparse.ArgumentTypeError(f"expected COLUMN=METHOD, got {text!r}")
+    return column, method
+
+
+def build_pipeline(args):
+    """Recipe file steps first, then the inline --impute/--outliers steps"""
+    pipeline = Pipeline.load(args.recipe) if args.recipe else Pipeline()
+    for column, method in args.impute:
+        pipeline.add(ImputeStep(column, method, k=args.knn_k, features=args.knn_features,
+                                memory_budget_mb=args.memory_budget_mb))
+    for column, method in args.outliers:
+        pipeline.add(OutlierStep(column, method, factor=args.iqr_factor))
+    return pipeline
+
+
+def run_out_of_core(pipeline, args):
+    """Spill the input to disk, apply each step in its own pass over the record batches"""
+    dataset = SpillDataset.from_csv(args.input, spill_dir=args.spill_dir)
+    rows_in = dataset.num_rows
+    for step in pipeline.steps:
+        dataset = dataset.transform([step], spill_dir=args.spill_dir)
+    report = export_frame(dataset, args.output, format_for_path(args.output))
+    return rows_in, report.rows
+
+
+def run(args):
+    pipeline = build_pipeline(args)
+    if not len(pipeline):
+        print("Nothing to do: pass --recipe or at least one --impute/--outliers step", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    if args.out_of_core:
+        rows_in, rows_out = run_out_of_core(pipeline, args)
+    elif args.backend == "arrow":
+        # Arrow table in, Arrow table out: pandas only writes the output chunks
+        table = read_csv_table(args.input)
+        rows_in = table.num_rows
+        table = pipeline.apply(table, backend="arrow")
+        rows_out = export_frame(table, args.output, format_for_path(args.output)).rows
+    else:
+        df, report = read_csv(args.input)
+        rows_in = report.rows
+        df = pipeline.apply(df, inplace=True)
+        rows_out = export_frame(df, args.output, format_for_path(args.output)).rows
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.input}: {rows_in} rows in, {rows_out} rows out, "
+          f"{len(pipeline)} steps, {elapsed:.2f}s -> {args.output}")
+    return 0
+
+
+def fit(args):
+    """Fit a recipe on a CSV and save it with the learned fill values and fences"""
+    pipeline = build_pipeline(args)
+    if not len(pipeline):
+        print("Nothing to fit: pass --recipe or at least one --impute/--outliers step", file=sys.stderr)
+        return 2
+    df, report = read_csv(args.input)
+    recipe = FittedRecipe.fit(pipeline, df)
+    recipe.source["file"] = args.input
+    recipe.save(args.output)
+    print(f"{args.input}: {report.rows} rows, {len(recipe)} fitted steps -> {args.output}")
+    return 0
+
+
+def transform(args):
+    """Stream a CSV through a fitted recipe, block by block, without refitting"""
+    recipe = FittedRecipe.load(args.recipe)
+    report = recipe.transform_csv(args.input, args.output, block_size=int(args.block_size_mb * 1024 ** 2))
+    print(f"{args.input}: {report.rows_in} rows in, {report.rows_out} rows out, "
+          f"{len(recipe)} steps, {report.seconds:.2f}s -> {args.output}")
+    return 0
+
+
+def batch(args):
+    """Apply one recipe to many files in worker processes, reporting each file as it finishes"""
+    with open(args.recipe) as f:
+        recipe_spec = json.load(f)
+    sources = expand_inputs(args.inputs)
+
+    def report(result, done, total):
+        if result.ok:
+            print(f"[{done}/{total}] {result.source}: {result.rows_in} rows in, {result.rows_out} rows out, "
+                  f"{result.seconds:.2f}s -> {result.output}")
+        else:
+            print(f"[{done}/{total}] {result.source}: FAILED {result.error}", file=sys.stderr)
+
+    start = time.perf_counter()
+    results = run_batch(recipe_spec, sources, args.output_dir, args.format, args.workers, progress=report)
+    done = [result for result in results if result.ok]
+    print(f"{len(done)} of {len(results)} files processed in {time.perf_counter() - start:.2f}s")
+    if args.merged and done:
+        rows = merge_outputs([result.output for result in done], args.merged)
+        print(f"merged {len(done)} files, {rows} rows -> {args.merged}")
+    return 0 if len(done) == len(results) else 1
+
+
+def outliers(args):
+    """Larger-than-memory outlier treatment: sketch pass, then streaming rewrite"""
+    report = stream_outliers(args.input, args.output, args.column, args.method,
+                             factor=args.iqr_factor, error=args.error)
+    print(f"{args.input}: fences [{report.lower:.6g}, {report.upper:.6g}], "
+          f"{report.outliers} outliers, {report.rows_in} rows in, {report.rows_out} rows out, "
+          f"{report.seconds:.2f}s -> {args.output}")
+    return 0
+
+
+def prune(args):
+    """Find low-variance columns in one streaming pass; with an output, stream the
+    remaining columns into it"""
+    step = PruneStep(args.variance_threshold, args.dominant_ratio, columns=args.columns)
+    start = time.perf_counter()
+    report = step.scan(args.input)
+    reasons = low_variance_columns(report, step.variance_threshold, step.dominant_ratio)
+    dropped = step.select(report)
+    for column in dropped:
+        print(f"{column}: {reasons[column]}")
+    print(f"{args.input}: {len(dropped)} of {len(report)} columns below the thresholds, "
+          f"{time.perf_counter() - start:.2f}s")
+    if args.output:
+        result = FittedRecipe([step.fitted_entry(dropped)]).transform_csv(args.input, args.output)
+        print(f"{result.rows_out} rows, {len(report) - len(dropped)} columns -> {args.output}")
+    return 0
+
+
+def add_step_arguments(parser):
+    parser.add_argument("--recipe", help="JSON recipe file")
+    parser.add_argument("--impute", action="append", type=_column_method, default=[],
+                        metavar="COLUMN=METHOD", help="fill missing values of a column")
+    parser.add_argument("--outliers", action="append", type=_column_method, default=[],
+                        metavar="COLUMN=METHOD", help="treat IQR outliers of a column")
+    parser.add_argument("--knn-k", type=int, default=DEFAULT_K,
+                        help=f"neighbours used by KNN imputation (default: {DEFAULT_K})")
+    parser.add_argument("--knn-features", type=lambda text: text.split(","), default=None,
+                        metavar="COL,COL,...", help="feature columns for KNN (default: all numeric)")
+    parser.add_argument("--memory-budget-mb", type=float, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help=f"memory budget for KNN query batches (default: {DEFAULT_MEMORY_BUDGET_MB})")
+    parser.add_argument("--iqr-factor", type=float, default=1.5,
+                        help="IQR multiplier for the outlier fences (default: 1.5)")
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="dataprep", description="Headless data preprocessing")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="apply a recipe to a CSV file")
+    run_parser.add_argument("input", help="input CSV file")
+    run_parser.add_argument("output", help="output file; .csv.gz/.csv.zst/.parquet/.feather pick the format")
+    add_step_arguments(run_parser)
+    run_parser.add_argument("--out-of-core", action="store_true",
+                            help="process the input from a memory-mapped spill file, one record batch at a time")
+    run_parser.add_argument("--spill-dir", default=None,
+                            help="directory for out-of-core spill files (default: the temp directory)")
+    run_parser.add_argument("--backend", choices=list(BACKENDS), default="pandas",
+                            help="engine for the in-memory steps; arrow runs them on an Arrow table "
+                                 "with pyarrow.compute (default: pandas; no KNN with arrow)")
+    run_parser.set_defaults(func=run)
+
+    fit_parser = commands.add_parser(
+        "fit", help="fit a recipe on a CSV file and save it with the learned fill values and fences")
+    fit_parser.add_argument("input", help="CSV file to fit on")
+    fit_parser.add_argument("output", help="fitted recipe JSON file to write")
+    add_step_arguments(fit_parser)
+    fit_parser.set_defaults(func=fit)
+
+    transform_parser = commands.add_parser(
+        "transform", help="stream a CSV file through a fitted recipe without refitting")
+    transform_parser.add_argument("recipe", help="fitted recipe JSON file")
+    transform_parser.add_argument("input", help="input CSV file")
+    transform_parser.add_argument("output", help="output file; .csv.gz/.csv.zst/.parquet/.feather pick the format")
+    transform_parser.add_argument("--block-size-mb", type=float, default=DEFAULT_BLOCK_SIZE / 1024 ** 2,
+                                  help=f"CSV bytes per chunk (default: {DEFAULT_BLOCK_SIZE // 1024 ** 2})")
+    transform_parser.set_defaults(func=transform)
+
+    batch_parser = commands.add_parser(
+        "batch", help="apply one recipe to many CSV files in parallel worker processes")
+    batch_parser.add_argument("inputs", nargs="+", help="CSV files, directories or glob patterns")
+    batch_parser.add_argument("--recipe", required=True,
+                              help="fitted recipe (same statistics for every file) or plain recipe (fitted per file)")
+    batch_parser.add_argument("--output-dir", required=True, help="directory for the per-file outputs")
+    batch_parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="CSV",
+                              help="format of the per-file outputs (default: CSV)")
+    batch_parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                              help="worker processes (default: one per CPU)")
+    batch_parser.add_argument("--merged", help="also concatenate the outputs into this file")
+    batch_parser.set_defaults(func=batch)
+
+    outliers_parser = commands.add_parser(
+        "outliers", help="treat IQR outliers of one column in two streaming passes (sketched quartiles)")
+    outliers_parser.add_argument("input", help="input CSV file")
+    outliers_parser.add_argument("output", help="output CSV file (.gz/.zst to compress)")
+    outliers_parser.add_argument("--column", required=True, help="numeric column to treat")
+    outliers_parser.add_argument("--method", required=True, choices=OUTLIER_METHODS)
+    outliers_parser.add_argument("--iqr-factor", type=float, default=1.5,
+                                 help="IQR multiplier for the outlier fences (default: 1.5)")
+    outliers_parser.add_argument("--error", type=float, default=DEFAULT_ERROR,
+                                 help=f"rank error of the quantile sketch (default: {DEFAULT_ERROR})")
+    outliers_parser.set_defaults(func=outliers)
+
+    prune_parser = commands.add_parser(
+        "prune", help="find low-variance columns in one streaming pass and optionally drop them")
+    prune_parser.add_argument("input", help="input CSV file")
+    prune_parser.add_argument("output", nargs="?",
+                              help="write the remaining columns here (.csv.gz/.csv.zst/.parquet/.feather pick "
+                                   "the format); without it, only report")
+    prune_parser.add_argument("--variance-threshold", type=float, default=VARIANCE_THRESHOLD,
+                              help=f"drop numeric columns with at most this variance (default: {VARIANCE_THRESHOLD})")
+    prune_parser.add_argument("--dominant-ratio", type=float, default=DEFAULT_DOMINANT_RATIO,
+                              help="drop columns where one value is at least this share of the non-missing "
+                                   f"entries (default: {DEFAULT_DOMINANT_RATIO})")
+    prune_parser.add_argument("--columns", type=lambda text: text.split(","), default=None,
+                              metavar="COL,COL,...", help="only consider these columns (default: all)")
+    prune_parser.set_defaults(func=prune)
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (KeyError, ValueError, OSError, pa.ArrowException) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
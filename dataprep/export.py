@@ -0,0 +1,201 @@
+"""Streaming dataset export to CSV (plain, gzip, zstd), Parquet and Feather
+
+Frames are written in row chunks straight to a file, so an export never builds
+the whole output as one in-memory string; out-of-core datasets stream their
+record batches the same way.
+"""
+import io
+import os
+import tempfile
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+
+from .jobs import checkpoint
+from .trace import annotate, traced
+
+
+EXPORT_FORMATS = {
+    "CSV": ".csv",
+    "CSV (gzip)": ".csv.gz",
+    "CSV (zstd)": ".csv.zst",
+    "Parquet": ".parquet",
+    "Feather": ".feather",
+}
+MIME_TYPES = {
+    "CSV": "text/csv",
+    "CSV (gzip)": "application/gzip",
+    "CSV (zstd)": "application/zstd",
+    "Parquet": "application/vnd.apache.parquet",
+    "Feather": "application/vnd.apache.arrow.file",
+}
+CHUNK_ROWS = 100_000
+
+
+@dataclass
+class ExportReport:
+    path: str
+    format: str
+    rows: int
+    seconds: float
+    size_bytes: int
+
+
+def _row_chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        checkpoint(start / len(df), "export")
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _checkpointed(frames, rows=None):
+    written = 0
+    for frame in frames:
+        checkpoint(written / rows if rows else None, "export")
+        written += len(frame)
+        yield frame
+
+
+def csv_compression(path):
+    """Compression implied by a CSV file name (.gz / .zst), or None"""
+    path = str(path)
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+@contextmanager
+def open_csv_sink(path, compression=None):
+    """Text stream writing (optionally compressed) CSV to path"""
+    sink = pa.OSFile(str(path), "wb")
+    if compression:
+        sink = pa.CompressedOutputStream(sink, compression)
+    with sink, io.TextIOWrapper(sink, encoding="utf-8", newline="") as text:
+        yield text
+
+
+def _write_csv(chunks, schema, path, compression):
+    rows = 0
+    with open_csv_sink(path, compression) as text:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(text, header=(i == 0), index=False)
+            rows += len(chunk)
+        if rows == 0:
+            pd.DataFrame(columns=schema.names).to_csv(text, index=False)
+    return rows
+
+
+def _record_batch(chunk, schema):
+    # One schema for the whole output, so all-null chunks keep their column types
+    return pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+
+
+def _write_parquet(chunks, schema, path):
+    import pyarrow.parquet as pq
+
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            writer.write_batch(_record_batch(chunk, schema))
+            rows += len(chunk)
+    return rows
+
+
+def _write_feather(chunks, schema, path):
+    rows = 0
+    options = pa.ipc.IpcWriteOptions(compression="lz4")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for chunk in chunks:
+            writer.write_batch(_record_batch(chunk, schema))
+            rows += len(chunk)
+    return rows
+
+
+@traced("export")
+def export_frame(df, path, fmt="CSV", chunk_rows=CHUNK_ROWS):
+    """Write df to path in the given format, chunk by chunk; returns an ExportReport
+
+    df is a DataFrame, an Arrow table, or a dataset that streams its rows as
+    frames through .schema (an Arrow schema) and .iter_frames(), such as an
+    out-of-core SpillDataset.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    annotate(format=fmt)
+
+    start = time.perf_counter()
+    if isinstance(df, pd.DataFrame):
+        schema, chunks = pa.Schema.from_pandas(df, preserve_index=False), _row_chunks(df, chunk_rows)
+    elif isinstance(df, pa.Table):
+        frames = (batch.to_pandas() for batch in df.to_batches(max_chunksize=chunk_rows))
+        schema, chunks = df.schema, _checkpointed(frames, df.num_rows)
+    else:
+        schema, chunks = df.schema, _checkpointed(df.iter_frames(), getattr(df, "num_rows", None))
+    if fmt == "CSV":
+        rows = _write_csv(chunks, schema, path, None)
+    elif fmt == "CSV (gzip)":
+        rows = _write_csv(chunks, schema, path, "gzip")
+    elif fmt == "CSV (zstd)":
+        rows = _write_csv(chunks, schema, path, "zstd")
+    elif fmt == "Parquet":
+        rows = _write_parquet(chunks, schema, path)
+    elif fmt == "Feather":
+        rows = _write_feather(chunks, schema, path)
+
+    return ExportReport(
+        path=str(path),
+        format=fmt,
+        rows=rows,
+        seconds=time.perf_counter() - start,
+        size_bytes=os.path.getsize(path),
+    )
+
+
+def export_to_tempfile(df, fmt="CSV", prefix="export-", chunk_rows=CHUNK_ROWS):
+    """Export into a new temporary file; the caller removes it when done"""
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=EXPORT_FORMATS[fmt])
+    os.close(fd)
+    try:
+        return export_frame(df, path, fmt, chunk_rows)
+    except Exception:
+        os.remove(path)
+        raise
+
+
+def remove_file(path):
+    """Remove a file if it still exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_files(paths):
+    for path in list(paths):
+        remove_file(path)
+    paths.clear()
+
+
+class TempFiles:
+    """Temporary export files held by one session; whatever is left is removed
+    when the session resets (clear) or the object is garbage collected"""
+
+    def __init__(self):
+        self.paths = set()
+        weakref.finalize(self, _remove_files, self.paths)
+
+    def add(self, path):
+        self.paths.add(path)
+        return path
+
+    def remove(self, path):
+        self.paths.discard(path)
+        remove_file(path)
+
+    def clear(self):
+        _remove_files(self.paths)
@@ -0,0 +1,150 @@
+"""Process-wide memory budget for the sessions' working frames
+
+Every session registers its Journal with one MemoryGovernor. After each change
+the governor re-measures that session; when the sessions together hold more
+than the budget, the least recently used idle sessions have their working
+frames spilled to Parquet files until the total fits again. A spilled journal
+reads its frame back on the next access to .df, so sessions never notice
+beyond the reload time. Journals are held by weak reference, so a session that
+ends simply drops out (and its spill file is removed).
+"""
+import collections
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+import pandas as pd
+
+
+DEFAULT_BUDGET_MB = 4096
+# Sessions used more recently than this are never spilled
+DEFAULT_MIN_IDLE_SECONDS = 30
+SPILL_PREFIX = "dataprep-session-"
+
+
+class _Session:
+    def __init__(self, journal, on_close):
+        self.journal = weakref.ref(journal, on_close)
+        self.bytes = 0
+        self.last_access = time.monotonic()
+        self.spill_path = None
+        self.spills = 0
+
+
+class MemoryGovernor:
+    """Tracks the bytes held by each session and spills idle sessions in LRU order"""
+
+    def __init__(self, budget_bytes, spill_dir=None, min_idle_seconds=DEFAULT_MIN_IDLE_SECONDS):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self.min_idle_seconds = min_idle_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+        # Sessions whose journal was collected, forgotten on the next locked call
+        self._closed = collections.deque()
+
+    def track(self, session_id, journal):
+        """Start governing a session's journal (replacing any earlier one)"""
+        def on_close(_, session_id=session_id):
+            # Runs wherever the journal happens to be collected, which can be inside
+            # one of this governor's locked sections; so only queue the session
+            self._closed.append(session_id)
+
+        with self._lock:
+            self._reap()
+            if session_id in self._sessions:
+                self._forget(session_id)
+            self._sessions[session_id] = _Session(journal, on_close)
+        self.touch(session_id, measure=True)
+
+    def touch(self, session_id, measure=False):
+        """Record an access; with measure=True (after a change) re-measure the
+        session and spill others if the total is over budget"""
+        with self._lock:
+            self._reap()
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session.last_access = time.monotonic()
+            journal = session.journal()
+            if journal is not None and session.spill_path is not None and not journal.spilled:
+                # Read back since the last spill, so it holds memory again
+                session.spill_path = None
+                measure = True
+        if measure and journal is not None:
+            size = journal.memory_bytes
+            with self._lock:
+                session.bytes = size
+            self.enforce(active=session_id)
+
+    def _reap(self):
+        """Forget the sessions queued by on_close; called with the lock held"""
+        while self._closed:
+            session_id = self._closed.popleft()
+            session = self._sessions.get(session_id)
+            if session is not None and session.journal() is None:
+                self._forget(session_id)
+
+    def _forget(self, session_id):
+        session = self._sessions.pop(session_id)
+        if session.spill_path and os.path.exists(session.spill_path):
+            os.remove(session.spill_path)
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(session.bytes for session in self._sessions.values())
+
+    def enforce(self, active=None):
+        """Spill least recently used idle sessions until the total fits the budget"""
+        now = time.monotonic()
+        with self._lock:
+            self._reap()
+            candidates = sorted(
+                (session.last_access, session_id) for session_id, session in self._sessions.items()
+                if session_id != active and session.bytes
+                and now - session.last_access >= self.min_idle_seconds
+            )
+        for _, session_id in candidates:
+            if self.total_bytes <= self.budget_bytes:
+                break
+            self._spill(session_id)
+
+    def _spill(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            journal = None if session is None else session.journal()
+        if journal is None or journal.spilled:
+            return False
+        fd, path = tempfile.mkstemp(prefix=SPILL_PREFIX, suffix=".parquet", dir=self.spill_dir)
+        os.close(fd)
+        if not journal.spill(path):
+            os.remove(path)
+            return False
+        with self._lock:
+            session.spill_path = path
+            session.spills += 1
+            session.bytes = journal.memory_bytes
+        return True
+
+    def usage(self):
+        """One row per session: bytes held, whether the frame is spilled, idle time"""
+        now = time.monotonic()
+        with self._lock:
+            self._reap()
+            sessions = list(self._sessions.items())
+        rows = []
+        for session_id, session in sessions:
+            journal = session.journal()
+            if journal is None:
+                continue
+            rows.append({
+                "Session": session_id,
+                "Memory (MB)": session.bytes / 1024 ** 2,
+                "State": "spilled" if journal.spilled else "in memory",
+                "Idle (s)": round(now - session.last_access),
+                "Spills": session.spills,
+            })
+        return pd.DataFrame(rows, columns=["Session", "Memory (MB)", "State", "Idle (s)", "Spills"])
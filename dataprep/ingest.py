@@ -0,0 +1,156 @@
+"""Chunked CSV ingestion on the pyarrow engine with dtype downcasting"""
+import os
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from .jobs import checkpoint
+from .optimize import CATEGORY_RATIO, downcast_numeric
+from .trace import traced
+
+DEFAULT_BLOCK_SIZE = 16 << 20
+# Same missing-value markers as pd.read_csv, including empty fields in string columns
+NULL_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+               "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+
+def convert_options(columns=None, column_types=None):
+    """pyarrow CSV conversion options, optionally parsing only some columns or fixing their types"""
+    return pacsv.ConvertOptions(null_values=NULL_VALUES, strings_can_be_null=True,
+                                include_columns=list(columns) if columns else None,
+                                column_types=column_types)
+
+
+@dataclass
+class LoadReport:
+    rows: int
+    columns: int
+    seconds: float
+    memory_bytes: int
+
+
+def _source_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, "size", None)
+    if size is None and hasattr(source, "seek"):
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+    return size
+
+
+def iter_batches(source, block_size=DEFAULT_BLOCK_SIZE, progress=None, columns=None, column_types=None):
+    """Stream a CSV as Arrow record batches, reporting the fraction of bytes read"""
+    size = _source_size(source)
+    handle = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        reader = pacsv.open_csv(handle, read_options=pacsv.ReadOptions(block_size=block_size),
+                                convert_options=convert_options(columns, column_types))
+        for batch in reader:
+            fraction = min(handle.tell() / size, 1.0) if size else None
+            if progress is not None and fraction is not None:
+                progress(fraction)
+            checkpoint(fraction, "read")
+            yield batch
+    finally:
+        if handle is not source:
+            handle.close()
+
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def csv_columns(source):
+    """Column names from a CSV's header, also when it has no rows"""
+    _rewind(source)
+    handle = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        return pacsv.open_csv(handle, convert_options=convert_options()).schema.names
+    finally:
+        if handle is not source:
+            handle.close()
+        else:
+            _rewind(source)
+
+
+def widened_types(source, block_size=DEFAULT_BLOCK_SIZE, column_types=None):
+    """column_types for reading a CSV again after the types inferred from its first
+    block did not hold further down the file. Reading the whole file to infer them
+    would defeat streaming, so the first block's other integer columns become
+    float64 and its all-missing ones strings; a file object is rewound."""
+    types = dict(column_types or {})
+    _rewind(source)
+    first = next(iter_batches(source, block_size, column_types=column_types), None)
+    _rewind(source)
+    for field in [] if first is None else first.schema:
+        if field.name in types:
+            continue
+        if pa.types.is_integer(field.type):
+            types[field.name] = pa.float64()
+        elif pa.types.is_null(field.type):
+            types[field.name] = pa.string()
+    return types
+
+
+def _encode_strings(table, category_ratio):
+    """Dictionary-encode low-cardinality string columns, leave the rest as Arrow strings"""
+    rows = max(table.num_rows, 1)
+    for i, field in enumerate(table.schema):
+        if not (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            continue
+        column = table.column(i)
+        if pc.count_distinct(column).as_py() / rows < category_ratio:
+            table = table.set_column(i, field.name, pc.dictionary_encode(column))
+    return table
+
+
+def table_to_frame(table, category_ratio=CATEGORY_RATIO):
+    """Arrow table to a compact pandas frame"""
+    table = _encode_strings(table, category_ratio)
+    df = table.to_pandas(
+        types_mapper={pa.string(): pd.StringDtype("pyarrow"),
+                      pa.large_string(): pd.StringDtype("pyarrow")}.get,
+        self_destruct=True,
+    )
+    return downcast_numeric(df)
+
+
+@traced("read_csv_table")
+def read_csv_table(source, block_size=DEFAULT_BLOCK_SIZE, progress=None):
+    """Read a CSV path or file object in chunks into an Arrow table, without pandas"""
+    try:
+        batches = list(iter_batches(source, block_size, progress))
+    except pa.ArrowInvalid:
+        # Types inferred from the first block did not hold further down the file,
+        # so fall back to a single read that infers types over the whole input
+        batches = None
+    if batches:
+        table = pa.Table.from_batches(batches)
+    else:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        table = pacsv.read_csv(source, convert_options=convert_options())
+    if progress is not None:
+        progress(1.0)
+    return table
+
+
+@traced("read_csv")
+def read_csv(source, block_size=DEFAULT_BLOCK_SIZE, category_ratio=CATEGORY_RATIO, progress=None):
+    """Read a CSV path or file object in chunks; returns (dataframe, LoadReport)"""
+    start = time.perf_counter()
+    df = table_to_frame(read_csv_table(source, block_size, progress), category_ratio)
+    report = LoadReport(
+        rows=len(df),
+        columns=len(df.columns),
+        seconds=time.perf_counter() - start,
+        memory_bytes=int(df.memory_usage(deep=True).sum()),
+    )
+    return df, report
@@ -0,0 +1,212 @@
+"""Background jobs: heavy operations off the thread that runs the app's script
+
+A JobRunner runs functions in a thread pool and hands back a Job at once. The
+script keeps rerunning while the job works, showing job.progress, and picks up
+job.result once it is done. Engine loops (CSV blocks, profile columns, KNN
+query batches, outlier column blocks, export chunks) call checkpoint(), which
+reports progress to the job running on the current thread and raises
+JobCancelled once cancel() was requested, so a cancelled job stops at its next
+loop iteration. Outside a job checkpoint() is one thread-local lookup. A job's
+spans join the trace recording of the run that submitted it. A job's cleanup,
+if set, releases a result nobody will collect (e.g. removes the file an export
+wrote) when the job is discarded or its result expires.
+
+    runner = JobRunner(max_workers=2)
+    job = runner.submit("Export", export_to_tempfile, df, "Parquet")
+    ...
+    if job.done:
+        report = runner.collect(job.id).result
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from .trace import bind as bind_trace
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+# Finished jobs nobody collected (e.g. their session closed) are dropped after this long
+DEFAULT_RESULT_TTL = 3600
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by the first checkpoint after cancel()"""
+
+
+class Job:
+    """One background operation; labels are free-form context set by the submitter"""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.labels = {}
+        self.status = QUEUED
+        self.progress = 0.0
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        # Called with the result of a job that is discarded or expires uncollected
+        self.cleanup = None
+        self.discarded = False
+        self._cancel = threading.Event()
+        self._released = False
+        self._release_lock = threading.Lock()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def release(self):
+        """Run cleanup on the result, once, if the job produced one"""
+        with self._release_lock:
+            if self._released or self.status != DONE:
+                return
+            self._released = True
+        if self.cleanup is not None:
+            self.cleanup(self.result)
+
+    def report(self, fraction=None, stage=None):
+        if fraction is not None:
+            self.progress = min(max(float(fraction), 0.0), 1.0)
+        if stage is not None:
+            self.stage = stage
+
+    def __repr__(self):
+        return f"Job({self.name!r}, {self.id}, {self.status}, {self.progress:.0%})"
+
+
+class JobRunner:
+    """Thread pool running Jobs, with the jobs kept by id until collected"""
+
+    def __init__(self, max_workers=None, result_ttl=DEFAULT_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dataprep-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in the pool; returns its Job"""
+        job = Job(name)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, bind_trace(func), args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job.status, job.finished = CANCELLED, time.monotonic()
+            return
+        _local.job = job
+        job.status, job.started = RUNNING, time.monotonic()
+        try:
+            job.result = func(*args, **kwargs)
+            job.progress = 1.0
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as exc:
+            job.error = exc
+            job.status = FAILED
+        finally:
+            job.finished = time.monotonic()
+            _local.job = None
+            if job.discarded:
+                job.release()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def collect(self, job_id):
+        """Remove a finished job and return it (None while it runs or when unknown)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.done:
+                return None
+            return self._jobs.pop(job_id)
+
+    def discard(self, job_id):
+        """Cancel a job and forget it; a result it has produced, or still produces
+        despite the cancel, is released"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return
+        job.cancel()
+        # Set before reading done: either this call or the job's own thread releases
+        job.discarded = True
+        if job.done:
+            job.release()
+
+    def _prune(self):
+        now = time.monotonic()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.done and now - job.finished > self.result_ttl]:
+            self._jobs.pop(job_id).release()
+
+    @property
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self):
+        for job in self.jobs:
+            job.cancel()
+        self._pool.shutdown(wait=True)
+
+
+def current_job():
+    return getattr(_local, "job", None)
+
+
+def checkpoint(fraction=None, stage=None):
+    """Report progress to the job running on this thread, and stop it if it was cancelled"""
+    job = getattr(_local, "job", None)
+    if job is None:
+        return
+    job.report(fraction, stage)
+    if job.cancel_requested:
+        raise JobCancelled(job.id)
+
+
+def bind(func):
+    """func, run under the current thread's job and trace recording from whichever
+    thread calls it (e.g. a pool)"""
+    func = bind_trace(func)
+    job = current_job()
+    if job is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _local.job = job
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.job = None
+    return wrapper
@@ -0,0 +1,541 @@
+"""Operation journal: steps recorded as deltas against a single working frame
+
+A delta holds only what an operation changes (new values for some cells of a
+column, the rows or columns it drops, or new storage types for columns)
+together with what it overwrote, so previews can be built from the first few
+rows, commits happen in place and undo/redo costs the size of the change
+rather than a full copy of the data. apply() and revert() return the resulting
+frame; only reverting a row drop builds a new one.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .trace import traced
+
+
+DEFAULT_HISTORY = 20
+
+
+def _widen_for(series, values):
+    """Series with a dtype that can hold values (new categories, int -> float, float32 -> float64)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        new = pd.Index(pd.unique(pd.Series(values).dropna())).difference(series.cat.categories)
+        if len(new):
+            return series.cat.add_categories(new)
+    elif pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_integer_dtype(np.asarray(values).dtype):
+        return series.astype("float64")
+    elif series.dtype == np.float32 and np.asarray(values).dtype == np.float64:
+        # Ingest stores floats as float32 when lossless; fills and fences are float64
+        return series.astype("float64")
+    return series
+
+
+def set_cells(df, column, positions, values):
+    """Write values at row positions of one column, in place"""
+    series = df[column]
+    widened = _widen_for(series, values)
+    if widened is not series:
+        df[column] = widened
+    df.iloc[positions, df.columns.get_loc(column)] = values
+
+
+class CellDelta:
+    """New values for some cells of one column, keeping the old ones for undo"""
+
+    # Recipe entries of the step that planned the delta, with the statistics it
+    # learned (see recipe.py); None when the step cannot be replayed from them
+    fitted = None
+    # The steps that planned the delta, to plan it again on other data (e.g. the
+    # full upload behind a sample); None when no step did
+    steps = None
+
+    def __init__(self, column, positions, new_values, old_values, old_dtype):
+        self.column = column
+        self.positions = np.asarray(positions, dtype=np.intp)
+        self.new_values = new_values
+        self.old_values = old_values
+        self.old_dtype = old_dtype
+
+    @classmethod
+    def from_positions(cls, df, column, positions, new_values):
+        """Delta writing new_values (scalar or one per position) at row positions of column"""
+        positions = np.asarray(positions, dtype=np.intp)
+        series = df[column]
+        if isinstance(series.dtype, np.dtype):
+            # Plain numpy column: index its array directly rather than through a pandas take
+            old_values = series.to_numpy()[positions]
+        else:
+            old_values = series.iloc[positions].to_numpy(copy=True)
+        if np.ndim(new_values) == 0:
+            new_values = np.full(len(positions), new_values, dtype=np.asarray(new_values).dtype)
+        return cls(column, positions, np.asarray(new_values), old_values, series.dtype)
+
+    @classmethod
+    def from_mask(cls, df, column, mask, new_values):
+        """Delta writing new_values (scalar or one per masked row) where mask is True"""
+        return cls.from_positions(df, column, np.flatnonzero(np.asarray(mask, dtype=bool)), new_values)
+
+    @property
+    def columns(self):
+        return [self.column]
+
+    @property
+    def changed_cells(self):
+        return len(self.positions)
+
+    @property
+    def nbytes(self):
+        return self.positions.nbytes + self.new_values.nbytes + self.old_values.nbytes
+
+    def apply(self, df):
+        if len(self.positions):
+            set_cells(df, self.column, self.positions, self.new_values)
+        return df
+
+    def revert(self, df):
+        if len(self.positions):
+            set_cells(df, self.column, self.positions, self.old_values)
+        if df[self.column].dtype != self.old_dtype:
+            df[self.column] = df[self.column].astype(self.old_dtype)
+        return df
+
+    def apply_to_rows(self, view, rows):
+        """Apply the part of the delta that falls on view, a copy of the frame's rows at
+        the sorted positions rows"""
+        shown = np.isin(self.positions, rows)
+        if shown.any():
+            set_cells(view, self.column, np.searchsorted(rows, self.positions[shown]), self.new_values[shown])
+
+    def apply_to_head(self, head):
+        self.apply_to_rows(head, np.arange(len(head)))
+
+    def preview(self, df, n=5):
+        head = df.iloc[:n].copy()
+        self.apply_to_head(head)
+        return head
+
+    def applied(self, df):
+        return self.apply(df.copy())
+
+    def __repr__(self):
+        return f"CellDelta({self.column!r}, {self.changed_cells} cells)"
+
+
+class RowDropDelta:
+    """Rows removed from the frame; the dropped rows are kept for undo
+
+    column names the column whose values selected the rows, or is None when
+    several columns did.
+    """
+
+    fitted = None
+    steps = None
+
+    def __init__(self, column, positions):
+        self.column = column
+        self.positions = np.asarray(positions, dtype=np.intp)
+        self.dropped = None
+        self.order = None
+        # Per-column null counts and memory of the dropped rows, for incremental profiles
+        self.dropped_nulls = None
+        self.dropped_memory = None
+
+    @classmethod
+    def from_mask(cls, column, mask):
+        return cls(column, np.flatnonzero(np.asarray(mask, dtype=bool)))
+
+    @property
+    def columns(self):
+        return [] if self.column is None else [self.column]
+
+    @property
+    def changed_cells(self):
+        return len(self.positions)
+
+    @property
+    def nbytes(self):
+        dropped = 0 if self.dropped is None else int(self.dropped.memory_usage(deep=True).sum())
+        return self.positions.nbytes + dropped
+
+    def apply(self, df):
+        if len(self.positions):
+            self.order = df.index
+            self.dropped = df.iloc[self.positions].copy()
+            self.dropped_nulls = self.dropped.isna().sum()
+            self.dropped_memory = self.dropped.memory_usage(deep=True, index=False)
+            df.drop(df.index[self.positions], inplace=True)
+        return df
+
+    def revert(self, df):
+        """Frame with the dropped rows back in their original places (a new frame)"""
+        if self.dropped is None:
+            return df
+        restored = pd.concat([df, self.dropped]).reindex(self.order)
+        self.dropped = self.order = None
+        return restored
+
+    def kept_head_positions(self, df, n=5):
+        kept = np.ones(min(len(df), n + len(self.positions)), dtype=bool)
+        kept[self.positions[self.positions < len(kept)]] = False
+        return np.flatnonzero(kept)[:n]
+
+    def preview(self, df, n=5):
+        return df.iloc[self.kept_head_positions(df, n)]
+
+    def applied(self, df):
+        return df.drop(df.index[self.positions])
+
+    def __repr__(self):
+        return f"RowDropDelta({self.column!r}, {len(self.positions)} rows)"
+
+
+class ColumnDropDelta:
+    """Whole columns removed from the frame; the dropped columns are kept for undo"""
+
+    fitted = None
+    steps = None
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.dropped = None
+        self.order = None
+
+    @property
+    def columns(self):
+        return list(self.names)
+
+    @property
+    def changed_cells(self):
+        return 0
+
+    @property
+    def nbytes(self):
+        if self.dropped is None:
+            return 0
+        return sum(int(series.memory_usage(deep=True, index=False)) for series in self.dropped.values())
+
+    def apply(self, df):
+        if self.names:
+            self.order = list(df.columns)
+            self.dropped = {name: df[name].copy() for name in self.names}
+            df.drop(columns=self.names, inplace=True)
+        return df
+
+    def revert(self, df):
+        """Frame with the dropped columns back in their original places"""
+        if self.dropped is None:
+            return df
+        for position, name in sorted((self.order.index(name), name) for name in self.names):
+            df.insert(position, name, self.dropped[name])
+        self.dropped = self.order = None
+        return df
+
+    def preview(self, df, n=5):
+        return df.iloc[:n].drop(columns=self.names)
+
+    def applied(self, df):
+        return df.drop(columns=self.names)
+
+    def __repr__(self):
+        return f"ColumnDropDelta({len(self.names)} columns)"
+
+
+class DtypeDelta:
+    """Storage type changes of whole columns, each reversible without keeping the old data
+
+    conversions maps a column to (old_dtype, new_dtype, labels); labels is None
+    for plain casts, or maps True/False back to the original strings of a column
+    converted to booleans.
+    """
+
+    # Storage types only; there is nothing for a recipe to replay
+    fitted = []
+    steps = None
+
+    def __init__(self, conversions, label=None):
+        self.conversions = dict(conversions)
+        self.label = label
+
+    @property
+    def columns(self):
+        return list(self.conversions)
+
+    @property
+    def changed_cells(self):
+        return 0
+
+    @property
+    def nbytes(self):
+        return 0
+
+    @staticmethod
+    def _convert(series, dtype, labels):
+        if labels is not None:
+            series = series.map({text: flag for flag, text in labels.items()})
+        return series.astype(dtype)
+
+    def apply(self, df):
+        for column, (_, new_dtype, labels) in self.conversions.items():
+            df[column] = self._convert(df[column], new_dtype, labels)
+        return df
+
+    def revert(self, df):
+        for column, (old_dtype, _, labels) in self.conversions.items():
+            series = df[column]
+            if labels is not None:
+                series = series.astype(object).map(labels)
+            df[column] = series.astype(old_dtype)
+        return df
+
+    def preview(self, df, n=5):
+        return self.apply(df.iloc[:n].copy())
+
+    def applied(self, df):
+        return self.apply(df.copy())
+
+    def __repr__(self):
+        return f"DtypeDelta({len(self.conversions)} columns)"
+
+
+class DeltaGroup:
+    """Several deltas planned together and committed or undone as one
+
+    Cell deltas come first; at most one row drop may close the group, so every
+    delta's row positions refer to the frame as it was planned.
+    """
+
+    def __init__(self, deltas, label=None):
+        self.deltas = list(deltas)
+        if any(isinstance(delta, RowDropDelta) for delta in self.deltas[:-1]):
+            raise ValueError("A row drop can only be the last delta of a group")
+        self.label = label
+        self._fitted = None
+        self._steps = None
+
+    @property
+    def fitted(self):
+        """The group's recipe entries: set by the planner, or else those of its deltas"""
+        if self._fitted is not None:
+            return self._fitted
+        entries = [delta.fitted for delta in self.deltas]
+        if any(entry is None for entry in entries):
+            return None
+        return [spec for entry in entries for spec in entry]
+
+    @fitted.setter
+    def fitted(self, entries):
+        self._fitted = entries
+
+    @property
+    def steps(self):
+        """The steps that planned the group: set by the planner, or else those of its deltas"""
+        if self._steps is not None:
+            return self._steps
+        steps = [delta.steps for delta in self.deltas]
+        if any(step is None for step in steps):
+            return None
+        return [step for planned in steps for step in planned]
+
+    @steps.setter
+    def steps(self, steps):
+        self._steps = steps
+
+    @property
+    def columns(self):
+        return [column for delta in self.deltas for column in delta.columns]
+
+    @property
+    def changed_cells(self):
+        return sum(delta.changed_cells for delta in self.deltas)
+
+    @property
+    def nbytes(self):
+        return sum(delta.nbytes for delta in self.deltas)
+
+    def apply(self, df):
+        for delta in self.deltas:
+            df = delta.apply(df)
+        return df
+
+    def revert(self, df):
+        for delta in reversed(self.deltas):
+            df = delta.revert(df)
+        return df
+
+    def preview(self, df, n=5):
+        cells = self.deltas
+        rows = np.arange(min(n, len(df)))
+        if cells and isinstance(cells[-1], RowDropDelta):
+            rows = cells[-1].kept_head_positions(df, n)
+            cells = cells[:-1]
+        view = df.iloc[rows].copy()
+        for delta in cells:
+            delta.apply_to_rows(view, rows)
+        return view
+
+    def applied(self, df):
+        return self.apply(df.copy())
+
+    def __repr__(self):
+        return f"DeltaGroup({self.deltas!r})"
+
+
+class Journal:
+    """The working frame plus the deltas committed to it, with undo/redo
+
+    A journal built with owned=False (e.g. on a frame shared through a cache)
+    copies the frame once, on the first commit, before writing to it. spill()
+    moves the frame to a Parquet file to free memory; the next access to .df
+    reads it back.
+    """
+
+    def __init__(self, df, owned=True, max_history=DEFAULT_HISTORY):
+        self._df = df
+        self.owned = owned
+        self.max_history = max_history
+        self.done = []
+        self.undone = []
+        # Recipe entries and steps of changes that fell out of the undo history
+        self.trimmed_fitted = []
+        self.trimmed_steps = []
+        self.trimmed_labels = {}
+        self.spill_path = None
+        self._spilled_dtypes = None
+        self._lock = threading.RLock()
+
+    @property
+    def df(self):
+        with self._lock:
+            if self._df is None:
+                self._restore()
+            return self._df
+
+    @df.setter
+    def df(self, df):
+        with self._lock:
+            self._df = df
+
+    @property
+    def spilled(self):
+        return self._df is None
+
+    def _own(self):
+        if not self.owned:
+            self.df = self.df.copy()
+            self.owned = True
+
+    @traced("journal.commit")
+    def commit(self, delta):
+        with self._lock:
+            self._own()
+            self.df = delta.apply(self.df)
+            self.done.append(delta)
+            self.trimmed_fitted.extend(old.fitted for old in self.done[:-self.max_history])
+            self.trimmed_steps.extend(old.steps for old in self.done[:-self.max_history])
+            self.trimmed_labels = self._labels(self.done[:-self.max_history], self.trimmed_labels)
+            del self.done[:-self.max_history]
+            self.undone.clear()
+            return delta
+
+    @traced("journal.undo")
+    def undo(self):
+        with self._lock:
+            delta = self.done.pop()
+            self.df = delta.revert(self.df)
+            self.undone.append(delta)
+            return delta
+
+    @traced("journal.redo")
+    def redo(self):
+        with self._lock:
+            delta = self.undone.pop()
+            self.df = delta.apply(self.df)
+            self.done.append(delta)
+            return delta
+
+    @property
+    def can_undo(self):
+        return bool(self.done)
+
+    @property
+    def can_redo(self):
+        return bool(self.undone)
+
+    @property
+    def fitted_steps(self):
+        """Recipe entries of the committed changes in order, or None when one of them
+        (e.g. a KNN fill) cannot be replayed from learned statistics"""
+        entries = self.trimmed_fitted + [delta.fitted for delta in self.done]
+        if any(entry is None for entry in entries):
+            return None
+        return [spec for entry in entries for spec in entry]
+
+    @staticmethod
+    def _labels(deltas, labels):
+        labels = dict(labels)
+        for delta in deltas:
+            for column, (_, _, column_labels) in getattr(delta, "conversions", {}).items():
+                if column_labels is None:
+                    labels.pop(column, None)
+                else:
+                    labels[column] = column_labels
+        return labels
+
+    @property
+    def labels(self):
+        """{column: {True: label, False: label}} of the columns the committed changes
+        turned from two text labels (yes/no, ...) into booleans"""
+        return self._labels(self.done, self.trimmed_labels)
+
+    @property
+    def planned_steps(self):
+        """The steps behind the committed changes in order, or None when a change
+        (e.g. a storage type optimization) was not planned by a step"""
+        steps = self.trimmed_steps + [delta.steps for delta in self.done]
+        if any(planned is None for planned in steps):
+            return None
+        return [step for planned in steps for step in planned]
+
+    @property
+    def memory_bytes(self):
+        """Bytes this journal alone keeps alive: an owned working frame plus the history"""
+        frame = self._df
+        frame_bytes = int(frame.memory_usage(deep=True).sum()) if frame is not None and self.owned else 0
+        return frame_bytes + sum(delta.nbytes for delta in self.done + self.undone)
+
+    def spill(self, path):
+        """Write the working frame to Parquet at path and drop it from memory.
+        Returns False, leaving the frame in place, while another thread is using
+        the journal or when the frame cannot be stored as Parquet."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if self._df is None:
+                return False
+            try:
+                self._df.to_parquet(path)
+            except (ValueError, TypeError, pa.ArrowException):
+                if os.path.exists(path):
+                    os.remove(path)
+                return False
+            # Parquet keeps most dtypes but not e.g. the string storage, so note them all
+            self._spilled_dtypes = self._df.dtypes
+            # A frame shared with a cache comes back as this journal's own copy
+            self._df = None
+            self.owned = True
+            self.spill_path = path
+            return True
+        finally:
+            self._lock.release()
+
+    @traced("journal.restore")
+    def _restore(self):
+        df = pd.read_parquet(self.spill_path)
+        changed = {col: dtype for col, dtype in self._spilled_dtypes.items() if df[col].dtype != dtype}
+        self._df = df.astype(changed) if changed else df
+        os.remove(self.spill_path)
+        self.spill_path = None
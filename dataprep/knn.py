@@ -0,0 +1,127 @@
+"""K-nearest-neighbour imputation that scales to millions of rows
+
+Neighbours are searched on a standardized numeric feature subset with a KD/ball
+tree built over the donor rows (rows where the target is present), and the rows
+to fill are queried in batches sized from a memory budget. The tree queries run
+on all cores. Passing max_donors samples the donor set, which trades exactness
+for a smaller index on very large frames.
+"""
+import numpy as np
+import pandas as pd
+
+from .jobs import checkpoint
+from .trace import traced
+
+
+DEFAULT_K = 5
+DEFAULT_MEMORY_BUDGET_MB = 256
+# KD-trees lose their edge over ball trees beyond about twenty dimensions
+KD_TREE_MAX_DIMS = 20
+
+
+def default_features(df):
+    return [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col].dtype)
+            and not pd.api.types.is_bool_dtype(df[col].dtype)]
+
+
+def standardize(df, features):
+    """Zero-mean, unit-variance float32 block; missing values land on the mean (0)"""
+    block = df[features].to_numpy(dtype=np.float64, na_value=np.nan)
+    mean = np.nanmean(block, axis=0)
+    std = np.nanstd(block, axis=0)
+    std[~(std > 0)] = 1.0
+    mean[np.isnan(mean)] = 0.0
+    block -= mean
+    block /= std
+    np.nan_to_num(block, copy=False, nan=0.0)
+    return block.astype(np.float32)
+
+
+def batch_rows(n_features, k, memory_budget_mb):
+    """Query rows per batch so features, distances and indices fit the budget"""
+    per_row = 8 * (n_features + 2 * k) * 4  # float64 copies inside the tree query, with headroom
+    return max(1, int(memory_budget_mb * 1024 ** 2 // per_row))
+
+
+def knn_fill(df, column, features, block, k, memory_budget_mb, max_donors, n_jobs, random_state, progress):
+    from sklearn.neighbors import NearestNeighbors
+
+    target = df[column]
+    if not pd.api.types.is_numeric_dtype(target.dtype):
+        raise ValueError(f"KNN imputation needs a numeric column, {column!r} is {target.dtype}")
+
+    missing = target.isna().to_numpy()
+    if not missing.any():
+        return None
+    donors = np.flatnonzero(~missing)
+    if len(donors) == 0:
+        return None
+    if max_donors is not None and len(donors) > max_donors:
+        rng = np.random.default_rng(random_state)
+        donors = np.sort(rng.choice(donors, max_donors, replace=False))
+
+    # The target itself is not a feature: it is missing on every query row
+    keep = [i for i, feature in enumerate(features) if feature != column]
+    if not keep:
+        raise ValueError(f"KNN imputation of {column!r} needs at least one other feature column")
+    X = block[:, keep]
+
+    n_neighbors = min(k, len(donors))
+    algorithm = "kd_tree" if len(keep) <= KD_TREE_MAX_DIMS else "ball_tree"
+    index = NearestNeighbors(n_neighbors=n_neighbors, algorithm=algorithm, n_jobs=n_jobs)
+    index.fit(X[donors])
+    donor_values = target.to_numpy(dtype=np.float64, na_value=np.nan)[donors]
+
+    queries = np.flatnonzero(missing)
+    filled = np.empty(len(queries), dtype=np.float64)
+    step = batch_rows(len(keep), n_neighbors, memory_budget_mb)
+    for start in range(0, len(queries), step):
+        rows = queries[start:start + step]
+        neighbours = index.kneighbors(X[rows], return_distance=False)
+        filled[start:start + step] = donor_values[neighbours].mean(axis=1)
+        if progress is not None:
+            progress(column, min((start + step) / len(queries), 1.0))
+        checkpoint(min((start + step) / len(queries), 1.0), f"KNN {column}")
+    return queries, filled
+
+
+def check_features(df, features):
+    features = list(features) if features else default_features(df)
+    missing_features = [feature for feature in features if feature not in df.columns]
+    if missing_features:
+        raise KeyError(f"Unknown feature columns: {missing_features}")
+    non_numeric = [feature for feature in features if feature not in default_features(df)]
+    if non_numeric:
+        raise ValueError(f"KNN features must be numeric: {non_numeric}")
+    return features
+
+
+@traced("knn")
+def knn_fill_values(df, column, features=None, k=DEFAULT_K, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                    max_donors=None, n_jobs=-1, random_state=0, progress=None):
+    """Row positions of the missing values of column and their KNN estimates, or None"""
+    features = check_features(df, features)
+    block = standardize(df, features)
+    return knn_fill(df, column, features, block, k, memory_budget_mb,
+                    max_donors, n_jobs, random_state, progress)
+
+
+def knn_impute(df, columns, features=None, k=DEFAULT_K, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+               max_donors=None, n_jobs=-1, random_state=0, progress=None):
+    """Copy of df with the missing values of columns filled from their k nearest neighbours"""
+    features = check_features(df, features)
+    block = standardize(df, features)
+
+    df = df.copy()
+    for column in columns:
+        result = knn_fill(df, column, features, block, k, memory_budget_mb,
+                          max_donors, n_jobs, random_state, progress)
+        if result is None:
+            continue
+        rows, filled = result
+        series = df[column]
+        dtype = "float64" if pd.api.types.is_integer_dtype(series.dtype) else series.dtype
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        values[rows] = filled
+        df[column] = pd.Series(values, index=df.index).astype(dtype)
+    return df
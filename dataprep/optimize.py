@@ -0,0 +1,113 @@
+"""Memory-footprint optimizer: smaller storage types for every column
+
+Low-cardinality text becomes categorical, the rest Arrow-backed strings; text
+and categorical columns holding only two boolean-like labels (yes/no,
+true/false, ...) become bool, or the nullable boolean type when they have
+missing values; integers shrink to the smallest type that holds their range
+and floats to float32 when that is lossless. The plan is a DtypeDelta, so it
+commits and undoes like any other step.
+"""
+import numpy as np
+import pandas as pd
+
+from .journal import DtypeDelta
+from .trace import traced
+
+
+# Text columns with fewer distinct values than this share of rows become categoricals
+CATEGORY_RATIO = 0.5
+BOOLEAN_LABELS = {
+    "true": True, "false": False,
+    "yes": True, "no": False,
+    "y": True, "n": False,
+    "t": True, "f": False,
+}
+ARROW_STRING = pd.StringDtype("pyarrow")
+
+
+def downcast_numeric(df):
+    """Shrink integer columns to the smallest type that fits and floats to float32 when lossless"""
+    for col in df.columns:
+        target = _numeric_target(df[col])
+        if target is not None:
+            df[col] = df[col].astype(target)
+    return df
+
+
+def _numeric_target(series):
+    if pd.api.types.is_bool_dtype(series.dtype) or not isinstance(series.dtype, np.dtype):
+        return None
+    if pd.api.types.is_integer_dtype(series.dtype):
+        if not len(series):
+            return None
+        low, high = series.min(), series.max()
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return None if dtype == series.dtype else np.dtype(dtype)
+    if pd.api.types.is_float_dtype(series.dtype) and series.dtype != np.float32:
+        narrow = series.to_numpy().astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64), series.to_numpy(), equal_nan=True):
+            return np.dtype(np.float32)
+    return None
+
+
+def _boolean_labels(counts):
+    """{True: label, False: label} if the distinct values are one true and one false label"""
+    if len(counts) != 2 or not all(isinstance(value, str) for value in counts.index):
+        return None
+    flags = {BOOLEAN_LABELS.get(value.strip().lower()) for value in counts.index}
+    if flags != {True, False}:
+        return None
+    return {BOOLEAN_LABELS[value.strip().lower()]: value for value in counts.index}
+
+
+def _text_target(series, category_ratio):
+    """(dtype, labels) for a text column, or None to leave it as it is"""
+    is_category = isinstance(series.dtype, pd.CategoricalDtype)
+    is_text = series.dtype == ARROW_STRING or (
+        series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == "string"
+    )
+    if not (is_text or is_category):
+        return None
+    counts = series.value_counts(dropna=True, sort=False)
+    labels = _boolean_labels(counts[counts > 0])
+    if labels is not None:
+        return ("boolean" if series.hasnans else bool), labels
+    if is_category:
+        return None
+    if len(counts) < category_ratio * max(len(series), 1):
+        return "category", None
+    if series.dtype != ARROW_STRING:
+        return ARROW_STRING, None
+    return None
+
+
+@traced("plan_optimization")
+def plan_optimization(df, category_ratio=CATEGORY_RATIO):
+    """DtypeDelta with a smaller storage type for every column that has one"""
+    conversions = {}
+    for col in df.columns:
+        series = df[col]
+        target = _text_target(series, category_ratio)
+        if target is None:
+            numeric = _numeric_target(series)
+            target = None if numeric is None else (numeric, None)
+        if target is not None:
+            new_dtype, labels = target
+            conversions[col] = (series.dtype, new_dtype, labels)
+    return DtypeDelta(conversions, label="Optimize memory")
+
+
+def memory_report(before, after):
+    """Per-column deep memory and dtype of two profiles of the same columns, plus a total row"""
+    columns = before.columns
+    report = pd.DataFrame({
+        "Before Type": [str(before.dtype(col)) for col in columns],
+        "After Type": [str(after.dtype(col)) for col in columns],
+        "Before (MB)": before.stats.loc[columns, "memory"].astype(float).to_numpy() / 1024 ** 2,
+        "After (MB)": after.stats.loc[columns, "memory"].astype(float).to_numpy() / 1024 ** 2,
+    }, index=pd.Index(columns, name="Column"))
+    report.loc["Total"] = ["", "", report["Before (MB)"].sum(), report["After (MB)"].sum()]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        report["Reduction"] = report["Before (MB)"] / report["After (MB)"]
+    return report
@@ -0,0 +1,138 @@
+"""Batch outlier detection across many numeric columns
+
+Bounds and outlier masks for a whole set of columns are computed with numpy
+reductions over float64 column blocks (bounded in size like the profiler's),
+so detecting outliers in 300 columns is one pass over the numeric data
+instead of 300 separate column scans.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .jobs import checkpoint
+from .profile import BLOCK_BYTES
+from .trace import traced
+
+
+DETECTORS = ["IQR", "Z-score", "MAD"]
+DEFAULT_THRESHOLDS = {"IQR": 1.5, "Z-score": 3.0, "MAD": 3.5}
+# Scales the median absolute deviation to the standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+OUTLIER_SORTS = ["Row order", "Value (ascending)", "Value (descending)", "Distance from bound"]
+PAGE_SIZE = 50
+
+
+def block_bounds(block, detector, threshold):
+    """Per-column lower and upper bounds of a float64 block (rows x columns)"""
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if detector == "IQR":
+            q1, q3 = np.nanquantile(block, [0.25, 0.75], axis=0)
+            return q1 - threshold * (q3 - q1), q3 + threshold * (q3 - q1)
+        if detector == "Z-score":
+            mean = np.nanmean(block, axis=0)
+            std = np.nanstd(block, axis=0, ddof=1)
+            return mean - threshold * std, mean + threshold * std
+        if detector == "MAD":
+            median = np.nanmedian(block, axis=0)
+            mad = MAD_SCALE * np.nanmedian(np.abs(block - median), axis=0)
+            return median - threshold * mad, median + threshold * mad
+    raise ValueError(f"Unknown outlier detector: {detector}")
+
+
+class BatchDetection:
+    """Bounds, means and outlier row positions for a set of columns"""
+
+    def __init__(self, detector, threshold, columns, lower, upper, means, positions, rows):
+        self.detector = detector
+        self.threshold = threshold
+        self.columns = list(columns)
+        self.lower = dict(zip(self.columns, lower))
+        self.upper = dict(zip(self.columns, upper))
+        self.means = dict(zip(self.columns, means))
+        self.positions = positions
+        self.rows = rows
+
+    def counts(self):
+        return {col: len(self.positions[col]) for col in self.columns}
+
+    def summary(self):
+        """One row per column: bounds, outlier count and share"""
+        counts = self.counts()
+        return pd.DataFrame({
+            "Lower Bound": [self.lower[col] for col in self.columns],
+            "Upper Bound": [self.upper[col] for col in self.columns],
+            "Outliers": [counts[col] for col in self.columns],
+            "Outlier %": [counts[col] / self.rows * 100 if self.rows else 0.0 for col in self.columns],
+        }, index=pd.Index(self.columns, name="Column"))
+
+
+@traced("detect_outliers")
+def detect_outliers(df, columns, detector="IQR", threshold=None):
+    """Detect outliers in all columns at once with the IQR, z-score or MAD rule"""
+    if detector not in DETECTORS:
+        raise ValueError(f"Unknown outlier detector: {detector}")
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLDS[detector]
+    columns = list(columns)
+
+    lower, upper, means, positions = [], [], [], {}
+    group = max(1, BLOCK_BYTES // max(len(df) * 8, 1))
+    for start in range(0, len(columns), group):
+        checkpoint(start / len(columns), "detect")
+        names = columns[start:start + group]
+        block = df[names].to_numpy(dtype=np.float64, na_value=np.nan)
+        low, high = block_bounds(block, detector, threshold)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            means.extend(np.nanmean(block, axis=0))
+        # NaN compares False on both sides, so missing values are never outliers
+        mask = (block < low) | (block > high)
+        for i, name in enumerate(names):
+            positions[name] = np.flatnonzero(mask[:, i])
+        lower.extend(low)
+        upper.extend(high)
+    return BatchDetection(detector, threshold, columns, lower, upper, means, positions, len(df))
+
+
+def bound_distance(values, lower, upper):
+    """How far each value lies outside [lower, upper]; zero inside"""
+    return np.maximum(lower - values, 0) + np.maximum(values - upper, 0)
+
+
+def outlier_page(rows, values, lower, upper, page=0, page_size=PAGE_SIZE, sort="Row order"):
+    """One page of outliers (row label, value, distance from the bound) in the requested order
+
+    Only the rows up to the end of the page are ever ordered: argpartition picks
+    them out of the full set and argsort orders just that prefix.
+    """
+    if sort not in OUTLIER_SORTS:
+        raise ValueError(f"Unknown outlier sort: {sort}")
+    values = np.asarray(values, dtype=np.float64)
+    start = page * page_size
+    stop = min(start + page_size, len(values))
+    if start >= stop:
+        order = np.empty(0, dtype=np.intp)
+    elif sort == "Row order":
+        order = np.arange(start, stop)
+    else:
+        if sort == "Value (ascending)":
+            key = values
+        elif sort == "Value (descending)":
+            key = -values
+        else:
+            key = -bound_distance(values, lower, upper)
+        head = np.arange(len(key))
+        if stop < len(key):
+            # Everything up to the page's last key, ties included, so that ties
+            # broken by row position never overlap across neighbouring pages
+            kth = key[np.argpartition(key, stop - 1)[stop - 1]]
+            head = np.flatnonzero(key <= kth)
+        order = head[np.lexsort((head, key[head]))][start:stop]
+    page_values = values[order]
+    return pd.DataFrame({
+        "Row": np.asarray(rows)[order],
+        "Value": page_values,
+        "Distance from Bound": bound_distance(page_values, lower, upper),
+    })
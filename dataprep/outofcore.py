@@ -0,0 +1,268 @@
+"""Out-of-core datasets: memory-mapped Arrow IPC spill files on local disk
+
+Above a size threshold the app stops keeping a pandas frame per session. The
+CSV is streamed once into an uncompressed Arrow IPC file that is then memory
+mapped, so the session holds only a SpillDataset handle and the OS pages data
+in and out. Profiles are built a group of columns at a time; imputation and
+outlier steps are fitted on that profile and applied one record batch at a
+time, and pruning steps on a streaming variance scan, each change writing a
+new spill file; exports stream the batches. Undo
+switches back to the earlier spill files kept on disk.
+"""
+import os
+import tempfile
+import weakref
+
+import pandas as pd
+import pyarrow as pa
+
+from .ingest import DEFAULT_BLOCK_SIZE, iter_batches, widened_types
+from .jobs import checkpoint
+from .journal import DEFAULT_HISTORY
+from .profile import BLOCK_BYTES, DatasetProfile
+from .steps import ImputeStep, OutlierStep, PruneStep
+from .trace import traced
+
+
+DEFAULT_THRESHOLD_MB = 1024
+SPILL_PREFIX = "dataprep-spill-"
+STRING_TYPES = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+# Steps that write fractional values, widening integer columns to float64
+FLOAT_METHODS = {"Mean", "Median", "Cap", "Replace with Mean"}
+
+
+def spill_path(spill_dir=None):
+    fd, path = tempfile.mkstemp(prefix=SPILL_PREFIX, suffix=".arrow", dir=spill_dir)
+    os.close(fd)
+    return path
+
+
+def batch_to_frame(batch):
+    return batch.to_pandas(types_mapper=STRING_TYPES.get)
+
+
+def _remove_spill(source, path):
+    source.close()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _write_spill(batches, path):
+    """Write record batches to an uncompressed IPC file; returns the schema"""
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        raise ValueError("The dataset has no rows to spill to disk")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, first.schema) as writer:
+        writer.write_batch(first)
+        for batch in batches:
+            writer.write_batch(batch)
+    return first.schema
+
+
+def check_out_of_core(step):
+    """Raise ValueError for steps that cannot run one record batch at a time"""
+    if isinstance(step, ImputeStep) and step.method == "KNN":
+        raise ValueError("KNN imputation needs the whole table in memory and is not available out of core")
+    if isinstance(step, OutlierStep) and step.sketch_error is not None:
+        raise ValueError("Out-of-core outlier fences come from the profile; sketched quartiles are not needed")
+    if not isinstance(step, (ImputeStep, OutlierStep, PruneStep)):
+        raise ValueError(f"{type(step).__name__} is not available out of core")
+
+
+def output_schema(schema, steps):
+    """schema with the integer columns that steps fill with fractional values widened to float64"""
+    widened = {step.column for step in steps if getattr(step, "method", None) in FLOAT_METHODS}
+    for i, field in enumerate(schema):
+        if field.name in widened and pa.types.is_integer(field.type):
+            schema = schema.set(i, field.with_type(pa.float64()))
+    return schema
+
+
+class SpillDataset:
+    """Handle to a memory-mapped Arrow IPC file; the file is removed with the handle"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._source = pa.memory_map(self.path, "r")
+        self._reader = pa.ipc.open_file(self._source)
+        self._finalizer = weakref.finalize(self, _remove_spill, self._source, self.path)
+
+    @classmethod
+    def from_batches(cls, batches, spill_dir=None):
+        path = spill_path(spill_dir)
+        try:
+            _write_spill(batches, path)
+        except Exception:
+            os.remove(path)
+            raise
+        return cls(path)
+
+    @classmethod
+    def from_csv(cls, source, spill_dir=None, block_size=DEFAULT_BLOCK_SIZE, progress=None):
+        """Stream a CSV path or file object into a new spill file"""
+        try:
+            return cls.from_batches(iter_batches(source, block_size, progress), spill_dir)
+        except pa.ArrowInvalid:
+            pass
+        # Types inferred from the first block did not hold further down the file
+        column_types = widened_types(source, block_size)
+        try:
+            return cls.from_batches(iter_batches(source, block_size, progress, column_types=column_types),
+                                    spill_dir)
+        except pa.ArrowInvalid as exc:
+            raise ValueError(f"Column types change part way through the file: {exc}") from exc
+
+    @property
+    def schema(self):
+        return self._reader.schema
+
+    @property
+    def columns(self):
+        return self.schema.names
+
+    @property
+    def num_batches(self):
+        return self._reader.num_record_batches
+
+    @property
+    def num_rows(self):
+        return sum(self._reader.get_batch(i).num_rows for i in range(self.num_batches))
+
+    @property
+    def shape(self):
+        return self.num_rows, len(self.columns)
+
+    @property
+    def size_bytes(self):
+        return os.path.getsize(self.path)
+
+    def iter_batches(self, columns=None):
+        for i in range(self.num_batches):
+            batch = self._reader.get_batch(i)
+            yield batch if columns is None else batch.select(columns)
+
+    def iter_frames(self, columns=None):
+        for batch in self.iter_batches(columns):
+            yield batch_to_frame(batch)
+
+    def read_columns(self, columns):
+        """Frame of some columns; only those columns are paged in from the map"""
+        table = self._reader.read_all().select(list(columns))
+        return table.to_pandas(types_mapper=STRING_TYPES.get)
+
+    def head(self, n=5):
+        frames, rows = [], 0
+        for frame in self.iter_frames():
+            frames.append(frame.iloc[:n - rows])
+            rows += len(frames[-1])
+            if rows >= n:
+                break
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=self.columns)
+
+    def column_groups(self, max_bytes=BLOCK_BYTES):
+        """Columns in groups of at most max_bytes of Arrow data (at least one column each)"""
+        table = self._reader.read_all()
+        groups, group, size = [], [], 0
+        for name in self.columns:
+            nbytes = table.column(name).nbytes
+            if group and size + nbytes > max_bytes:
+                groups.append(group)
+                group, size = [], 0
+            group.append(name)
+            size += nbytes
+        if group:
+            groups.append(group)
+        return groups
+
+    @traced("spill.profile")
+    def profile(self, max_bytes=BLOCK_BYTES):
+        """DatasetProfile built one column group at a time"""
+        return DatasetProfile.concat(
+            DatasetProfile.from_frame(self.read_columns(group)) for group in self.column_groups(max_bytes)
+        )
+
+    @traced("spill.transform")
+    def transform(self, steps, profile=None, spill_dir=None, progress=None):
+        """New spill file with the steps applied batch by batch
+
+        All steps are fitted on the same profile of this dataset (fill values,
+        fences, means), so they should touch different columns, as the app's
+        grouped imputations do. Pruning steps are fitted on one variance scan of
+        their candidate columns, and the columns they drop are never read.
+        """
+        steps = list(steps)
+        for step in steps:
+            check_out_of_core(step)
+        dropped = set()
+        for step in steps:
+            if isinstance(step, PruneStep):
+                dropped.update(step.select(step.scan(self.iter_batches(step.columns))))
+        steps = [step for step in steps if not isinstance(step, PruneStep)]
+        if profile is None and steps:
+            profile = self.profile()
+        kept = [name for name in self.columns if name not in dropped]
+        schema = output_schema(pa.schema([self.schema.field(name) for name in kept]), steps)
+
+        def batches():
+            for i, batch in enumerate(self.iter_batches(kept)):
+                checkpoint(i / self.num_batches, "transform")
+                frame = batch_to_frame(batch)
+                for step in steps:
+                    frame = step.plan(frame, profile).apply(frame)
+                if progress is not None:
+                    progress((i + 1) / self.num_batches)
+                yield pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False)
+
+        return SpillDataset.from_batches(batches(), spill_dir)
+
+    def remove(self):
+        self._finalizer()
+
+    def __repr__(self):
+        return f"SpillDataset({self.path!r}, {self.num_batches} batches)"
+
+
+class SpillJournal:
+    """The current spill file plus earlier and undone ones, for undo/redo
+
+    Mirrors Journal with .dataset in place of .df: every change is a whole new
+    spill file, and files that fall out of the history are removed.
+    """
+
+    def __init__(self, dataset, max_history=DEFAULT_HISTORY):
+        self.dataset = dataset
+        self.max_history = max_history
+        self.done = []
+        self.undone = []
+
+    def commit(self, dataset, steps):
+        self.done.append((self.dataset, steps))
+        self.dataset = dataset
+        for old, _ in self.done[:-self.max_history]:
+            old.remove()
+        del self.done[:-self.max_history]
+        for old, _ in self.undone:
+            old.remove()
+        self.undone.clear()
+        return steps
+
+    def undo(self):
+        previous, steps = self.done.pop()
+        self.undone.append((self.dataset, steps))
+        self.dataset = previous
+        return steps
+
+    def redo(self):
+        following, steps = self.undone.pop()
+        self.done.append((self.dataset, steps))
+        self.dataset = following
+        return steps
+
+    @property
+    def can_undo(self):
+        return bool(self.done)
+
+    @property
+    def can_redo(self):
+        return bool(self.undone)
@@ -0,0 +1,72 @@
+"""Ordered recipes of preprocessing steps"""
+import json
+
+from .backend import get_backend
+from .steps import ImputeStep, plan_imputations, step_from_dict
+
+
+class Pipeline:
+    """A recipe: steps applied to a dataframe in order"""
+
+    def __init__(self, steps=None):
+        self.steps = list(steps or [])
+
+    def add(self, step):
+        self.steps.append(step)
+        return self
+
+    def _runs(self):
+        """The steps in order, with consecutive single-value imputations of different
+        columns gathered into lists. Those only read their own column, so planning
+        them together gives the same result as one at a time."""
+        run = []
+        for step in self.steps:
+            simple = isinstance(step, ImputeStep) and step.method != "KNN"
+            if run and (not simple or step.column in {other.column for other in run}):
+                yield run
+                run = []
+            if simple:
+                run.append(step)
+            else:
+                yield step
+        if run:
+            yield run
+
+    def apply(self, df, inplace=False, backend=None):
+        """Run every step; with inplace=True the steps write into df instead of copies.
+        With a backend ("pandas", "arrow" or a dataprep.backend instance) each step
+        runs through its column operations instead, on a frame or an Arrow table."""
+        if backend is not None:
+            backend = get_backend(backend)
+            for step in self.steps:
+                df = step.transform(df, backend)
+            return df
+        for step in self._runs():
+            delta = plan_imputations(df, step) if isinstance(step, list) else step.plan(df)
+            df = delta.apply(df) if inplace else delta.applied(df)
+        return df
+
+    def to_dict(self):
+        return {"steps": [step.to_dict() for step in self.steps]}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(step_from_dict(entry) for entry in spec.get("steps", []))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return f"Pipeline({self.steps!r})"
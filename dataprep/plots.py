@@ -0,0 +1,91 @@
+"""Box plots and histograms built from server-side aggregates
+
+Plotly's px.box serializes every value of the column into the figure. These
+figures carry only quartiles, whiskers and a capped sample of outlier points
+(or precomputed histogram bins), so the payload sent to the browser stays the
+same size whatever the number of rows.
+"""
+import numpy as np
+
+from .trace import traced
+
+
+MAX_OUTLIER_POINTS = 1000
+HISTOGRAM_BINS = 50
+
+
+@traced("box_stats")
+def box_stats(series, quartiles=None, bounds=None, max_outliers=MAX_OUTLIER_POINTS, seed=0):
+    """Quartiles, Tukey whiskers and a capped outlier sample of a numeric column;
+    known quartiles and fences (e.g. from a DatasetProfile) skip recomputing them"""
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    q1, median, q3 = quartiles if quartiles is not None else np.quantile(values, [0.25, 0.5, 0.75])
+    lower, upper = bounds if bounds is not None else (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+
+    inside = (values >= lower) & (values <= upper)
+    outliers = values[~inside]
+    sample = outliers
+    if len(outliers) > max_outliers:
+        sample = np.random.default_rng(seed).choice(outliers, max_outliers, replace=False)
+    return {
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        # Whiskers end at the most extreme values that are still inside the fences
+        "lowerfence": values[inside].min() if inside.any() else q1,
+        "upperfence": values[inside].max() if inside.any() else q3,
+        "outliers": len(outliers),
+        "outlier_sample": sample,
+    }
+
+
+@traced("box_figure")
+def box_figure(stats, name):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Box(
+        name=name,
+        x=[name],
+        q1=[stats["q1"]],
+        median=[stats["median"]],
+        q3=[stats["q3"]],
+        lowerfence=[stats["lowerfence"]],
+        upperfence=[stats["upperfence"]],
+        boxpoints=False,
+    ))
+    if len(stats["outlier_sample"]):
+        shown = len(stats["outlier_sample"])
+        label = "outliers" if shown == stats["outliers"] else f"outliers ({shown} of {stats['outliers']})"
+        fig.add_trace(go.Scatter(
+            x=[name] * shown,
+            y=stats["outlier_sample"],
+            mode="markers",
+            marker={"size": 4, "opacity": 0.6},
+            name=label,
+        ))
+    fig.update_layout(yaxis_title=name, showlegend=False)
+    return fig
+
+
+@traced("histogram_bins")
+def histogram_bins(series, bins=HISTOGRAM_BINS):
+    """Counts and edges of a numeric column, ignoring missing values"""
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.histogram(values[~np.isnan(values)], bins=bins)
+
+
+@traced("histogram_figure")
+def histogram_figure(counts, edges, name):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        name=name,
+    ))
+    fig.update_layout(xaxis_title=name, yaxis_title="count", bargap=0)
+    return fig
@@ -0,0 +1,254 @@
+"""Single-pass column profiler shared by the overview, imputation and outlier code
+
+One profile holds, per column: null count, mean, std, min/max, quartiles, IQR
+fences, mode, cardinality and deep memory. Numeric statistics are computed
+with numpy reductions over column blocks rather than one pandas call per
+statistic, so the data is scanned once per profile.
+
+After a save, updated() derives the next profile from the previous one and
+rescans only the columns the change wrote. A row drop adjusts every column's
+null count and memory from the dropped rows alone; the value statistics of the
+other columns then go stale and are recomputed by refresh() when first read.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .jobs import checkpoint
+from .journal import ColumnDropDelta, DeltaGroup, RowDropDelta
+from .trace import annotate, traced
+
+
+IQR_FACTOR = 1.5
+# Numeric columns are profiled in float64 blocks of at most this many bytes
+BLOCK_BYTES = 256 << 20
+
+STAT_COLUMNS = ["dtype", "count", "nulls", "null_pct", "mean", "std", "min", "q1", "median", "q3",
+                "max", "lower", "upper", "mode", "unique", "memory"]
+# Statistics that can go stale, by group: numeric order statistics, and mode/cardinality
+NUMERIC = "numeric"
+MODES = "modes"
+
+
+def is_profiled_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _numeric_stats(df, columns):
+    stats = {}
+    if not columns:
+        return stats
+    group = max(1, BLOCK_BYTES // max(len(df) * 8, 1))
+    for start in range(0, len(columns), group):
+        names = columns[start:start + group]
+        block = df[names].to_numpy(dtype=np.float64, na_value=np.nan)
+        # All-NaN columns are expected here; their statistics are simply NaN
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.nanmean(block, axis=0)
+            std = np.nanstd(block, axis=0, ddof=1)
+            low = np.nanmin(block, axis=0) if len(block) else np.full(len(names), np.nan)
+            high = np.nanmax(block, axis=0) if len(block) else np.full(len(names), np.nan)
+            q1, median, q3 = (np.nanquantile(block, [0.25, 0.5, 0.75], axis=0) if len(block)
+                              else np.full((3, len(names)), np.nan))
+        for i, name in enumerate(names):
+            stats[name] = {"mean": mean[i], "std": std[i], "min": low[i], "q1": q1[i],
+                           "median": median[i], "q3": q3[i], "max": high[i]}
+    return stats
+
+
+def _mode_and_unique(series):
+    counts = series.value_counts(dropna=True, sort=False)
+    if counts.empty:
+        return None, 0
+    top = counts[counts == counts.max()].index
+    try:
+        mode = top.min()  # same tie-break as Series.mode()[0]
+    except TypeError:
+        mode = top[0]
+    return mode, len(counts)
+
+
+def _stats_frame(df, iqr_factor):
+    """Statistics of every column of df, one row per column"""
+    rows = len(df)
+    nulls = df.isna().sum()
+    memory = df.memory_usage(deep=True, index=False)
+    numeric = [col for col in df.columns if is_profiled_numeric(df[col].dtype)]
+    numeric_stats = _numeric_stats(df, numeric)
+
+    records = {}
+    for i, col in enumerate(df.columns):
+        checkpoint(i / len(df.columns), "profile")
+        mode, unique = _mode_and_unique(df[col])
+        record = {
+            "dtype": df[col].dtype,
+            "count": rows - int(nulls[col]),
+            "nulls": int(nulls[col]),
+            "null_pct": (nulls[col] / rows * 100) if rows else 0.0,
+            "mode": mode,
+            "unique": unique,
+            "memory": int(memory[col]),
+        }
+        record.update(numeric_stats.get(col, {}))
+        records[col] = record
+    stats = pd.DataFrame.from_dict(records, orient="index").reindex(columns=STAT_COLUMNS)
+    iqr = stats["q3"] - stats["q1"]
+    stats["lower"] = stats["q1"] - iqr_factor * iqr
+    stats["upper"] = stats["q3"] + iqr_factor * iqr
+    return stats
+
+
+class DatasetProfile:
+    """Per-column statistics of a frame, computed once and read everywhere
+
+    stale maps a column to the statistic groups (NUMERIC, MODES) that still
+    describe the rows before a row drop; its counts and memory are always current.
+    """
+
+    def __init__(self, stats, rows, iqr_factor=IQR_FACTOR, stale=None):
+        self.stats = stats
+        self.rows = rows
+        self.iqr_factor = iqr_factor
+        self.stale = {column: set(groups) for column, groups in (stale or {}).items() if groups}
+
+    @classmethod
+    @traced("profile")
+    def from_frame(cls, df, iqr_factor=IQR_FACTOR):
+        return cls(_stats_frame(df, iqr_factor), len(df), iqr_factor)
+
+    @classmethod
+    def from_backend(cls, data, backend, iqr_factor=IQR_FACTOR):
+        """Profile of a frame or Arrow table, computed by a dataprep.backend backend"""
+        return cls(backend.stats(data, iqr_factor), backend.num_rows(data), iqr_factor)
+
+    @traced("profile.update")
+    def updated(self, df, delta, undone=False):
+        """Profile of df right after delta was committed to it (or undone, with
+        undone=True), where this profile describes the frame before. Only the
+        columns the delta wrote, or brought back, are rescanned."""
+        deltas = delta.deltas if isinstance(delta, DeltaGroup) else [delta]
+        removed = [column for part in deltas if isinstance(part, ColumnDropDelta) for column in part.names]
+        touched = [column for column in dict.fromkeys(column for part in deltas for column in part.columns)
+                   if column not in removed]
+        annotate(columns=len(touched))
+        stats = self.stats.copy()
+        stale = {column: set(groups) for column, groups in self.stale.items()}
+        if removed:
+            # Dropped columns leave the profile; undoing the drop scans them again
+            if undone:
+                stats = pd.concat([stats, _stats_frame(df[removed], self.iqr_factor)]).reindex(df.columns)
+            else:
+                stats = stats.drop(index=removed)
+            for column in removed:
+                stale.pop(column, None)
+        for drop in deltas:
+            if not isinstance(drop, RowDropDelta) or drop.dropped_nulls is None:
+                continue
+            # Counts and memory follow from the dropped rows; the rest waits for refresh()
+            sign = 1 if undone else -1
+            stats["nulls"] += sign * drop.dropped_nulls.reindex(stats.index, fill_value=0)
+            stats["memory"] += sign * drop.dropped_memory.reindex(stats.index, fill_value=0)
+            for column in stats.index:
+                groups = (NUMERIC, MODES) if is_profiled_numeric(stats.at[column, "dtype"]) else (MODES,)
+                stale.setdefault(column, set()).update(groups)
+        rows = len(df)
+        stats["count"] = rows - stats["nulls"]
+        stats["null_pct"] = stats["nulls"] / rows * 100 if rows else 0.0
+        if touched:
+            order = stats.index
+            stats = pd.concat([stats.drop(index=touched), _stats_frame(df[touched], self.iqr_factor)]).reindex(order)
+            for column in touched:
+                stale.pop(column, None)
+        return DatasetProfile(stats, rows, self.iqr_factor, stale)
+
+    @traced("profile.refresh")
+    def refresh(self, df, columns=None, modes=True):
+        """Recompute the stale statistics of columns (default: all) from df, the frame
+        this profile describes; modes=False leaves modes and cardinality stale. Returns self."""
+        columns = self.columns if columns is None else columns
+        numeric = [column for column in columns if NUMERIC in self.stale.get(column, ())]
+        modal = [column for column in columns if MODES in self.stale.get(column, ())] if modes else []
+        if not numeric and not modal:
+            return self
+        for column, values in _numeric_stats(df, numeric).items():
+            for key, value in values.items():
+                self.stats.at[column, key] = value
+            iqr = values["q3"] - values["q1"]
+            self.stats.at[column, "lower"] = values["q1"] - self.iqr_factor * iqr
+            self.stats.at[column, "upper"] = values["q3"] + self.iqr_factor * iqr
+            self.stale[column].discard(NUMERIC)
+        for column in modal:
+            self.stats.at[column, "mode"], self.stats.at[column, "unique"] = _mode_and_unique(df[column])
+            self.stale[column].discard(MODES)
+        self.stale = {column: groups for column, groups in self.stale.items() if groups}
+        return self
+
+    def _check_fresh(self, column, group):
+        if group in self.stale.get(column, ()):
+            raise ValueError(f"Statistics of {column!r} predate a row drop; refresh() the profile first")
+
+    @classmethod
+    def concat(cls, profiles, iqr_factor=IQR_FACTOR):
+        """Profile of a frame from the profiles of disjoint groups of its columns"""
+        profiles = list(profiles)
+        if not profiles:
+            return cls(pd.DataFrame(columns=STAT_COLUMNS), 0, iqr_factor)
+        return cls(pd.concat([profile.stats for profile in profiles]), profiles[0].rows, iqr_factor)
+
+    def __getitem__(self, column):
+        return self.stats.loc[column]
+
+    @property
+    def columns(self):
+        return list(self.stats.index)
+
+    @property
+    def numeric_columns(self):
+        return [col for col in self.stats.index if is_profiled_numeric(self.stats.at[col, "dtype"])]
+
+    def dtype(self, column):
+        return self.stats.at[column, "dtype"]
+
+    def missing_info(self):
+        """Missing count and percentage of the columns that have missing values"""
+        missing = self.stats.loc[self.stats["nulls"] > 0, ["nulls", "null_pct"]]
+        return pd.DataFrame({
+            "Missing Values": missing["nulls"].astype(int),
+            "Missing Percentage": missing["null_pct"].astype(float),
+        })
+
+    def fill_value(self, column, method):
+        """Fill value for a column, from the stored statistics"""
+        self._check_fresh(column, MODES if method == "Mode" else NUMERIC)
+        if method == "Mean":
+            return self.stats.at[column, "mean"]
+        if method == "Median":
+            return self.stats.at[column, "median"]
+        if method == "Mode":
+            return self.stats.at[column, "mode"]
+        raise ValueError(f"No stored fill value for method {method!r}")
+
+    def bounds(self, column, factor=None):
+        """IQR fences of a numeric column"""
+        self._check_fresh(column, NUMERIC)
+        if factor is None or factor == self.iqr_factor:
+            return self.stats.at[column, "lower"], self.stats.at[column, "upper"]
+        q1, q3 = self.stats.at[column, "q1"], self.stats.at[column, "q3"]
+        return q1 - factor * (q3 - q1), q3 + factor * (q3 - q1)
+
+    @traced("profile.describe")
+    def describe(self):
+        """Same layout as DataFrame.describe() for the numeric columns"""
+        numeric = self.numeric_columns
+        for column in numeric:
+            self._check_fresh(column, NUMERIC)
+        table = self.stats.loc[numeric, ["count", "mean", "std", "min", "q1", "median", "q3", "max"]]
+        table = table.astype(float).T
+        table.index = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+        return table
+
+    @property
+    def memory_bytes(self):
+        return int(self.stats["memory"].sum())
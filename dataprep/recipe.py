@@ -0,0 +1,299 @@
+"""Fitted recipes: steps together with the statistics they learned
+
+A Pipeline lists what to do ("fill age with the median"); a FittedRecipe also
+stores what was learned from the data it was fitted on ("fill age with 31"),
+i.e. the fill values, IQR fences and means, and the columns a pruning step
+dropped. Applying a fitted recipe to new data never recomputes them, so a
+recurring feed is cleaned exactly like the file the recipe was fitted on and
+can be streamed through it chunk by chunk in constant memory:
+
+    recipe = FittedRecipe.fit(Pipeline.load("recipe.json"), train_df)
+    recipe.save("fitted.json")
+    FittedRecipe.load("fitted.json").transform_csv("next_week.csv", "clean.csv.gz")
+"""
+import datetime
+import json
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .export import EXPORT_FORMATS, export_frame
+from .ingest import DEFAULT_BLOCK_SIZE, csv_columns, iter_batches, widened_types
+from .journal import CellDelta
+from .outofcore import FLOAT_METHODS, batch_to_frame, output_schema
+from .steps import ImputeStep, OutlierStep, PruneStep, outlier_delta, step_from_dict
+from .trace import traced
+
+
+RECIPE_FORMAT = "dataprep-fitted-recipe"
+# Bump when the layout of the entries changes; older files stay readable
+RECIPE_VERSION = 1
+# Keys of each fitted entry that rebuild the unfitted step
+STEP_KEYS = {
+    ImputeStep.op: ("column", "method"),
+    OutlierStep.op: ("column", "method"),
+    PruneStep.op: ("variance_threshold", "dominant_ratio", "columns"),
+}
+
+
+@dataclass
+class TransformReport:
+    rows_in: int
+    rows_out: int
+    seconds: float
+
+
+def _plain(value):
+    """JSON-friendly form of a learned statistic (numpy scalars, NaN)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _number(value):
+    return "n/a" if pd.isna(value) else f"{value:.6g}"
+
+
+def read_type(dtype):
+    """Arrow type to parse a CSV column as, for a column of this pandas dtype; None
+    for dates and times, which are left to the reader"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return pa.bool_()
+    if pd.api.types.is_integer_dtype(dtype):
+        return pa.int64()
+    if pd.api.types.is_float_dtype(dtype):
+        return pa.float64()
+    if pd.api.types.is_datetime64_any_dtype(dtype) or pd.api.types.is_timedelta64_dtype(dtype):
+        return None
+    return pa.string()
+
+
+def read_types(df, columns, labels=None):
+    """{column: Arrow type name} of columns of df, as stored in a fitted recipe's source.
+    Columns in labels hold booleans converted from two text labels (see
+    Journal.labels); the CSV has the labels, so they are read as strings."""
+    labels = labels or {}
+    types = {column: pa.string() if column in labels else read_type(df[column].dtype)
+             for column in columns if column in df.columns}
+    return {column: str(kind) for column, kind in types.items() if kind is not None}
+
+
+def restore_labels(entries, labels):
+    """Recipe entries with boolean fill values of label-converted columns (see
+    Journal.labels) turned back into the text labels the data files hold"""
+    if not labels:
+        return entries
+    restored = []
+    for entry in entries:
+        value = entry.get("value")
+        if entry.get("column") in labels and isinstance(value, (bool, np.bool_)):
+            entry = dict(entry, value=labels[entry["column"]][bool(value)])
+        restored.append(entry)
+    return restored
+
+
+def format_for_path(path, default="CSV"):
+    """Export format implied by a file name, e.g. out.csv.gz -> CSV (gzip)"""
+    matches = [fmt for fmt, suffix in EXPORT_FORMATS.items() if str(path).endswith(suffix)]
+    return max(matches, key=lambda fmt: len(EXPORT_FORMATS[fmt]), default=default)
+
+
+class FittedRecipe:
+    """Recipe entries with their learned fill values, fences and dropped columns,
+    replayed without refitting"""
+
+    def __init__(self, entries, source=None, created=None):
+        self.entries = [dict(entry) for entry in entries]
+        self.source = source or {}
+        self.created = created or datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        for entry in self.entries:
+            if entry.get("op") not in STEP_KEYS:
+                raise ValueError(f"Fitted recipes hold imputation, outlier and pruning entries, "
+                                 f"not {entry.get('op')!r}")
+
+    @classmethod
+    def fit(cls, pipeline, df, labels=None):
+        """Fit each step of a Pipeline in order, every step on the output of the previous ones.
+        labels names df's columns converted from text labels to booleans (see
+        Journal.labels); the recipe fills them with the labels, not True/False."""
+        entries = []
+        source = {"rows": len(df), "columns": list(df.columns)}
+        fitted_on = df
+        df = df.copy()
+        for step in pipeline.steps:
+            delta = step.plan(df)
+            if delta.fitted is None:
+                raise ValueError(f"{step!r} fills from neighbouring rows and has no fitted form")
+            entries.extend(delta.fitted)
+            df = delta.apply(df)
+        recipe = cls(restore_labels(entries, labels), source=source)
+        source["types"] = read_types(fitted_on, recipe.columns + recipe.dropped, labels)
+        return recipe
+
+    @property
+    def steps(self):
+        """The unfitted steps, e.g. to refit on other data"""
+        return [step_from_dict({"op": entry["op"], **{key: entry[key] for key in STEP_KEYS[entry["op"]]}})
+                for entry in self.entries]
+
+    @property
+    def columns(self):
+        """Columns the recipe fills or treats, which the data must have"""
+        return list(dict.fromkeys(entry["column"] for entry in self.entries if "column" in entry))
+
+    @property
+    def dropped(self):
+        """Columns pruning entries drop when the data has them"""
+        return list(dict.fromkeys(column for entry in self.entries if entry["op"] == PruneStep.op
+                                  for column in entry["columns"]))
+
+    def transform(self, df):
+        """Apply the entries to df in place (rows may be dropped); returns the frame"""
+        missing = [column for column in self.columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"Columns of the recipe are missing from the data: {missing}")
+        for entry in self.entries:
+            if entry["op"] == PruneStep.op:
+                df.drop(columns=[column for column in entry["columns"] if column in df.columns], inplace=True)
+                continue
+            # A column that was entirely missing when fitted has no fill value or fences
+            if entry["op"] == ImputeStep.op:
+                if pd.isna(entry["value"]):
+                    continue
+                delta = CellDelta.from_mask(df, entry["column"], df[entry["column"]].isna(), entry["value"])
+            else:
+                if pd.isna(entry["lower"]) or pd.isna(entry["upper"]):
+                    continue
+                delta = outlier_delta(df, entry["column"], entry["method"], entry["lower"], entry["upper"],
+                                      entry.get("mean"))
+            df = delta.apply(df)
+        return df
+
+    def column_types(self):
+        """Arrow types to read the recipe's columns with, so every chunk parses the same way.
+        They come from the data the recipe was fitted on: a chunk where a column is all
+        missing would otherwise be read as nulls, and one with only whole numbers as int64."""
+        types = {column: pa.type_for_alias(name) for column, name in self.source.get("types", {}).items()}
+        for entry in self.entries:
+            if entry.get("method") in FLOAT_METHODS:
+                types[entry["column"]] = pa.float64()
+            elif entry.get("method") == "Create 'Unknown' category":
+                types[entry["column"]] = pa.string()
+        return types
+
+    @traced("recipe.transform_csv")
+    def transform_csv(self, source, output, fmt=None, block_size=DEFAULT_BLOCK_SIZE, progress=None):
+        """Stream a CSV through the recipe one block at a time into output; returns a
+        TransformReport. The format follows the output's extension unless given."""
+        start = time.perf_counter()
+        fmt = fmt or format_for_path(output)
+        column_types = self.column_types()
+        try:
+            stream = self._stream(source, block_size, progress, column_types)
+            report = export_frame(stream, output, fmt)
+        except pa.ArrowInvalid:
+            # The other columns' types, inferred from the first block, did not hold
+            # further down the file
+            try:
+                column_types = widened_types(source, block_size, column_types)
+                stream = self._stream(source, block_size, progress, column_types)
+                report = export_frame(stream, output, fmt)
+            except pa.ArrowInvalid as exc:
+                raise ValueError(f"Column types change part way through the file: {exc}") from exc
+        return TransformReport(rows_in=stream.rows_in, rows_out=report.rows, seconds=time.perf_counter() - start)
+
+    def _stream(self, source, block_size, progress, column_types):
+        batches = iter_batches(source, block_size, progress, column_types=column_types)
+        first = next(batches, None)
+        if first is None:
+            # A header-only file (e.g. an empty partition of a batch) gives a header-only output
+            schema = pa.schema([(name, column_types.get(name, pa.string())) for name in csv_columns(source)])
+            first = pa.RecordBatch.from_pylist([], schema=schema)
+        return _TransformedStream(self, first, batches)
+
+    def summary(self):
+        """One row per entry: column, method and the learned values"""
+        rows = []
+        for entry in self.entries:
+            if entry["op"] == PruneStep.op:
+                rows.append({"Step": "Prune", "Column": ", ".join(entry["columns"]) or "none",
+                             "Method": "Drop",
+                             "Learned": f"variance <= {entry['variance_threshold']:g} or dominant "
+                                        f"value >= {entry['dominant_ratio']:.1%}"})
+                continue
+            if entry["op"] == ImputeStep.op:
+                learned = f"fill value {_plain(entry['value'])!r}"
+            else:
+                learned = f"fences [{_number(entry['lower'])}, {_number(entry['upper'])}]"
+                if "mean" in entry:
+                    learned += f", mean {_number(entry['mean'])}"
+            rows.append({"Step": "Impute" if entry["op"] == ImputeStep.op else "Outliers",
+                         "Column": entry["column"], "Method": entry["method"], "Learned": learned})
+        return pd.DataFrame(rows, columns=["Step", "Column", "Method", "Learned"])
+
+    def to_dict(self):
+        return {
+            "format": RECIPE_FORMAT,
+            "version": RECIPE_VERSION,
+            "created": self.created,
+            "source": self.source,
+            "steps": [{key: _plain(value) for key, value in entry.items()} for entry in self.entries],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    @classmethod
+    def from_dict(cls, spec):
+        if spec.get("format") != RECIPE_FORMAT:
+            raise ValueError("Not a fitted recipe; fit a plain recipe first with 'python -m dataprep fit'")
+        if spec.get("version", 0) > RECIPE_VERSION:
+            raise ValueError(f"Fitted recipe version {spec['version']} is newer than this version "
+                             f"of dataprep reads ({RECIPE_VERSION})")
+        return cls(spec.get("steps", []), source=spec.get("source"), created=spec.get("created"))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"FittedRecipe({len(self.entries)} steps, fitted {self.created})"
+
+
+class _TransformedStream:
+    """Transformed chunks of a CSV, shaped for export_frame (.schema, .iter_frames())"""
+
+    def __init__(self, recipe, first, batches):
+        self.recipe = recipe
+        schema = output_schema(first.schema, recipe.steps)
+        for column in recipe.dropped:
+            if column in schema.names:
+                schema = schema.remove(schema.get_field_index(column))
+        self.schema = schema
+        self._first = first
+        self._batches = batches
+        self.rows_in = 0
+
+    def iter_frames(self):
+        # The first batch of a header-only file is empty and only gives the schema
+        if self._first.num_rows:
+            yield self._transform(self._first)
+        for batch in self._batches:
+            yield self._transform(batch)
+
+    def _transform(self, batch):
+        self.rows_in += batch.num_rows
+        return self.recipe.transform(batch_to_frame(batch))
@@ -0,0 +1,172 @@
+"""Row samples for sample-first exploration of large uploads
+
+sample_csv draws a uniform or stratified sample of a CSV in one streaming
+pass. Only the sample is ever held in memory: every row gets a random key and
+the rows with the smallest keys are kept ("bottom-k" sampling, a reservoir
+sample without replacement). A stratified sample keeps the smallest keys of
+each value of a column and then gives every value its share of the sample, at
+least one row, so rare categories are not lost. Sampled rows keep their order
+in the file.
+
+Steps chosen while exploring the sample are replayed on the whole file by
+apply_plan, fitted on the full data, only when it is exported.
+"""
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .ingest import DEFAULT_BLOCK_SIZE, LoadReport, iter_batches, read_csv, table_to_frame, widened_types
+from .optimize import CATEGORY_RATIO
+from .outofcore import SpillDataset, check_out_of_core
+from .pipeline import Pipeline
+from .trace import annotate, traced
+
+
+DEFAULT_SAMPLE_ROWS = 100_000
+# Stratified samples keep up to n candidate rows per value, so the values are capped
+MAX_STRATA = 50
+
+
+@dataclass
+class SampleReport(LoadReport):
+    """LoadReport of the sample, plus the rows of the whole file it was drawn from"""
+    source_rows: int = 0
+    stratify: str = None
+
+
+def _strata(batch, column):
+    """Values of column in a record batch as a numpy array"""
+    return batch.column(batch.schema.get_field_index(column)).to_numpy(zero_copy_only=False)
+
+
+class _BottomK:
+    """The rows with the n smallest random keys seen so far, per stratum when stratified"""
+
+    def __init__(self, n, stratify, rng):
+        self.n = n
+        self.stratify = stratify
+        self.rng = rng
+        self.table = None
+        self.keys = np.empty(0)
+        self.rows = np.empty(0, dtype=np.int64)
+        self.strata = np.empty(0, dtype=object)
+        # Rows of the whole input per stratum value (missing values included)
+        self.counts = pd.Series(dtype=np.int64)
+        self.seen = 0
+
+    def add(self, batch):
+        keys = self.rng.random(batch.num_rows)
+        rows = np.arange(self.seen, self.seen + batch.num_rows)
+        self.seen += batch.num_rows
+        if self.stratify is None:
+            strata = None
+            if len(self.keys) >= self.n:
+                # Rows keyed above the current n-th smallest key can never be kept
+                candidates = np.flatnonzero(keys < self.keys.max())
+                batch, keys, rows = batch.take(pa.array(candidates)), keys[candidates], rows[candidates]
+        else:
+            if self.stratify not in batch.schema.names:
+                raise ValueError(f"Unknown column to stratify by: {self.stratify!r}")
+            strata = _strata(batch, self.stratify)
+            self.counts = self.counts.add(pd.Series(strata).value_counts(dropna=False), fill_value=0)
+            if len(self.counts) > MAX_STRATA:
+                raise ValueError(f"{self.stratify!r} has more than {MAX_STRATA} distinct values to stratify by")
+        if not batch.num_rows:
+            return
+        table = pa.Table.from_batches([batch])
+        if self.table is not None:
+            table = pa.concat_tables([self.table, table.cast(self.table.schema)])
+        keys = np.concatenate([self.keys, keys])
+        rows = np.concatenate([self.rows, rows])
+        if strata is not None:
+            strata = np.concatenate([self.strata, strata])
+        keep = self._smallest(keys, strata)
+        self.table = table.take(pa.array(keep))
+        self.keys, self.rows = keys[keep], rows[keep]
+        if strata is not None:
+            self.strata = strata[keep]
+
+    def _smallest(self, keys, strata):
+        if strata is None:
+            return np.argpartition(keys, self.n)[:self.n] if len(keys) > self.n else np.arange(len(keys))
+        codes = pd.factorize(strata, use_na_sentinel=False)[0]
+        order = np.lexsort((keys, codes))
+        # Rank of every row within its stratum, in key order
+        starts = np.r_[0, np.flatnonzero(np.diff(codes[order])) + 1]
+        ranks = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        return order[ranks < self.n]
+
+    def sample(self):
+        """Positions into self.table of the final sample, in file order"""
+        if self.table is None:
+            return np.empty(0, dtype=np.intp)
+        keep = np.arange(len(self.keys))
+        if self.stratify is not None:
+            keep = []
+            for value, count in self.counts.items():
+                share = max(1, round(self.n * int(count) / self.seen))
+                members = np.flatnonzero(pd.isna(self.strata) if pd.isna(value) else self.strata == value)
+                keep.extend(members[np.argsort(self.keys[members])][:share])
+            keep = np.asarray(keep, dtype=np.intp)
+        return keep[np.argsort(self.rows[keep])]
+
+
+@traced("sample")
+def sample_csv(source, n=DEFAULT_SAMPLE_ROWS, stratify=None, seed=0, block_size=DEFAULT_BLOCK_SIZE,
+               category_ratio=CATEGORY_RATIO, progress=None):
+    """Sample of about n rows of a CSV path or file object, uniform or stratified by a
+    column, in one streaming pass; returns (dataframe, SampleReport)"""
+    annotate(rows=n, stratify=stratify)
+    start = time.perf_counter()
+    sampler = _BottomK(n, stratify, np.random.default_rng(seed))
+    try:
+        for batch in iter_batches(source, block_size, progress):
+            sampler.add(batch)
+    except pa.ArrowInvalid:
+        # Types inferred from the first block did not hold further down the file;
+        # sample again from the start with those types widened
+        sampler = _BottomK(n, stratify, np.random.default_rng(seed))
+        try:
+            column_types = widened_types(source, block_size)
+            for batch in iter_batches(source, block_size, progress, column_types=column_types):
+                sampler.add(batch)
+        except pa.ArrowInvalid as exc:
+            raise ValueError(f"Column types change part way through the file: {exc}") from exc
+    if sampler.table is None:
+        raise ValueError("The input has no rows to sample")
+    if progress is not None:
+        progress(1.0)
+
+    df = table_to_frame(sampler.table.take(pa.array(sampler.sample())), category_ratio)
+    report = SampleReport(
+        rows=len(df),
+        columns=len(df.columns),
+        seconds=time.perf_counter() - start,
+        memory_bytes=int(df.memory_usage(deep=True).sum()),
+        source_rows=sampler.seen,
+        stratify=stratify,
+    )
+    return df, report
+
+
+@traced("sample.apply_plan")
+def apply_plan(source, steps, out_of_core=False, spill_dir=None):
+    """The whole CSV with steps chosen on a sample applied in order, each fitted on
+    the full data: a frame, or with out_of_core=True a SpillDataset transformed one
+    step at a time"""
+    steps = list(steps)
+    annotate(steps=len(steps))
+    if hasattr(source, "seek"):
+        source.seek(0)
+    if out_of_core:
+        for step in steps:
+            check_out_of_core(step)
+        dataset = SpillDataset.from_csv(source, spill_dir=spill_dir)
+        for step in steps:
+            dataset = dataset.transform([step], spill_dir=spill_dir)
+        return dataset
+    df, _ = read_csv(source)
+    return Pipeline(steps).apply(df, inplace=True)
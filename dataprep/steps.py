@@ -0,0 +1,449 @@
+"""Imputation, outlier and column pruning steps shared by the Streamlit app and the CLI"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .jobs import bind
+from .journal import CellDelta, ColumnDropDelta, DeltaGroup, RowDropDelta
+from .knn import DEFAULT_K, DEFAULT_MEMORY_BUDGET_MB, knn_fill_values
+from .outliers import DEFAULT_THRESHOLDS, DETECTORS, detect_outliers
+from .sketch import sketch_series
+from .trace import annotate, traced
+from .variance import DEFAULT_DOMINANT_RATIO, VARIANCE_THRESHOLD, low_variance_columns, scan_variance
+
+
+IMPUTATION_METHODS = ["Mean", "Median", "Mode", "KNN", "Create 'Unknown' category"]
+OUTLIER_METHODS = ["Remove", "Cap", "Replace with Mean"]
+UNKNOWN_CATEGORY = "Unknown"
+
+
+def as_float64(data):
+    """A series or frame with its float32 columns widened, so statistics are taken in
+    float64 like the profile's and not rounded to the storage type"""
+    if isinstance(data, pd.DataFrame):
+        narrow = {column: np.float64 for column, dtype in data.dtypes.items() if dtype == np.float32}
+        return data.astype(narrow) if narrow else data
+    return data.astype(np.float64) if data.dtype == np.float32 else data
+
+
+def iqr_bounds(series, factor=1.5):
+    """Lower and upper IQR fences of a numeric series"""
+    series = as_float64(series)
+    q1 = series.quantile(0.25)
+    q3 = series.quantile(0.75)
+    iqr = q3 - q1
+    return q1 - factor * iqr, q3 + factor * iqr
+
+
+def outlier_mask(series, lower, upper):
+    """Boolean mask of values outside [lower, upper]; missing values are never outliers"""
+    mask = (series < lower) | (series > upper)
+    if mask.dtype != bool:
+        mask = mask.fillna(False).astype(bool)
+    return mask
+
+
+def fill_value(series, method):
+    """Value used to fill the missing entries of a column for the given method"""
+    if method == "Mean":
+        return as_float64(series).mean()
+    if method == "Median":
+        return as_float64(series).median()
+    if method == "Mode":
+        mode = series.mode()
+        return mode.iloc[0] if len(mode) else None
+    if method == "Create 'Unknown' category":
+        return UNKNOWN_CATEGORY
+    if method == "KNN":
+        raise ValueError("KNN imputation fills from neighbouring rows, not a single value")
+    raise ValueError(f"Unknown imputation method: {method}")
+
+
+class ImputeStep:
+    """Fill the missing values of one column"""
+
+    op = "impute"
+
+    def __init__(self, column, method, k=DEFAULT_K, features=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        if method not in IMPUTATION_METHODS:
+            raise ValueError(f"Unknown imputation method: {method}")
+        self.column = column
+        self.method = method
+        # KNN settings, ignored by the other methods
+        self.k = k
+        self.features = list(features) if features else None
+        self.memory_budget_mb = memory_budget_mb
+
+    @traced("impute")
+    def plan(self, df, profile=None):
+        """CellDelta filling the missing values of the column in df; fill values come
+        from profile (a DatasetProfile of df) when given instead of a rescan"""
+        annotate(column=self.column, method=self.method)
+        series = df[self.column]
+        if self.method in ("Mean", "Median"):
+            check_numeric(df, self.column, f"{self.method} imputation")
+        if self.method == "KNN":
+            result = knn_fill_values(df, self.column, features=self.features, k=self.k,
+                                     memory_budget_mb=self.memory_budget_mb)
+            positions, values = result if result is not None else ([], np.array([], dtype=np.float64))
+            delta = CellDelta.from_positions(df, self.column, positions, values)
+            delta.steps = [self]
+            return delta
+        if profile is not None and self.method != "Create 'Unknown' category":
+            value = profile.refresh(df, [self.column]).fill_value(self.column, self.method)
+        else:
+            value = fill_value(series, self.method)
+        return self.fitted_delta(df, value)
+
+    def fitted_delta(self, df, value):
+        """CellDelta filling the column's missing values with value, carrying its recipe entry"""
+        if value is None:
+            delta = CellDelta.from_positions(df, self.column, [], np.array([]))
+        else:
+            delta = CellDelta.from_mask(df, self.column, df[self.column].isna(), value)
+        delta.fitted = [{"op": self.op, "column": self.column, "method": self.method, "value": value}]
+        delta.steps = [self]
+        return delta
+
+    def apply(self, df):
+        return self.plan(df).applied(df)
+
+    def transform(self, data, backend):
+        """data with the column's missing values filled through a backend's column
+        operations (see dataprep.backend)"""
+        if self.method == "KNN":
+            raise ValueError("KNN imputation fills from neighbouring rows and runs on the pandas engine only")
+        if self.method == "Create 'Unknown' category":
+            value = UNKNOWN_CATEGORY
+        else:
+            if self.method != "Mode":
+                check_numeric(data, self.column, f"{self.method} imputation", backend)
+            value = backend.fill_value(data, self.column, self.method)
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return data
+        return backend.fill_null(data, self.column, value)
+
+    def to_dict(self):
+        spec = {"op": self.op, "column": self.column, "method": self.method}
+        if self.method == "KNN":
+            spec.update(k=self.k, features=self.features, memory_budget_mb=self.memory_budget_mb)
+        return spec
+
+    def __repr__(self):
+        return f"ImputeStep({self.column!r}, {self.method!r})"
+
+
+def _fill_values(df, steps, profile=None):
+    """{column: fill value} of single-value imputation steps; without a profile,
+    one reduction per method covers all of that method's columns"""
+    values = {}
+    by_method = {}
+    for step in steps:
+        if step.method in ("Mean", "Median"):
+            check_numeric(df, step.column, f"{step.method} imputation")
+    if profile is not None:
+        profile.refresh(df, [step.column for step in steps if step.method in ("Mean", "Median", "Mode")])
+    for step in steps:
+        if step.method == "Create 'Unknown' category":
+            values[step.column] = UNKNOWN_CATEGORY
+        elif profile is not None:
+            values[step.column] = profile.fill_value(step.column, step.method)
+        else:
+            by_method.setdefault(step.method, []).append(step.column)
+    if "Mean" in by_method:
+        values.update(as_float64(df[by_method["Mean"]]).mean().to_dict())
+    if "Median" in by_method:
+        values.update(as_float64(df[by_method["Median"]]).median().to_dict())
+    for column in by_method.get("Mode", []):
+        values[column] = fill_value(df[column], "Mode")
+    return values
+
+
+@traced("impute_many")
+def plan_imputations(df, steps, profile=None, max_workers=None):
+    """DeltaGroup of many ImputeSteps, each on a different column, planned together
+
+    Fill values come from the profile, or from one reduction per method over
+    all of that method's columns, instead of a scan per column. KNN steps, which
+    each search the whole frame, run side by side in a thread pool of
+    max_workers (default: one per step, up to the CPU count). Every step sees
+    df as given, not the other steps' fills, and the group commits as one delta.
+    """
+    steps = list(steps)
+    columns = [step.column for step in steps]
+    if len(set(columns)) != len(columns):
+        raise ValueError("Each column can only be imputed once per group")
+    annotate(columns=len(steps))
+
+    planned = {}
+    knn = [step for step in steps if step.method == "KNN"]
+    if knn:
+        workers = max_workers or min(len(knn), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for step, delta in zip(knn, pool.map(bind(lambda step: step.plan(df)), knn)):
+                planned[step.column] = delta
+
+    simple = [step for step in steps if step.method != "KNN"]
+    values = _fill_values(df, simple, profile)
+    for step in simple:
+        planned[step.column] = step.fitted_delta(df, values[step.column])
+    return DeltaGroup([planned[column] for column in columns])
+
+
+def outlier_entry(column, method, lower, upper, mean=None):
+    """Recipe entry of an outlier treatment with its learned fences (and mean)"""
+    entry = {"op": OutlierStep.op, "column": column, "method": method, "lower": lower, "upper": upper}
+    if method == "Replace with Mean":
+        entry["mean"] = mean
+    return entry
+
+
+def outlier_delta(df, column, method, lower, upper, mean=None):
+    """RowDropDelta for Remove, CellDelta for Cap and Replace with Mean, given the fences"""
+    series = df[column]
+    mask = outlier_mask(series, lower, upper)
+
+    if method == "Remove":
+        return RowDropDelta.from_mask(column, mask)
+    # Fences and the mean are fractional, so integer columns widen to float
+    if method == "Cap":
+        capped = series[mask].clip(lower, upper).to_numpy(dtype=np.float64)
+        return CellDelta.from_mask(df, column, mask, capped)
+    if mean is None:
+        mean = as_float64(series).mean()
+    return CellDelta.from_mask(df, column, mask, np.float64(mean))
+
+
+def check_numeric(data, column, operation, backend=None):
+    """ValueError unless column of data is numeric, as a backend sees it or, without one,
+    as pandas does; the statistics would fail with a less helpful error on e.g. text"""
+    if backend is None:
+        numeric, dtype = pd.api.types.is_numeric_dtype(data[column].dtype), data[column].dtype
+    else:
+        numeric, dtype = backend.is_numeric(data, column), backend.dtype(data, column)
+    if not numeric:
+        raise ValueError(f"{operation} needs a numeric column; {column!r} is {dtype}")
+
+
+def treat_outliers(data, backend, treatments, bounds):
+    """Backend version of the outlier treatments: {column: method} with {column: (lower,
+    upper)}. Means are taken before any edit, and rows removed for any column are
+    dropped once, after the cap/replace edits."""
+    masks = {column: backend.outlier_mask(data, column, *bounds[column]) for column in treatments}
+    means = {column: backend.mean(data, column) for column, method in treatments.items()
+             if method == "Replace with Mean"}
+    drop = None
+    for column, method in treatments.items():
+        if not backend.any(masks[column]):
+            continue
+        if method == "Remove":
+            drop = masks[column] if drop is None else backend.or_(drop, masks[column])
+        elif method == "Cap":
+            data = backend.clip(data, column, *bounds[column])
+        else:
+            data = backend.replace(data, column, masks[column], means[column])
+    return data if drop is None else backend.drop_rows(data, drop)
+
+
+class OutlierStep:
+    """Detect IQR outliers in one numeric column and remove, cap or replace them
+
+    With sketch_error set, the quartiles come from a KLL sketch with that rank
+    error instead of an exact sort.
+    """
+
+    op = "outliers"
+
+    def __init__(self, column, method, factor=1.5, sketch_error=None):
+        if method not in OUTLIER_METHODS:
+            raise ValueError(f"Unknown outlier method: {method}")
+        self.column = column
+        self.method = method
+        self.factor = factor
+        self.sketch_error = sketch_error
+
+    def bounds(self, df, profile=None):
+        if self.sketch_error is not None:
+            return sketch_series(df[self.column], self.sketch_error).iqr_bounds(self.factor)
+        if profile is not None:
+            return profile.refresh(df, [self.column], modes=False).bounds(self.column, self.factor)
+        return iqr_bounds(df[self.column], self.factor)
+
+    @traced("outliers")
+    def plan(self, df, profile=None):
+        """Delta treating the outliers of the column in df; the fences and mean
+        come from profile (a DatasetProfile of df) when given"""
+        annotate(column=self.column, method=self.method)
+        check_numeric(df, self.column, "Outlier treatment")
+        lower, upper = self.bounds(df, profile)
+        mean = None
+        if self.method == "Replace with Mean":
+            mean = profile.fill_value(self.column, "Mean") if profile is not None else fill_value(df[self.column], "Mean")
+        delta = outlier_delta(df, self.column, self.method, lower, upper, mean)
+        delta.fitted = [outlier_entry(self.column, self.method, lower, upper, mean)]
+        delta.steps = [self]
+        return delta
+
+    def apply(self, df):
+        return self.plan(df).applied(df)
+
+    def transform(self, data, backend):
+        """data with the column's outliers treated through a backend's column operations;
+        the quartiles are always exact there"""
+        check_numeric(data, self.column, "Outlier treatment", backend)
+        lower, upper = backend.bounds(data, self.column, "IQR", self.factor)
+        return treat_outliers(data, backend, {self.column: self.method}, {self.column: (lower, upper)})
+
+    def to_dict(self):
+        spec = {"op": self.op, "column": self.column, "method": self.method, "factor": self.factor}
+        if self.sketch_error is not None:
+            spec["sketch_error"] = self.sketch_error
+        return spec
+
+    def __repr__(self):
+        return f"OutlierStep({self.column!r}, {self.method!r}, factor={self.factor})"
+
+
+class BatchOutlierStep:
+    """Detect outliers in many numeric columns at once and treat each column its own way
+
+    treatments maps each column to Remove, Cap, Replace with Mean or None. Rows
+    removed for any column are dropped once, after the cap/replace edits.
+    """
+
+    op = "batch_outliers"
+
+    def __init__(self, treatments, detector="IQR", threshold=None):
+        unknown = {method for method in treatments.values() if method not in OUTLIER_METHODS + ["None"]}
+        if unknown:
+            raise ValueError(f"Unknown outlier methods: {sorted(unknown)}")
+        if detector not in DETECTORS:
+            raise ValueError(f"Unknown outlier detector: {detector}")
+        self.treatments = dict(treatments)
+        self.detector = detector
+        self.threshold = DEFAULT_THRESHOLDS[detector] if threshold is None else threshold
+
+    def detect(self, df):
+        return detect_outliers(df, list(self.treatments), self.detector, self.threshold)
+
+    @traced("batch_outliers")
+    def plan(self, df, detection=None):
+        """DeltaGroup of the per-column edits; detection reuses an earlier detect(df)"""
+        annotate(columns=len(self.treatments))
+        if detection is None:
+            detection = self.detect(df)
+        deltas = []
+        drop = np.zeros(len(df), dtype=bool)
+        for column, method in self.treatments.items():
+            positions = detection.positions[column]
+            if method == "None" or not len(positions):
+                continue
+            if method == "Remove":
+                drop[positions] = True
+            elif method == "Cap":
+                capped = df[column].iloc[positions].clip(detection.lower[column], detection.upper[column])
+                deltas.append(CellDelta.from_positions(df, column, positions, capped.to_numpy(dtype=np.float64)))
+            else:
+                deltas.append(CellDelta.from_positions(df, column, positions, np.float64(detection.means[column])))
+        if drop.any():
+            deltas.append(RowDropDelta.from_mask(None, drop))
+        group = DeltaGroup(deltas)
+        # Every treated column goes into the recipe, including those without outliers here
+        group.fitted = [
+            outlier_entry(column, method, detection.lower[column], detection.upper[column], detection.means[column])
+            for column, method in self.treatments.items() if method != "None"
+        ]
+        group.steps = [self]
+        return group
+
+    def apply(self, df):
+        return self.plan(df).applied(df)
+
+    def transform(self, data, backend):
+        """data with every column treated through a backend's column operations"""
+        treatments = {column: method for column, method in self.treatments.items() if method != "None"}
+        for column in treatments:
+            check_numeric(data, column, "Outlier treatment", backend)
+        bounds = {column: backend.bounds(data, column, self.detector, self.threshold) for column in treatments}
+        return treat_outliers(data, backend, treatments, bounds)
+
+    def to_dict(self):
+        return {"op": self.op, "treatments": self.treatments, "detector": self.detector,
+                "threshold": self.threshold}
+
+    def __repr__(self):
+        return f"BatchOutlierStep({len(self.treatments)} columns, {self.detector!r}, threshold={self.threshold})"
+
+
+class PruneStep:
+    """Drop low-variance columns: numeric columns with a variance of at most
+    variance_threshold, columns where one value makes up at least dominant_ratio
+    of the non-missing entries, and columns with no values
+
+    columns limits the candidates (default: every column). Both measures come
+    from one streaming pass over the data (see dataprep.variance).
+    """
+
+    op = "prune"
+
+    def __init__(self, variance_threshold=VARIANCE_THRESHOLD, dominant_ratio=DEFAULT_DOMINANT_RATIO, columns=None):
+        self.variance_threshold = variance_threshold
+        self.dominant_ratio = dominant_ratio
+        self.columns = list(columns) if columns is not None else None
+
+    def scan(self, data):
+        """Variance report of the candidate columns of data (a CSV, frame, table or record batches)"""
+        return scan_variance(data, self.columns)
+
+    def select(self, report):
+        """The candidate columns of a variance report to drop"""
+        flagged = low_variance_columns(report, self.variance_threshold, self.dominant_ratio)
+        return [column for column in flagged if self.columns is None or column in self.columns]
+
+    @traced("prune")
+    def plan(self, df, report=None):
+        """ColumnDropDelta dropping the low-variance columns of df; report reuses an
+        earlier scan of df"""
+        dropped = self.select(self.scan(df) if report is None else report)
+        annotate(columns=len(dropped))
+        delta = ColumnDropDelta(dropped)
+        delta.fitted = [self.fitted_entry(dropped)]
+        delta.steps = [self]
+        return delta
+
+    def fitted_entry(self, dropped):
+        """Recipe entry of the step with the columns it dropped"""
+        return {"op": self.op, "variance_threshold": self.variance_threshold,
+                "dominant_ratio": self.dominant_ratio, "columns": list(dropped)}
+
+    def apply(self, df):
+        return self.plan(df).applied(df)
+
+    def transform(self, data, backend):
+        """data without its low-variance columns, through a backend's column operations"""
+        return backend.drop_columns(data, self.select(self.scan(data)))
+
+    def to_dict(self):
+        spec = {"op": self.op, "variance_threshold": self.variance_threshold, "dominant_ratio": self.dominant_ratio}
+        if self.columns is not None:
+            spec["columns"] = self.columns
+        return spec
+
+    def __repr__(self):
+        candidates = "all columns" if self.columns is None else f"{len(self.columns)} columns"
+        return (f"PruneStep({candidates}, variance_threshold={self.variance_threshold}, "
+                f"dominant_ratio={self.dominant_ratio})")
+
+
+STEP_TYPES = {step.op: step for step in (ImputeStep, OutlierStep, BatchOutlierStep, PruneStep)}
+
+
+def step_from_dict(spec):
+    """Build a step from its recipe entry"""
+    spec = dict(spec)
+    op = spec.pop("op", None)
+    if op not in STEP_TYPES:
+        raise ValueError(f"Unknown step type: {op}")
+    return STEP_TYPES[op](**spec)
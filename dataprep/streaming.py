@@ -0,0 +1,97 @@
+"""Two-pass outlier treatment for CSV files larger than memory
+
+Pass one parses only the target column, feeding a KLL sketch plus a running
+sum and count; pass two streams every column through Remove/Cap/Replace with
+Mean using the sketched IQR fences and writes the result chunk by chunk.
+Neither pass holds more than one block of the file in memory.
+"""
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .export import csv_compression, open_csv_sink
+from .ingest import DEFAULT_BLOCK_SIZE, csv_columns, iter_batches, widened_types
+from .sketch import DEFAULT_ERROR, KLLSketch
+from .steps import OUTLIER_METHODS, outlier_delta
+
+
+@dataclass
+class StreamReport:
+    rows_in: int
+    rows_out: int
+    outliers: int
+    lower: float
+    upper: float
+    seconds: float
+
+
+def sketch_csv_column(source, column, error=DEFAULT_ERROR, block_size=DEFAULT_BLOCK_SIZE, progress=None):
+    """KLL sketch and mean of one column of a CSV, parsing only that column"""
+    sketch = KLLSketch.for_error(error)
+    total = 0.0
+    count = 0
+    # Read as float64 throughout: a type inferred from the first block may not hold
+    batches = iter_batches(source, block_size, progress, columns=[column], column_types={column: pa.float64()})
+    try:
+        for batch in batches:
+            values = batch.column(0).to_numpy(zero_copy_only=False)
+            values = values[np.isfinite(values)]
+            sketch.update(values)
+            total += values.sum()
+            count += len(values)
+    except pa.ArrowInvalid as exc:
+        raise ValueError(f"Column {column!r} is not numeric: {exc}") from exc
+    return sketch, (total / count if count else np.nan)
+
+
+def _treat_chunks(source, out, column, method, lower, upper, mean, block_size, progress, column_types):
+    rows_in = rows_out = outliers = 0
+    for batch in iter_batches(source, block_size, progress, column_types=column_types):
+        chunk = batch.to_pandas()
+        if method != "Remove" and pd.api.types.is_integer_dtype(chunk[column].dtype):
+            # Keep one column type across chunks whether or not a chunk has outliers
+            chunk[column] = chunk[column].astype("float64")
+        delta = outlier_delta(chunk, column, method, lower, upper, mean)
+        chunk = delta.apply(chunk)
+        chunk.to_csv(out, header=not rows_in, index=False)
+        rows_in += batch.num_rows
+        rows_out += len(chunk)
+        outliers += delta.changed_cells
+    if not rows_in:
+        pd.DataFrame(columns=csv_columns(source)).to_csv(out, index=False)
+    return rows_in, rows_out, outliers
+
+
+def stream_outliers(source, dest, column, method, factor=1.5, error=DEFAULT_ERROR,
+                    block_size=DEFAULT_BLOCK_SIZE, progress=None):
+    """Treat the IQR outliers of column while copying source to dest (CSV, .gz/.zst by suffix)"""
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown outlier method: {method}")
+    start = time.perf_counter()
+
+    first_pass = None if progress is None else (lambda fraction: progress(fraction / 2))
+    sketch, mean = sketch_csv_column(source, column, error, block_size, first_pass)
+    lower, upper = sketch.iqr_bounds(factor)
+
+    second_pass = None if progress is None else (lambda fraction: progress(0.5 + fraction / 2))
+    # The treated column is written as float64 unless rows are only removed
+    column_types = {} if method == "Remove" else {column: pa.float64()}
+    args = (column, method, lower, upper, mean, block_size, second_pass)
+    try:
+        with open_csv_sink(dest, csv_compression(dest)) as out:
+            rows_in, rows_out, outliers = _treat_chunks(source, out, *args, column_types)
+    except pa.ArrowInvalid:
+        # Another column's type, inferred from the first block, did not hold further
+        # down the file; the output is rewritten from the start
+        try:
+            column_types = widened_types(source, block_size, column_types)
+            with open_csv_sink(dest, csv_compression(dest)) as out:
+                rows_in, rows_out, outliers = _treat_chunks(source, out, *args, column_types)
+        except pa.ArrowInvalid as exc:
+            raise ValueError(f"Column types change part way through the file: {exc}") from exc
+
+    return StreamReport(rows_in, rows_out, outliers, float(lower), float(upper),
+                        time.perf_counter() - start)
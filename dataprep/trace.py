@@ -0,0 +1,270 @@
+"""Timing and memory spans for the app's sections and the engine's operations
+
+Nothing is recorded unless a Recording is active on the current thread. When
+none is, span() costs one thread-local lookup and hands back a shared no-op
+context manager, and a traced() function runs after that same lookup, so the
+instrumentation can stay in place at all times. Within a Recording every span
+notes its wall time, its nesting depth, and the change in process RSS and in
+Arrow pool bytes. RSS is process-wide, so with several sessions running at
+once a span's RSS change includes the other sessions' allocations. Work handed
+to another thread (a background job, a pool task) is recorded when it is
+wrapped with bind(): its spans nest under the span open where bind() was
+called and join the recording when the work is done.
+
+    recording = start_recording(path="spans.jsonl")
+    section("Missing values")
+    with span("fill", column="age"):
+        ...
+    recording.finish()
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from functools import wraps
+
+import pandas as pd
+import pyarrow as pa
+
+
+_local = threading.local()
+_write_lock = threading.Lock()
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where /proc is not available"""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed region of a Recording; attrs are free-form labels (column, method...)"""
+
+    def __init__(self, recording, name, attrs):
+        self.recording = recording
+        self.name = name
+        self.attrs = attrs
+        self.depth = 0
+        self.start = None
+        self.seconds = None
+        self.rss_delta = None
+        self.arrow_delta = None
+
+    def __enter__(self):
+        recording = self.recording
+        self.depth = recording.depth + len(recording.stack)
+        recording.stack.append(self)
+        recording.spans.append(self)
+        self._rss = rss_bytes()
+        self._arrow = pa.total_allocated_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.start
+        self.arrow_delta = pa.total_allocated_bytes() - self._arrow
+        rss = rss_bytes()
+        if rss is not None and self._rss is not None:
+            self.rss_delta = rss - self._rss
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        stack = self.recording.stack
+        if stack and stack[-1] is self:
+            stack.pop()
+        return False
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "depth": self.depth,
+            "start": self.start - self.recording.start,
+            "seconds": self.seconds,
+            "rss_delta": self.rss_delta,
+            "arrow_delta": self.arrow_delta,
+            **self.attrs,
+        }
+
+
+class Recording:
+    """Spans of one run (e.g. one Streamlit rerun) on one thread
+
+    Sections are consecutive top-level spans: section(name) ends the current
+    one and starts the next, so a long script can be split without indenting
+    it into with blocks. finish() ends everything still open and, with a path,
+    appends the spans to it as JSON lines tagged with the run id and labels.
+    A branch records another thread's spans for the same run: they are added
+    to this recording when the branch finishes, or, once this recording has
+    finished, written to the path by the branch itself.
+    """
+
+    def __init__(self, path=None, **labels):
+        self.path = path
+        self.labels = labels
+        self.run_id = uuid.uuid4().hex
+        self.spans = []
+        self.stack = []
+        self.start = time.perf_counter()
+        self.seconds = None
+        # Depth of this recording's top-level spans; a branch starts below its parent's open span
+        self.depth = 0
+        self._parent = None
+        self._section = None
+        self._lock = threading.Lock()
+
+    def branch(self):
+        """Recording for another thread's part of this run, nested under the span open now"""
+        branch = Recording(self.path, **self.labels)
+        branch.run_id, branch.start = self.run_id, self.start
+        branch.depth = self.depth + len(self.stack)
+        branch._parent = self
+        return branch
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def section(self, name):
+        self._end_section()
+        self._section = self.span(name).__enter__()
+
+    def _end_section(self):
+        if self._section is None:
+            return
+        while self.stack:
+            top = self.stack[-1]
+            top.__exit__(None, None, None)
+            if top is self._section:
+                break
+        self._section = None
+
+    def finish(self):
+        """End the open spans and stop recording on this thread"""
+        if self.seconds is not None:
+            return self
+        self._end_section()
+        while self.stack:
+            self.stack[-1].__exit__(None, None, None)
+        with self._lock:
+            self.seconds = time.perf_counter() - self.start
+        if getattr(_local, "recording", None) is self:
+            _local.recording = None
+        parent = self._parent
+        if parent is not None:
+            with parent._lock:
+                joined = parent.seconds is None
+                if joined:
+                    parent.spans.extend(self.spans)
+            if joined:
+                return self
+        if self.path:
+            self.write(self.path)
+        return self
+
+    def write(self, path):
+        lines = [
+            json.dumps({"run": self.run_id, **self.labels, **span.to_dict()}, default=str)
+            for span in self.spans
+        ]
+        if not lines:
+            return
+        with _write_lock, open(path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def summary(self):
+        """One row per span in start order, names indented by depth"""
+        rows = [{
+            "Span": "  " * span.depth + span.name,
+            "Seconds": span.seconds,
+            "% of Run": span.seconds / self.seconds * 100 if self.seconds else None,
+            "RSS Δ (MB)": None if span.rss_delta is None else span.rss_delta / 1024 ** 2,
+            "Arrow Δ (MB)": span.arrow_delta / 1024 ** 2,
+            "Details": ", ".join(f"{key}={value}" for key, value in span.attrs.items()),
+        } for span in sorted(self.spans, key=lambda span: span.start)]
+        return pd.DataFrame(rows, columns=["Span", "Seconds", "% of Run", "RSS Δ (MB)", "Arrow Δ (MB)", "Details"])
+
+
+def start_recording(path=None, **labels):
+    """Start recording spans on this thread, replacing a run that never finished
+    (e.g. one cut short by st.rerun)"""
+    recording = Recording(path, **labels)
+    _local.recording = recording
+    return recording
+
+
+def current_recording():
+    return getattr(_local, "recording", None)
+
+
+def bind(func):
+    """func, recorded into a branch of the current thread's recording from whichever
+    thread calls it; func itself when nothing is recording"""
+    recording = getattr(_local, "recording", None)
+    if recording is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "recording", None)
+        branch = _local.recording = recording.branch()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            branch.finish()
+            _local.recording = previous
+    return wrapper
+
+
+def span(name, **attrs):
+    """Context manager timing a region; a shared no-op when nothing is recording"""
+    recording = getattr(_local, "recording", None)
+    if recording is None:
+        return _NULL_SPAN
+    return recording.span(name, **attrs)
+
+
+def section(name):
+    """End the current top-level section of the recording and start the next"""
+    recording = getattr(_local, "recording", None)
+    if recording is not None:
+        recording.section(name)
+
+
+def annotate(**attrs):
+    """Add labels to the innermost open span"""
+    recording = getattr(_local, "recording", None)
+    if recording is not None and recording.stack:
+        recording.stack[-1].attrs.update(attrs)
+
+
+def traced(name):
+    """Decorator running the function inside span(name)"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            recording = getattr(_local, "recording", None)
+            if recording is None:
+                return func(*args, **kwargs)
+            with recording.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
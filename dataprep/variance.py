@@ -0,0 +1,208 @@
+"""Low-variance columns, found in one streaming pass
+
+Columns that hardly vary carry little information but still cost memory and
+time in every later stage (KNN distances, outlier detection, exports). A scan
+reads the data once, a record batch at a time, and keeps per column:
+
+    count, mean and M2    numeric columns; per-batch moments from
+                          pyarrow.compute merged with Chan's parallel formula,
+                          so the population variance (as in scikit-learn's
+                          VarianceThreshold) never needs the whole column
+    value counters        every column; a mergeable Misra-Gries summary of
+                          MAX_TRACKED counters. Exact while a column has at most
+                          that many distinct values; otherwise a count is low by
+                          at most (non-missing - tracked total) / (MAX_TRACKED + 1),
+                          a tiny error for the dominant value of a column where
+                          one value makes up nearly all the entries
+
+A CSV is never loaded as a frame, and a frame is converted to Arrow a chunk of
+rows at a time. low_variance_columns then flags the columns to drop for a pair
+of thresholds without another pass.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .ingest import iter_batches
+from .jobs import checkpoint
+from .trace import annotate, traced
+
+
+# Columns whose variance is at most this are dropped (0: constant columns only)
+VARIANCE_THRESHOLD = 0.0
+# ... and so are columns where one value makes up this share of the non-missing entries
+DEFAULT_DOMINANT_RATIO = 0.99
+MAX_TRACKED = 64
+FRAME_CHUNK_ROWS = 1 << 18
+# The CSV reader reads several blocks ahead of the batch being scanned; small
+# blocks keep that buffer small at no cost in speed
+SCAN_BLOCK_SIZE = 1 << 20
+REPORT_COLUMNS = ["dtype", "count", "nulls", "mean", "variance", "dominant", "dominant_ratio", "exact"]
+
+
+def _arrow_values(series):
+    """A pandas column as an Arrow array; mixed object columns are compared as text"""
+    try:
+        return pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(series.map(str, na_action="ignore"), from_pandas=True)
+
+
+def _is_numeric(kind):
+    return pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_boolean(kind)
+
+
+class _Column:
+    """Moments and value counters of one column"""
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.numeric = _is_numeric(dtype)
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.counters = {}
+        # False once a summary dropped a value, making the counts estimates
+        self.exact = True
+
+    def update(self, values):
+        if pa.types.is_dictionary(values.type):
+            values = values.cast(values.type.value_type)
+        self.nulls += values.null_count
+        present = values.drop_null()
+        if not len(present):
+            return
+        if self.numeric:
+            self._add_moments(present)
+        self._add_counts(pc.value_counts(present))
+        self.count += len(present)
+
+    def _add_moments(self, present):
+        if pa.types.is_boolean(present.type):
+            present = present.cast(pa.int8())
+        n = len(present)
+        mean = pc.mean(present).as_py()
+        m2 = pc.variance(present, ddof=0).as_py() * n
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+
+    def _add_counts(self, counts):
+        frequency = counts.field("counts").to_numpy()
+        values = counts.field("values")
+        # A batch's exact counts are a summary of their own; shrinking them to
+        # MAX_TRACKED counters first keeps the merge cheap on unique-heavy columns
+        if len(frequency) > MAX_TRACKED:
+            cut = np.partition(frequency, -(MAX_TRACKED + 1))[-(MAX_TRACKED + 1)]
+            kept = np.flatnonzero(frequency > cut)
+            values, frequency = values.take(pa.array(kept)), frequency[kept] - cut
+            self.exact = False
+        for value, count in zip(values.to_pylist(), frequency.tolist()):
+            self.counters[value] = self.counters.get(value, 0) + count
+        if len(self.counters) > MAX_TRACKED:
+            cut = sorted(self.counters.values(), reverse=True)[MAX_TRACKED]
+            self.counters = {value: count - cut for value, count in self.counters.items() if count > cut}
+            self.exact = False
+
+    def dominant(self):
+        if not self.counters:
+            return None, np.nan
+        value = max(self.counters, key=self.counters.get)
+        return value, self.counters[value] / self.count
+
+    def variance(self):
+        if not self.numeric or not self.count:
+            return np.nan
+        if self.exact and len(self.counters) == 1:
+            # Constant; the merged moments may carry rounding noise
+            return 0.0
+        return self.m2 / self.count
+
+
+class VarianceScan:
+    """Per-column variance and dominant-value share, fed one record batch at a time"""
+
+    def __init__(self):
+        self._columns = {}
+
+    def update(self, columns):
+        """Add a chunk of rows: a RecordBatch, or a mapping of column name to Arrow array"""
+        if isinstance(columns, pa.RecordBatch):
+            columns = dict(zip(columns.schema.names, columns.columns))
+        for name, values in columns.items():
+            if name not in self._columns:
+                kind = values.type.value_type if pa.types.is_dictionary(values.type) else values.type
+                self._columns[name] = _Column(kind)
+            self._columns[name].update(values)
+        return self
+
+    def report(self):
+        """One row per column: non-missing count, nulls, mean and population variance
+        (numeric columns), dominant value and its share of the non-missing entries,
+        and whether the counts are exact"""
+        rows = {}
+        for name, column in self._columns.items():
+            value, ratio = column.dominant()
+            rows[name] = {
+                "dtype": str(column.dtype), "count": column.count, "nulls": column.nulls,
+                "mean": column.mean if column.numeric and column.count else np.nan,
+                "variance": column.variance(), "dominant": value, "dominant_ratio": ratio,
+                "exact": column.exact,
+            }
+        return pd.DataFrame.from_dict(rows, orient="index", columns=REPORT_COLUMNS)
+
+
+def _frame_chunks(df, columns, rows):
+    for start in range(0, len(df), rows):
+        checkpoint(start / len(df), "variance")
+        chunk = df.iloc[start:start + rows]
+        yield {name: _arrow_values(chunk[name]) for name in columns}
+
+
+def _chunks(source, columns, block_size, progress):
+    if isinstance(source, pd.DataFrame):
+        yield from _frame_chunks(source, list(source.columns) if columns is None else columns, FRAME_CHUNK_ROWS)
+    elif isinstance(source, pa.Table):
+        table = source if columns is None else source.select(columns)
+        for i, batch in enumerate(table.to_batches(max_chunksize=FRAME_CHUNK_ROWS)):
+            checkpoint(i * FRAME_CHUNK_ROWS / max(table.num_rows, 1), "variance")
+            yield batch
+    elif isinstance(source, (str, os.PathLike)) or hasattr(source, "read"):
+        yield from iter_batches(source, block_size, progress, columns=columns)
+    else:
+        # Record batches, e.g. SpillDataset.iter_batches()
+        for batch in source:
+            checkpoint(None, "variance")
+            yield batch if columns is None else batch.select(columns)
+
+
+@traced("variance.scan")
+def scan_variance(source, columns=None, block_size=SCAN_BLOCK_SIZE, progress=None):
+    """Variance report (see VarianceScan.report) of a CSV path or file, a DataFrame,
+    an Arrow table or record batches, in one pass; columns limits the scan"""
+    scan = VarianceScan()
+    for chunk in _chunks(source, list(columns) if columns is not None else None, block_size, progress):
+        scan.update(chunk)
+    report = scan.report()
+    annotate(columns=len(report))
+    return report
+
+
+def low_variance_columns(report, variance_threshold=VARIANCE_THRESHOLD, dominant_ratio=DEFAULT_DOMINANT_RATIO):
+    """{column: reason} of the columns of a report to drop: no values at all, a
+    variance of at most variance_threshold, or a dominant value making up at
+    least dominant_ratio of the non-missing entries"""
+    flagged = {}
+    for name, row in report.iterrows():
+        if not row["count"]:
+            flagged[name] = "no values"
+        elif not pd.isna(row["variance"]) and row["variance"] <= variance_threshold:
+            flagged[name] = "constant" if row["variance"] == 0 else f"variance {row['variance']:.4g}"
+        elif row["dominant_ratio"] >= dominant_ratio:
+            flagged[name] = f"{row['dominant_ratio']:.1%} {row['dominant']!r}"
+    return flagged
@@ -0,0 +1,17 @@
+from dataprep.cli import main
+
+
+def test_arrow_backend_reports_non_numeric_column(tmp_path, capsys):
+    source = tmp_path / "in.csv"
+    source.write_text("a,b\n1,x\n,y\n3,\n")
+    for step in (["--impute", "b=Mean"], ["--outliers", "b=Cap"]):
+        assert main(["run", str(source), str(tmp_path / "out.csv"), "--backend", "arrow", *step]) == 1
+        assert "needs a numeric column; 'b'" in capsys.readouterr().err
+
+
+def test_pandas_path_reports_non_numeric_column(tmp_path, capsys):
+    source = tmp_path / "in.csv"
+    source.write_text("a,b\n1,x\n,y\n3,\n")
+    for step in (["--impute", "b=Mean"], ["--impute", "b=Median"], ["--outliers", "b=Cap"]):
+        assert main(["run", str(source), str(tmp_path / "out.csv"), *step]) == 1
+        assert "needs a numeric column; 'b'" in capsys.readouterr().err
@@ -0,0 +1,18 @@
+import gc
+
+import pandas as pd
+
+from dataprep.governor import MemoryGovernor
+from dataprep.journal import Journal
+
+
+def test_journal_collected_inside_locked_section_is_forgotten_later():
+    governor = MemoryGovernor(budget_bytes=1 << 30)
+    journal = Journal(pd.DataFrame({"a": range(10)}))
+    governor.track("session", journal)
+    # The weakref callback runs right here, with the lock held; it must not block
+    with governor._lock:
+        del journal
+        gc.collect()
+    assert governor.usage().empty
+    assert not governor._sessions
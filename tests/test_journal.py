@@ -0,0 +1,43 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dataprep.journal import Journal
+from dataprep.optimize import downcast_numeric
+from dataprep.profile import DatasetProfile
+from dataprep.steps import ImputeStep, OutlierStep
+
+
+def downcast_frame():
+    df = downcast_numeric(pd.DataFrame({
+        "a": [1.5, np.nan, 2.25, 3.0, np.nan, 4.5, 1.0, 100.0],
+        "b": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0],
+    }))
+    assert df["a"].dtype == np.float32
+    return df
+
+
+def test_impute_downcast_float_column_widens_to_float64():
+    df = downcast_frame()
+    profile = DatasetProfile.from_frame(df)
+    mean = profile.fill_value("a", "Mean")
+    journal = Journal(df)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        journal.commit(ImputeStep("a", "Mean").plan(journal.df, profile))
+    assert journal.df["a"].dtype == np.float64
+    assert journal.df["a"].iloc[1] == mean
+    journal.undo()
+    assert journal.df["a"].dtype == np.float32
+    assert journal.df["a"].isna().sum() == 2
+
+
+def test_knn_and_replace_with_mean_on_downcast_float_column():
+    df = downcast_frame()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        filled = ImputeStep("a", "KNN", k=2).apply(df)
+        replaced = OutlierStep("a", "Replace with Mean").apply(df)
+    assert filled["a"].dtype == np.float64 and not filled["a"].isna().any()
+    assert replaced["a"].iloc[7] == df["a"].astype(np.float64).mean()
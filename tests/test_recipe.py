@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataprep.ingest import read_csv
+from dataprep.journal import Journal
+from dataprep.optimize import plan_optimization
+from dataprep.pipeline import Pipeline
+from dataprep.recipe import FittedRecipe
+from dataprep.steps import ImputeStep, OutlierStep
+
+
+def test_transform_csv_with_columns_missing_from_the_first_block(tmp_path):
+    n = 4000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.normal(size=n), "b": rng.choice(["x", "y"], n),
+                       "i": rng.integers(0, 9, n), "z": "q", "w": np.arange(n, dtype=float)})
+    # Recipe columns (a, b) and an untouched one (z) are all missing in the first
+    # blocks; w is whole numbers until its last row
+    df.loc[:n // 2, ["a", "b", "z"]] = None
+    df.loc[n - 1, "w"] = 0.5
+    source = tmp_path / "in.csv"
+    df.to_csv(source, index=False)
+
+    fitted_on = pd.DataFrame({"a": [1.0, np.nan, 3.0], "b": ["x", None, "y"], "i": [1, 2, 3]})
+    recipe = FittedRecipe.fit(Pipeline([ImputeStep("a", "Mean"), ImputeStep("b", "Mode"),
+                                        OutlierStep("i", "Cap")]), fitted_on)
+    recipe = FittedRecipe.from_dict(recipe.to_dict())
+    report = recipe.transform_csv(str(source), tmp_path / "out.parquet", block_size=1 << 12)
+
+    out = pd.read_parquet(tmp_path / "out.parquet")
+    assert report.rows_in == report.rows_out == n
+    assert out["a"].dtype == np.float64 and not out["a"].isna().any()
+    assert (out["a"].iloc[:n // 2 + 1] == 2.0).all()
+    assert set(out["b"]) == {"x", "y"}
+    assert out["z"].isna().sum() == n // 2 + 1 and out["w"].iloc[-1] == 0.5
+
+
+def test_fit_and_transform_csv_on_optimized_yes_no_column(tmp_path):
+    source = tmp_path / "yn.csv"
+    pd.DataFrame({"flag": ["yes", "no", None, "no", "no"], "x": [1, 2, 3, 4, 5]}).to_csv(source, index=False)
+    df, _ = read_csv(str(source))
+    journal = Journal(df)
+    journal.commit(plan_optimization(journal.df))
+    assert journal.df["flag"].dtype == "boolean"
+
+    recipe = FittedRecipe.fit(Pipeline([ImputeStep("flag", "Mode")]), journal.df, labels=journal.labels)
+    assert recipe.entries[0]["value"] == "no"
+    recipe.transform_csv(str(source), tmp_path / "out.csv")
+    out = pd.read_csv(tmp_path / "out.csv")
+    assert out["flag"].tolist() == ["yes", "no", "no", "no", "no"]
+
+
+def test_transform_csv_reports_a_pinned_type_the_file_does_not_hold(tmp_path):
+    source = tmp_path / "in.csv"
+    source.write_text("a\nx\ny\n")
+    recipe = FittedRecipe([{"op": "impute", "column": "a", "method": "Mean", "value": 1.0}],
+                          source={"types": {"a": "double"}})
+    with pytest.raises(ValueError, match="Column types change"):
+        recipe.transform_csv(str(source), tmp_path / "out.csv")
+
+
+@pytest.mark.parametrize("name", ["out.csv", "out.parquet"])
+def test_transform_csv_of_a_header_only_file(tmp_path, name):
+    source = tmp_path / "in.csv"
+    source.write_text("a,b,i\n")
+    fitted_on = pd.DataFrame({"a": [1.0, np.nan, 3.0], "b": ["x", None, "y"], "i": [1, 2, 3]})
+    recipe = FittedRecipe.fit(Pipeline([ImputeStep("a", "Mean"), ImputeStep("b", "Mode"),
+                                        OutlierStep("i", "Cap")]), fitted_on)
+    report = recipe.transform_csv(str(source), tmp_path / name)
+
+    out = pd.read_csv(tmp_path / name) if name.endswith(".csv") else pd.read_parquet(tmp_path / name)
+    assert report.rows_in == report.rows_out == 0
+    assert out.columns.tolist() == ["a", "b", "i"] and out.empty
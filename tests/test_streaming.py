@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from dataprep.streaming import stream_outliers
+
+
+def test_stream_outliers_with_types_changing_after_the_first_block(tmp_path):
+    n = 20000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.integers(0, 100, n).astype(float), "b": np.arange(n, dtype=float), "z": None})
+    # Whole numbers (or nothing) until the last row
+    df.loc[n - 1, ["a", "b", "z"]] = [1e6 + 0.5, 0.25, "late"]
+    source = tmp_path / "in.csv"
+    df.to_csv(source, index=False)
+    report = stream_outliers(str(source), str(tmp_path / "out.csv.gz"), "a", "Cap", block_size=1 << 12)
+    out = pd.read_csv(tmp_path / "out.csv.gz")
+    assert report.rows_out == n and report.outliers == 1
+    assert out["a"].iloc[-1] == report.upper
+    assert out["b"].iloc[-1] == 0.25 and out["z"].iloc[-1] == "late"
+
+
+def test_stream_outliers_writes_the_header_of_an_empty_file(tmp_path):
+    source = tmp_path / "in.csv"
+    source.write_text("a,b\n")
+    report = stream_outliers(str(source), str(tmp_path / "out.csv"), "a", "Cap")
+    assert report.rows_in == 0
+    assert (tmp_path / "out.csv").read_text().strip() == "a,b"
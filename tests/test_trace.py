@@ -0,0 +1,65 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataprep.jobs import DONE, JobRunner
+from dataprep.profile import DatasetProfile
+from dataprep.steps import ImputeStep, plan_imputations
+from dataprep.trace import start_recording
+
+
+def frame():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.normal(size=200), "b": rng.normal(size=200), "c": rng.normal(size=200)})
+    df.loc[::7, "a"] = np.nan
+    df.loc[::5, "b"] = np.nan
+    return df
+
+
+def wait(job):
+    while not job.done:
+        time.sleep(0.01)
+    assert job.status == DONE, job.error
+
+
+def test_job_spans_join_the_submitting_recording():
+    df = frame()
+    runner = JobRunner(max_workers=2)
+    recording = start_recording()
+    with recording.span("section"):
+        job = runner.submit("Profiling", DatasetProfile.from_frame, df)
+        wait(job)
+        job = runner.submit("Planning", plan_imputations, df,
+                            [ImputeStep("a", "KNN", k=3), ImputeStep("b", "KNN", k=3)])
+        wait(job)
+    recording.finish()
+    names = [span.name for span in recording.spans]
+    assert "profile" in names
+    # Both KNN pool tasks of the planning job, nested below the submitting span
+    knn = [span for span in recording.spans if span.name == "knn"]
+    assert len(knn) == 2 and all(span.depth > 1 for span in knn)
+    assert len(recording.summary()) == len(recording.spans)
+    runner.shutdown()
+
+
+def test_job_finishing_after_the_run_writes_its_own_spans(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    release = threading.Event()
+
+    def slow_profile(df):
+        release.wait(5)
+        return DatasetProfile.from_frame(df)
+
+    runner = JobRunner(max_workers=1)
+    recording = start_recording(path=str(path))
+    job = runner.submit("Profiling", slow_profile, frame())
+    recording.finish()
+    release.set()
+    wait(job)
+    runner.shutdown()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert {line["run"] for line in lines} == {recording.run_id}
+    assert "profile" in [line["name"] for line in lines]